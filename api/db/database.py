@@ -1,6 +1,9 @@
 import psycopg2
 import psycopg2.extras
 import os
+from rag.telemetry import get_logger
+
+logger = get_logger(__name__)
 
 def db_connection():
     conn = psycopg2.connect(
@@ -38,7 +41,7 @@ def create_user(db, name: str, email: str, phone_number: str, hashed_password: s
         return new_user_id
     except Exception as e:
         db.rollback()
-        print("debug:", str(e))
+        logger.error("Create user error: %s", e)
         return None
     finally:
         cursor.close()
@@ -78,7 +81,7 @@ def update_rag_configuration(db, data: dict):
         db.commit()
     except Exception as e:
         db.rollback()
-        print("debug :", str(e))
+        logger.error("Update RAG configuration error: %s", e)
         return None
     finally:
         cursor.close()
@@ -1,28 +1,58 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
+from contextlib import ExitStack
 from datetime import datetime
-# from rag.inference import generate_response
+import asyncio
+import orjson
+import os
+import threading
+from rag.inference import generate_response, stream_response, warm_llm
+from rag.coalescing import FlightTimeout
 from rag.embedder import embedd_product_data
-from rag.retriever import retrieve_docs
-from api.utils import create_access_token
+from rag.index_updater import ProductChangeConsumer
+from rag.retriever import retrieve_docs, retrieve_docs_batch, warm_retrieval, get_id_to_doc, truncate_string, RETRIEVAL_COMPONENTS
+from rag.similar import similar_documents
+from rag.sidecar_client import sidecar_enabled, get_sidecar_client, get_async_sidecar_client
+from rag.sidecar_protocol import SidecarError, SidecarOverloaded, SidecarTimeout, NOT_FOUND
+from rag.index_registry import UnknownIndex, get_index_registry
+from rag.components import component_status, is_warm
+from rag.profiler import run_profile, ProfilerBusy, PROFILE_SAMPLE_INTERVAL_MS
+from rag.conversation import session_key, clear_session
+from rag.telemetry import get_logger
+from api.utils import create_access_token, hash_password, verify_password, PasswordHasherBusy
 import api.middleware as mw
+from api.rate_limit import llm_gate, embedding_gate, rebuild_gate
 import api.db.database as db
-from passlib.context import CryptContext
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = get_logger(__name__)
+change_consumer = ProductChangeConsumer()
+
 app = FastAPI(
     title="Tokopoin RAG Chatbot API",
     description="Tokopoin chatbot with RAG capabilities",
     version="1.0.0"
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 db_conn = db.db_connection()
 
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES") or 1024)
+BATCH_MAX_TOP_K = int(os.getenv("BATCH_MAX_TOP_K") or 100)
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE") or 256)
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS") or 200)
+SIDECAR_BATCH_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_SIDECAR_BATCH_TIMEOUT_SECONDS") or 30)
+
+# full: whole document, snippet: first SNIPPET_CHARS characters, ids: ids and scores only
+ResultMode = Literal["full", "snippet", "ids"]
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -30,6 +60,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(mw.track_requests)
+mw.add_compression(app)
 
 class RegisterRequest(BaseModel):
     name: str
@@ -55,6 +87,18 @@ class LoginResponse(BaseModel):
 
 class QueryRequest(BaseModel):
     query: str
+    # Registry index to search (see INDEX_REGISTRY), the default catalog when omitted
+    index: Optional[str] = None
+
+class FacetConstraint(BaseModel):
+    key: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+    values: Optional[List[str]] = None
+
+class RetrievalRequest(QueryRequest):
+    # Attribute id, "dim:<dimension>" or price/discount/weight, parsed from the query when omitted
+    filters: Optional[List[FacetConstraint]] = None
 
 class QueryResponse(BaseModel):
     success: bool
@@ -68,8 +112,10 @@ class EmbeddingResponse(BaseModel):
     message : str
 
 class RetrievalResult(BaseModel):
+    id: int
     score: float
-    document: str
+    document: Optional[str] = None
+    snippet: Optional[str] = None
 
 class RetrievalResponse(BaseModel):
     success: bool
@@ -77,6 +123,20 @@ class RetrievalResponse(BaseModel):
     message : str
     result: List[RetrievalResult]
 
+class SimilarProductsResponse(BaseModel):
+    success: bool
+    status_code: int
+    message : str
+    result: List[RetrievalResult]
+
+class BatchQuery(BaseModel):
+    query: str
+    top_k: Optional[int] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQuery]
+    index: Optional[str] = None
+
 class RagConfiguration(BaseModel):
     main_instruction: str
     critical_instruction: str
@@ -99,6 +159,28 @@ class UpdateRagConfigRequest(BaseModel):
     retriever_instruction: str
     top_k_retrieval: int
 
+def warmup():
+    try:
+        # With a sidecar the retrieval models live in the sidecar process
+        if os.getenv("WARMUP_RETRIEVAL", "true").lower() == "true" and not sidecar_enabled():
+            warm_retrieval()
+        if os.getenv("WARMUP_LLM", "false").lower() == "true":
+            warm_llm()
+    except Exception as e:
+        logger.exception("Warmup error: %s", e)
+
+@app.on_event("startup")
+def start_warmup():
+    # Load models in the background so liveness (/api/status) answers immediately
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    # With a sidecar the index lives there, and so does the consumer updating it
+    if os.getenv("CHANGE_FEED_ENABLED", "false").lower() == "true" and not sidecar_enabled():
+        change_consumer.start()
+
+@app.on_event("shutdown")
+def stop_change_feed():
+    change_consumer.stop()
+
 @app.get("/api/status", tags=["Status"])
 def status():
     return {
@@ -109,16 +191,34 @@ def status():
         "message": "Ready to process query."
     }
 
+@app.get("/api/ready", tags=["Status"])
+def ready():
+    components = component_status()
+    is_ready = sidecar_enabled() or all(is_warm(name) for name in RETRIEVAL_COMPONENTS)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "success" : is_ready,
+            "status_code": 200 if is_ready else 503,
+            "message": "Ready to accept traffic." if is_ready else "Retrieval components are still loading.",
+            "components": components
+        }
+    )
+
+@app.get("/metrics", tags=["Status"])
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/api/register/user",response_model=RegisterResponse, tags=["Register User"])
-def register_user(payload: RegisterRequest):
+async def register_user(payload: RegisterRequest):
     try:
         # Check if email already exists
-        existing_user = db.get_user(db_conn, payload.email)
+        existing_user = await run_in_threadpool(db.get_user, db_conn, payload.email)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_password = pwd_context.hash(payload.password)
-        user_id = db.create_user(db_conn, payload.name, payload.email, payload.phone_number, hashed_password)
+        hashed_password = await hash_password(payload.password)
+        user_id = await run_in_threadpool(db.create_user, db_conn, payload.name, payload.email, payload.phone_number, hashed_password)
 
         if not user_id:
             raise HTTPException(status_code=500, detail="Failed to register user")
@@ -127,79 +227,294 @@ def register_user(payload: RegisterRequest):
         return RegisterResponse(success=True, status_code=200, message="User registered successfully", access_token=token)
     except HTTPException as e:
         raise e
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts, try again later", headers={"Retry-After": "1"})
     except Exception as e:
-        print("[DEBUG] User Register error :", str(e))
+        logger.exception("User Register error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.post("/api/login/user", response_model=LoginResponse, tags=["User Login"])
-def login_user(payload: LoginRequest):
+async def login_user(payload: LoginRequest):
     try : 
-        user = db.get_user(db_conn, payload.email)
+        user = await run_in_threadpool(db.get_user, db_conn, payload.email)
 
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
-        if not pwd_context.verify(payload.password, user["password"]):
+        is_valid = await verify_password(payload.password, user["password"])
+        if not is_valid:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         token = create_access_token(user_id=user["id"], role="customer")
         return LoginResponse(success=True, status_code=200, message="Login Successfully", access_token=token)
     except HTTPException as e:
         raise e
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts, try again later", headers={"Retry-After": "1"})
     except Exception as e :
-        print("[DEBUG] User Login error :", str(e))
+        logger.exception("User Login error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/login/admin", response_model=LoginResponse, tags=["Admin Login"])
-def login_admin(payload: LoginRequest):
+async def login_admin(payload: LoginRequest):
     try :
-        admin = db.get_admin(db_conn, payload.email)
+        admin = await run_in_threadpool(db.get_admin, db_conn, payload.email)
 
         if not admin:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
-        if not pwd_context.verify(payload.password, admin["password"]):
+        is_valid = await verify_password(payload.password, admin["password"])
+        if not is_valid:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         token = create_access_token(user_id=admin["id"], role="admin")
         return LoginResponse(success=True, status_code=200, message="Login Successfully", access_token=token)
     except HTTPException as e:
         raise e
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts, try again later", headers={"Retry-After": "1"})
     except Exception as e :
-        print("[DEBUG] User Login error :", str(e))
+        logger.exception("User Login error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-# @app.post("/api/query", response_model=QueryResponse, tags=["Chatbot RAG"])
-# def answer_query(payload: QueryRequest, user_payload: dict = Depends(mw.user_middleware)):
-#     try:
-#         answer = generate_response(db_conn, payload.query, max_tokens=4096) # Change max tokens if needed
-#         return QueryResponse(success=True, status_code=200, message="Successfully Generate answer", answer=answer)
-#     except Exception as e:
-#         print("[DEBUG] Chatbot Query error :", str(e))
-#         raise HTTPException(status_code=500, detail=str(e))
+@app.post("/api/query", response_model=QueryResponse, tags=["Chatbot RAG"])
+def answer_query(payload: QueryRequest, user_payload: dict = Depends(mw.rate_limited_user)):
+    try:
+        # Concurrent identical questions share one answer, only the one generating it takes an LLM slot
+        answer = generate_response(db_conn, payload.query, max_tokens=4096, session_id=session_key(user_payload), index_name=payload.index,
+                                   admit=llm_gate.admit) # Change max tokens if needed
+        return QueryResponse(success=True, status_code=200, message="Successfully Generate answer", answer=answer)
+    except HTTPException as e:
+        raise e
+    except SidecarError as e:
+        logger.warning("Sidecar retrieval error: %s", e)
+        raise sidecar_http_error(e)
+    except FlightTimeout:
+        raise HTTPException(status_code=504, detail="Answer generation timed out")
+    except UnknownIndex:
+        raise HTTPException(status_code=404, detail=f"Unknown index {payload.index}")
+    except Exception as e:
+        logger.exception("Chatbot Query error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def answer_lines(chunks):
+    try:
+        for chunk in chunks:
+            yield orjson.dumps({"delta": chunk}) + b"\n"
+    except UnknownIndex as e:
+        yield orjson.dumps({"error": f"Unknown index {e.args[0]}"}) + b"\n"
+        return
+    except HTTPException as e:
+        yield orjson.dumps({"error": e.detail}) + b"\n"
+        return
+    except SidecarError as e:
+        logger.warning("Sidecar retrieval error: %s", e)
+        yield orjson.dumps({"error": sidecar_http_error(e).detail}) + b"\n"
+        return
+    except FlightTimeout:
+        yield orjson.dumps({"error": "Answer generation timed out"}) + b"\n"
+        return
+    except Exception as e:
+        logger.exception("Chatbot stream error: %s", e)
+        yield orjson.dumps({"error": "Answer generation failed"}) + b"\n"
+        return
+    yield orjson.dumps({"done": True}) + b"\n"
+
+@app.post("/api/query/stream", tags=["Chatbot RAG"])
+def stream_query(payload: QueryRequest, user_payload: dict = Depends(mw.rate_limited_user)):
+    # ndjson {"delta": text} lines ending with {"done": true}, a request joining an identical
+    # question in progress first gets the text generated so far
+    try:
+        chunks = stream_response(db_conn, payload.query, max_tokens=4096, session_id=session_key(user_payload), index_name=payload.index,
+                                 admit=llm_gate.admit)
+    except HTTPException as e:
+        raise e
+    except SidecarError as e:
+        logger.warning("Sidecar retrieval error: %s", e)
+        raise sidecar_http_error(e)
+    except Exception as e:
+        logger.exception("Chatbot Query error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(answer_lines(chunks), media_type="application/x-ndjson")
+
+@app.delete("/api/conversation", response_model=EmbeddingResponse, tags=["Chatbot RAG"])
+def reset_conversation(user_payload: dict = Depends(mw.user_middleware)):
+    clear_session(session_key(user_payload))
+    return EmbeddingResponse(success=True, status_code=200, message="Successfully cleared conversation history")
     
 @app.post("/api/embedd-products", response_model=EmbeddingResponse, tags=["Embedd Product Data"])
-def embedd_products(admin: dict = Depends(mw.admin_middleware)):
+def embedd_products(shard: Optional[str] = None, admin: dict = Depends(mw.rate_limited_admin)):
     try:
-        embedd_product_data(db_conn)
+        with rebuild_gate.admit(), change_consumer.rebuilding():
+            embedd_product_data(db_conn, shard=shard)
+            # The sidecar serves the index, it has to load the files just written
+            if sidecar_enabled():
+                get_sidecar_client().reload()
         return EmbeddingResponse(success=True, status_code=200, message="Successfully Embedd Product Data")
+    except HTTPException as e:
+        raise e
+    except SidecarError as e:
+        logger.warning("Sidecar reload error: %s", e)
+        raise sidecar_http_error(e)
     except Exception as e:
-        print("[DEBUG] Embedding error :", str(e))
+        logger.exception("Embedding error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/retrieve-documents", response_model=RetrievalResponse, tags=["Retrieve Product Document Data"])
-def embedd_products(payload: QueryRequest, admin: dict = Depends(mw.admin_middleware)):
+def retrieval_result(product_id: int, score: float, text: str, mode: str) -> dict:
+    if mode == "ids":
+        return {"id": product_id, "score": score}
+    if mode == "snippet":
+        return {"id": product_id, "score": score, "snippet": truncate_string(text, max_length=SNIPPET_CHARS)}
+    return {"id": product_id, "score": score, "document": text}
+
+def sidecar_http_error(e: SidecarError) -> HTTPException:
+    if isinstance(e, SidecarOverloaded):
+        return HTTPException(status_code=503, detail="Server is busy, try again later.", headers={"Retry-After": "1"})
+    if isinstance(e, SidecarTimeout):
+        return HTTPException(status_code=504, detail="Retrieval timed out")
+    if e.code == NOT_FOUND:
+        return HTTPException(status_code=404, detail=str(e))
+    return HTTPException(status_code=502, detail="Retrieval service unavailable")
+
+def retrieve_locally(query: str, constraints: list = None, index_name: str = None):
+    with embedding_gate.admit():
+        return retrieve_docs(db_conn, query, constraints=constraints, index_name=index_name)
+
+@app.post("/api/retrieve-documents", response_model=RetrievalResponse, response_model_exclude_none=True, tags=["Retrieve Product Document Data"])
+async def embedd_products(payload: RetrievalRequest, mode: ResultMode = "full", admin: dict = Depends(mw.rate_limited_admin)):
     try:
-        results = retrieve_docs(db_conn, payload.query)
-        print(results[0]["text"])
+        constraints = [item.model_dump(exclude_none=True) for item in payload.filters] if payload.filters is not None else None
+        if sidecar_enabled():
+            results = (await get_async_sidecar_client().retrieve([payload.query], constraints=constraints, with_text=mode != "ids",
+                                                                 index_name=payload.index))[0]
+        else:
+            results = await run_in_threadpool(retrieve_locally, payload.query, constraints, payload.index)
         return RetrievalResponse(success=True, 
                                  status_code=200, 
                                  message="Successfully Retrieve Product Document Data", 
-                                 result=[RetrievalResult(document=item["text"], score=item["score"]) for item in results])
+                                 result=[RetrievalResult(**retrieval_result(item["id"], item["score"], item.get("text", ""), mode)) for item in results])
+    except HTTPException as e:
+        raise e
+    except SidecarError as e:
+        logger.warning("Sidecar retrieval error: %s", e)
+        raise sidecar_http_error(e)
+    except UnknownIndex:
+        raise HTTPException(status_code=404, detail=f"Unknown index {payload.index}")
     except Exception as e:
-        print("[DEBUG] Retrieval error :", str(e))
+        logger.exception("Retrieval error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def stream_batch_results(queries: List[BatchQuery], mode: str, gate: ExitStack, index_name: str = None):
+    # Chunks of BATCH_CHUNK_SIZE queries share one encode and one search, and are flushed as soon as they are ready
+    with gate:
+        for start in range(0, len(queries), BATCH_CHUNK_SIZE):
+            chunk = queries[start:start + BATCH_CHUNK_SIZE]
+            try:
+                results = retrieve_docs_batch(db_conn, [item.query for item in chunk], top_ks=[item.top_k for item in chunk], index_name=index_name)
+            except Exception as e:
+                logger.exception("Batch retrieval error: %s", e)
+                yield orjson.dumps({"error": "Batch retrieval failed"}) + b"\n"
+                return
+
+            yield from batch_lines(start, chunk, results, mode)
+
+def batch_lines(start: int, chunk: List[BatchQuery], results: list, mode: str):
+    for offset, (item, result) in enumerate(zip(chunk, results)):
+        yield orjson.dumps({
+            "index": start + offset,
+            "query": item.query,
+            "result": [retrieval_result(doc["id"], doc["score"], doc.get("text", ""), mode) for doc in result],
+        }) + b"\n"
+
+async def stream_batch_results_sidecar(queries: List[BatchQuery], mode: str, index_name: str = None):
+    # The sidecar does its own admission control, a shed chunk ends the stream like a failed one
+    client = get_async_sidecar_client()
+    for start in range(0, len(queries), BATCH_CHUNK_SIZE):
+        chunk = queries[start:start + BATCH_CHUNK_SIZE]
+        try:
+            results = await client.retrieve([item.query for item in chunk], top_ks=[item.top_k for item in chunk],
+                                            with_text=mode != "ids", timeout=SIDECAR_BATCH_TIMEOUT_SECONDS, index_name=index_name)
+        except SidecarError as e:
+            logger.warning("Sidecar batch retrieval error: %s", e)
+            yield orjson.dumps({"error": "Batch retrieval failed"}) + b"\n"
+            return
+
+        for line in batch_lines(start, chunk, results, mode):
+            yield line
+
+@app.post("/api/retrieve-documents/batch", tags=["Retrieve Product Document Data"])
+def retrieve_documents_batch(payload: BatchQueryRequest, mode: ResultMode = "full", admin: dict = Depends(mw.rate_limited_admin)):
+    if not payload.queries or len(payload.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_QUERIES} queries")
+    if any(item.top_k is not None and not 1 <= item.top_k <= BATCH_MAX_TOP_K for item in payload.queries):
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {BATCH_MAX_TOP_K}")
+    if payload.index and not sidecar_enabled() and payload.index not in get_index_registry().names():
+        raise HTTPException(status_code=404, detail=f"Unknown index {payload.index}")
+    if sidecar_enabled():
+        return StreamingResponse(stream_batch_results_sidecar(payload.queries, mode, payload.index), media_type="application/x-ndjson")
+
+    # Admit before the 200 is sent. The stream releases the gate when it ends, the background
+    # task covers a stream that never started (ExitStack.close is idempotent)
+    gate = ExitStack()
+    gate.enter_context(embedding_gate.admit())
+    return StreamingResponse(
+        stream_batch_results(payload.queries, mode, gate, payload.index),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(gate.close),
+    )
+
+@app.get("/api/products/{product_id}/similar", response_model=SimilarProductsResponse, response_model_exclude_none=True, tags=["Similar Products"])
+def similar_products(product_id: int, k: int = 10, mode: ResultMode = "full", user_payload: dict = Depends(mw.rate_limited_user)):
+    # Served from the neighbours precomputed by the embedder, no model call. With a sidecar the
+    # documents live there, and so does the table
+    if sidecar_enabled():
+        try:
+            similar = get_sidecar_client().similar(product_id, k, with_text=mode != "ids")
+        except SidecarError as e:
+            logger.warning("Sidecar similar products error: %s", e)
+            raise sidecar_http_error(e)
+    else:
+        try:
+            similar = similar_documents(product_id, k, get_id_to_doc())
+        except FileNotFoundError:
+            raise HTTPException(status_code=503, detail="Similar products are not computed yet, run the product embedding first")
+        if similar is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+    return SimilarProductsResponse(
+        success=True,
+        status_code=200,
+        message="Successfully retrieved similar products",
+        result=[RetrievalResult(**retrieval_result(item["id"], item["score"], item.get("text", ""), mode)) for item in similar],
+    )
+
+@app.get("/api/indexes", tags=["Retrieve Product Document Data"])
+def list_indexes(admin: dict = Depends(mw.admin_middleware)):
+    registry = get_index_registry()
+    resident = registry.resident()
+    return {
+        "success": True,
+        "status_code": 200,
+        "message": "Successfully retrieved indexes",
+        "budget_bytes": registry.budget_bytes,
+        "indexes": [{"name": name, "resident": name in resident, "size_bytes": resident.get(name)} for name in registry.names()],
+    }
+
+@app.post("/api/profile", tags=["Status"])
+async def profile_worker(seconds: float = 10, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, allocations: bool = True,
+                         idle: bool = False, output: Literal["json", "collapsed"] = "json", admin: dict = Depends(mw.admin_middleware)):
+    # Profiles the worker that happens to serve this request, the pid in the result tells which one.
+    # The window (up to PROFILE_MAX_SECONDS) sleeps on asyncio's default executor, not on one of the
+    # threadpool slots the sync endpoints share
+    try:
+        profile = await asyncio.to_thread(run_profile, seconds, interval_ms / 1000, allocations=allocations, include_idle=idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if output == "collapsed":
+        return PlainTextResponse("\n".join(profile["stacks"]) + "\n")
+    return {"success": True, "status_code": 200, "message": "Successfully profiled worker", **profile}
+
 @app.get("/api/rag-configurations", response_model=RagConfigResponse, tags=["Show RAG Configurations"])
 def get_rag_configurations(admin: dict = Depends(mw.admin_middleware)):
     try:
@@ -219,7 +534,7 @@ def get_rag_configurations(admin: dict = Depends(mw.admin_middleware)):
             )
         )
     except Exception as e:
-        print("[DEBUG] Retrieval RAG Configurations error:", str(e))
+        logger.exception("Retrieval RAG Configurations error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.put("/api/rag-configurations", response_model=RagConfigResponse, tags=["Update RAG Configurations"])
@@ -241,7 +556,7 @@ def update_rag_configuration(payload: UpdateRagConfigRequest, admin: dict = Depe
             )
         )
     except Exception as e:
-        print("[DEBUG] Update RAG Configurations error:", str(e))
+        logger.exception("Update RAG Configurations error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # ! uvicorn app.main:app --reload or run main.py
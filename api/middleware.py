@@ -1,9 +1,18 @@
-from fastapi import Depends, HTTPException, status
+import os
+from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from api.utils import verify_access_token
+from api.rate_limit import check_rate_limit
+from rag.telemetry import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, get_logger
+import time
+
+logger = get_logger(__name__)
 
 security = HTTPBearer()
 
+RESPONSE_COMPRESSION = (os.getenv("RESPONSE_COMPRESSION") or "gzip").lower()  # none | gzip | brotli
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE") or 1024)
+
 def get_auth_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     payload = verify_access_token(token)
@@ -29,3 +38,46 @@ def admin_middleware(payload: dict = Depends(get_auth_token)):
             detail="Unauthorized, you are not an admin."
         )
     return payload
+
+def rate_limited_user(payload: dict = Depends(user_middleware)):
+    check_rate_limit(payload)
+    return payload
+
+def rate_limited_admin(payload: dict = Depends(admin_middleware)):
+    check_rate_limit(payload)
+    return payload
+
+async def track_requests(request: Request, call_next):
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        # Label by route template (e.g. /api/products/{id}) to keep metric cardinality bounded
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.labels(method=request.method, path=route_path).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(method=request.method, path=route_path, status=str(status_code)).inc()
+
+def add_compression(app: FastAPI):
+    """
+    Compresses responses larger than COMPRESSION_MIN_SIZE bytes for clients that accept it.
+
+    Brotli needs the optional `brotli-asgi` package and falls back to gzip for clients
+    without `br` in Accept-Encoding.
+    """
+    if RESPONSE_COMPRESSION == "brotli":
+        try:
+            from brotli_asgi import BrotliMiddleware
+            app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+            return
+        except ImportError:
+            logger.warning("brotli-asgi is not installed, falling back to gzip compression")
+
+    if RESPONSE_COMPRESSION in ("gzip", "brotli"):
+        from fastapi.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
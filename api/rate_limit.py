@@ -0,0 +1,183 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from fastapi import HTTPException, status
+from rag.components import lazy_component
+from rag.telemetry import REQUESTS_SHED, ADMISSION_IN_FLIGHT, ADMISSION_WAITING
+
+RATE_LIMIT_CUSTOMER_PER_MINUTE = float(os.getenv("RATE_LIMIT_CUSTOMER_PER_MINUTE") or 20)
+RATE_LIMIT_ADMIN_PER_MINUTE = float(os.getenv("RATE_LIMIT_ADMIN_PER_MINUTE") or 120)
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST") or 5)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS") or 100000)
+
+class InMemoryRateLimiter:
+    """
+    Token buckets per key, refilled continuously at `rate` tokens per second up to `capacity`.
+
+    Buckets are kept in LRU order and capped at `max_keys`. An evicted bucket comes back full,
+    which only matters for keys idle long enough to have refilled anyway.
+    """
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, capacity: int) -> float:
+        """
+        Takes one token from the bucket of `key`.
+
+        Returns:
+            0 when the request is allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+class RedisRateLimiter:
+    """Token buckets shared by every worker, updated atomically by a Lua script on the server clock."""
+    SCRIPT = """
+    local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens')) or capacity
+    local updated_at = tonumber(redis.call('HGET', KEYS[1], 'updated_at')) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    local retry_after = 0
+    if tokens >= 1 then tokens = tokens - 1 else retry_after = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str, prefix: str = "rag:ratelimit:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def acquire(self, key: str, rate: float, capacity: int) -> float:
+        return float(self._script(keys=[self.prefix + key], args=[rate, capacity]))
+
+@lazy_component("rate_limiter")
+def get_rate_limiter():
+    url = os.getenv("RATE_LIMIT_BACKEND_URL")
+    if url:
+        return RedisRateLimiter(url)
+    return InMemoryRateLimiter()
+
+def check_rate_limit(payload: dict):
+    """
+    Charges one request to the caller's bucket and raises 429 when it is empty.
+
+    Args:
+        payload: Verified JWT payload, the bucket is keyed on its role and sub.
+    """
+    role = payload.get("role")
+    per_minute = RATE_LIMIT_ADMIN_PER_MINUTE if role == "admin" else RATE_LIMIT_CUSTOMER_PER_MINUTE
+    if per_minute <= 0:
+        return
+
+    retry_after = get_rate_limiter().acquire(f"{role}:{payload.get('sub')}", per_minute / 60, RATE_LIMIT_BURST)
+    if retry_after > 0:
+        REQUESTS_SHED.labels(gate="rate_limit", reason="rate_limited").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, slow down.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+class AdmissionGate:
+    """
+    Caps how many requests run a heavy stage at once, with a bounded wait queue in front.
+
+    Requests that find the queue full, or wait longer than `wait_timeout`, are rejected with
+    503 right away instead of piling up until the worker timeout. The cap is per process,
+    which is also the scope of the models it protects.
+    """
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, wait_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._mean_seconds = 1.0
+
+    def retry_after(self) -> int:
+        # Time for the current queue to drain at the recent mean service time
+        return max(1, math.ceil(self._mean_seconds * (self._waiting + 1) / self.max_concurrent))
+
+    def _reject(self, reason: str):
+        REQUESTS_SHED.labels(gate=self.name, reason=reason).inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later.",
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    @contextmanager
+    def admit(self):
+        with self._cond:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_waiting:
+                    self._reject("queue_full")
+
+                self._waiting += 1
+                ADMISSION_WAITING.labels(gate=self.name).inc()
+                try:
+                    admitted = self._cond.wait_for(lambda: self._active < self.max_concurrent, self.wait_timeout)
+                finally:
+                    self._waiting -= 1
+                    ADMISSION_WAITING.labels(gate=self.name).dec()
+                if not admitted:
+                    self._reject("wait_timeout")
+            self._active += 1
+            ADMISSION_IN_FLIGHT.labels(gate=self.name).inc()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self._active -= 1
+                self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * elapsed
+                ADMISSION_IN_FLIGHT.labels(gate=self.name).dec()
+                self._cond.notify()
+
+llm_gate = AdmissionGate(
+    "llm",
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT") or 1),
+    max_waiting=int(os.getenv("LLM_MAX_WAITING") or 8),
+    wait_timeout=float(os.getenv("LLM_WAIT_TIMEOUT_SECONDS") or 30),
+)
+embedding_gate = AdmissionGate(
+    "embedding",
+    max_concurrent=int(os.getenv("EMBEDDING_MAX_CONCURRENT") or 4),
+    max_waiting=int(os.getenv("EMBEDDING_MAX_WAITING") or 32),
+    wait_timeout=float(os.getenv("EMBEDDING_WAIT_TIMEOUT_SECONDS") or 5),
+)
+# Rebuilds take minutes, sharing the embedding gate would skew its Retry-After for every search
+rebuild_gate = AdmissionGate(
+    "rebuild",
+    max_concurrent=int(os.getenv("REBUILD_MAX_CONCURRENT") or 1),
+    max_waiting=int(os.getenv("REBUILD_MAX_WAITING") or 0),
+    wait_timeout=float(os.getenv("REBUILD_WAIT_TIMEOUT_SECONDS") or 0),
+)
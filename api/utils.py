@@ -1,9 +1,36 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import jwt
 from jwt import PyJWTError
 from datetime import datetime, timedelta
 import os
+from passlib.context import CryptContext
+from rag.telemetry import get_logger, span
+
+logger = get_logger(__name__)
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE") or 10000)
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS") or 300)
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS") or 2)
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING") or 32)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt gets its own small pool so a login burst queues here instead of taking every
+# thread of the shared threadpool that serves retrieval requests
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+class PasswordHasherBusy(Exception):
+    """Raised when more than BCRYPT_MAX_PENDING hash/verify calls are already queued."""
 
 def create_access_token(user_id: int, role: str, expires_delta: timedelta = None ):
     expire = datetime.utcnow() + (expires_delta or timedelta(hours=6))
@@ -17,10 +44,48 @@ def create_access_token(user_id: int, role: str, expires_delta: timedelta = None
     return encoded_jwt
 
 def verify_access_token(token: str):
+    # Key by digest so the cache never holds usable tokens
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+        if cached is not None:
+            expires_at, payload = cached
+            if now < expires_at:
+                _token_cache.move_to_end(key)
+                return payload
+            del _token_cache[key]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        print("[DEBUG] Decoded payload:", payload)
-        return payload
+        logger.debug("Verified token for sub=%s role=%s", payload.get("sub"), payload.get("role"))
     except PyJWTError as e:
-        print("[DEBUG] JWT decode error:", str(e))
+        logger.info("JWT decode error: %s", e)
         return None
+
+    # Never serve a token from the cache past its own exp claim
+    expires_at = min(float(payload.get("exp", now)), now + TOKEN_CACHE_TTL_SECONDS)
+    with _token_cache_lock:
+        _token_cache[key] = (expires_at, payload)
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+def _timed_bcrypt(func, *args):
+    with span("bcrypt"):
+        return func(*args)
+
+async def _run_bcrypt(func, *args):
+    if not _bcrypt_pending.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, _timed_bcrypt, func, *args)
+    finally:
+        _bcrypt_pending.release()
+
+async def hash_password(password: str) -> str:
+    return await _run_bcrypt(pwd_context.hash, password)
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await _run_bcrypt(pwd_context.verify, password, hashed_password)
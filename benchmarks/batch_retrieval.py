@@ -0,0 +1,76 @@
+"""
+Single-query vs batched retrieval throughput.
+
+Runs the synthetic query corpus through `retrieve_docs` one query at a time and through
+`retrieve_docs_batch` in chunks, in process, and reports queries per second and queries
+per CPU-second (process CPU time, so it is comparable across machines with different
+core counts).
+
+Usage:
+    python -m benchmarks.batch_retrieval --queries 512 --chunk-size 128 --output bench_results/batch.json
+"""
+import argparse
+import json
+import os
+import time
+from api.db.database import db_connection
+from benchmarks.corpus import generate_queries
+from rag.retriever import retrieve_docs, retrieve_docs_batch, warm_retrieval
+
+def measure(func) -> dict:
+    wall, cpu = time.perf_counter(), time.process_time()
+    count = func()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        "queries": count,
+        "elapsed_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "queries_per_second": round(count / wall, 2) if wall else 0.0,
+        "queries_per_cpu_second": round(count / cpu, 2) if cpu else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-query and batched retrieval throughput")
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--chunk-size", type=int, default=128, help="Queries per retrieve_docs_batch call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    queries = generate_queries(args.queries, seed=args.seed)
+    db_conn = db_connection()
+    warm_retrieval()
+    retrieve_docs(db_conn, queries[0])
+
+    def single():
+        for query in queries:
+            retrieve_docs(db_conn, query)
+        return len(queries)
+
+    def batched():
+        for start in range(0, len(queries), args.chunk_size):
+            retrieve_docs_batch(db_conn, queries[start:start + args.chunk_size])
+        return len(queries)
+
+    results = {"config": vars(args), "single": measure(single), "batch": measure(batched)}
+    results["speedup_per_cpu_second"] = round(
+        results["batch"]["queries_per_cpu_second"] / max(results["single"]["queries_per_cpu_second"], 1e-9), 2
+    )
+
+    print("=" * 60)
+    print("BATCH RETRIEVAL THROUGHPUT")
+    print("=" * 60)
+    for mode in ("single", "batch"):
+        summary = results[mode]
+        print(f"{mode:<7} {summary['queries_per_second']:>10} q/s  {summary['queries_per_cpu_second']:>10} q/cpu-s  ({summary['elapsed_seconds']} s)")
+    print(f"Speedup per CPU-second: {results['speedup_per_cpu_second']}x")
+    print("=" * 60)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[v] Benchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares two benchmark result files written by `benchmarks/load_test.py`.
+
+Usage:
+    python -m benchmarks.compare bench_results/base.json bench_results/head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    """
+    Prints the relative change of throughput and latency percentiles per scenario.
+
+    Args:
+        base: Results of the baseline run.
+        head: Results of the run to check.
+        threshold: Allowed regression in percent before a metric is flagged.
+
+    Returns:
+        A list of "scenario.metric" names that regressed beyond the threshold.
+    """
+    regressions = []
+    for scenario, head_summary in head["scenarios"].items():
+        base_summary = base["scenarios"].get(scenario)
+        if base_summary is None:
+            print(f"{scenario}: no baseline")
+            continue
+
+        print(f"{scenario}:")
+        # Higher is better for throughput, lower is better for latency
+        metrics = [("throughput_rps", base_summary["throughput_rps"], head_summary["throughput_rps"], -1)]
+        for key in ("p50", "p95", "p99"):
+            metrics.append((f"latency_{key}_ms", base_summary["latency_ms"][key], head_summary["latency_ms"][key], 1))
+
+        for name, base_value, head_value, direction in metrics:
+            change = (head_value - base_value) / base_value * 100 if base_value else 0.0
+            regressed = change * direction > threshold
+            if regressed:
+                regressions.append(f"{scenario}.{name}")
+            print(f"  {name:<18} {base_value:>12} -> {head_value:>12} ({change:+.1f}%){'  ⚠️ REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load test result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"Comparing {base.get('commit') or args.base} -> {head.get('commit') or args.head}")
+    regressions = compare(base, head, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Synthetic Indonesian query corpus for benchmarks.
+
+The templates are scaled up from the retrieval and generation test cases in
+`rag/retriever_evaluation.py` and `rag/inference_evaluation.py`, so the load shape
+(question types, brands, product categories) matches the real traffic of the chatbot.
+"""
+import random
+
+SEED_QUERIES = [
+    "Berikan saya rekomendasi handphone dengan brand xiaomi",
+    "Berikan saya rekomendasi serum dengan diskon terbesar",
+    "Popok bayi dengan harga paling termurah",
+    "Berapa saja kapasitas penyimpanan yang tersedia untuk Iphone 15?",
+    "Apakah produk infinix smart 8 merupakan barang baru?",
+    "Apakah produk Xiaomi Redmi A2 merupakan barang baru?",
+    "Apakah produk Lenovo Yoga Slim 7i cocok untuk kuliah informatika?",
+    "Fitur apa saja yang dimiliki produk Iphone 15?",
+    "Bagaimana cara penggunaan skincare Moisturizer SKINTIFIC?",
+]
+
+PRODUCTS = [
+    "Xiaomi 14T", "Xiaomi Redmi A2", "iPhone 15", "Infinix Smart 8", "Samsung Galaxy S25 Ultra",
+    "Lenovo Yoga Slim 7i", "Moisturizer SKINTIFIC", "serum wajah", "popok bayi", "laptop gaming",
+]
+CATEGORIES = ["handphone", "laptop", "serum", "skincare", "popok bayi", "moisturizer", "sunscreen", "tablet"]
+BRANDS = ["xiaomi", "samsung", "apple", "infinix", "lenovo", "skintific", "asus", "oppo"]
+ATTRIBUTES = ["kapasitas penyimpanan", "ukuran layar", "RAM", "garansi", "berat", "warna", "ukuran"]
+BUDGETS = ["1 juta", "2 juta", "5 juta", "10 juta", "100 ribu", "200 ribu"]
+
+TEMPLATES = [
+    "Berikan saya rekomendasi {category} dengan brand {brand}",
+    "Berikan saya rekomendasi {category} dengan diskon terbesar",
+    "{category} dengan harga paling termurah",
+    "Berapa saja {attribute} yang tersedia untuk {product}?",
+    "Apakah produk {product} merupakan barang baru?",
+    "Apakah produk {product} cocok untuk kuliah?",
+    "Fitur apa saja yang dimiliki produk {product}?",
+    "Bagaimana cara penggunaan {product}?",
+    "Berapa harga {product}?",
+    "Berapa ongkir untuk {product}?",
+    "Rekomendasi {category} di bawah {budget}",
+    "Apa perbedaan {product} dan {other_product}?",
+    "yang lebih murah dari {product} ada?",
+]
+
+def generate_queries(n: int, seed: int = 42, include_seed_queries: bool = True) -> list[str]:
+    """
+    Generates a deterministic list of synthetic Indonesian product queries.
+
+    Args:
+        n: Number of queries to generate.
+        seed: Random seed, the same seed always yields the same corpus.
+        include_seed_queries: Start the corpus with the hand-written test case queries.
+
+    Returns:
+        A list of `n` query strings.
+    """
+    rng = random.Random(seed)
+    queries = list(SEED_QUERIES[:n]) if include_seed_queries else []
+
+    while len(queries) < n:
+        template = rng.choice(TEMPLATES)
+        product, other_product = rng.sample(PRODUCTS, 2)
+        queries.append(template.format(
+            category=rng.choice(CATEGORIES),
+            brand=rng.choice(BRANDS),
+            attribute=rng.choice(ATTRIBUTES),
+            budget=rng.choice(BUDGETS),
+            product=product,
+            other_product=other_product,
+        ))
+    return queries
+
+if __name__ == "__main__":
+    for query in generate_queries(20):
+        print(query)
@@ -0,0 +1,218 @@
+"""
+Load test and latency benchmark for the API endpoints.
+
+Drives `/api/retrieve-documents`, `/api/login/user` and the chat path (`/api/query`) at a
+configurable concurrency and writes throughput, p50/p95/p99 latency and the per-stage
+breakdown scraped from `/metrics` as JSON, so runs can be compared between commits with
+`benchmarks/compare.py`.
+
+Setup (Postgres seeded from rag/data/prod.sql, the Postgres port of tokopoin.sql):
+    docker compose -f benchmarks/docker-compose.bench.yaml up -d
+    python -m benchmarks.seed_db
+    gunicorn -k uvicorn.workers.UvicornWorker api.main:app --bind 127.0.0.1:8000 --workers 1
+
+Or without a database, against the in-memory stub:
+    uvicorn benchmarks.stub_app:app --port 8000
+
+Run:
+    python -m benchmarks.load_test --scenario retrieve --scenario login \\
+        --concurrency 8 --requests 500 --output bench_results/$(git rev-parse --short HEAD).json
+
+Add --parallel to run the scenarios at the same time, e.g. to see whether a login burst
+raises the retrieval p99.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import subprocess
+import time
+from datetime import datetime, timezone
+import httpx
+from benchmarks.corpus import generate_queries
+
+BENCH_USER_EMAIL = os.getenv("BENCH_USER_EMAIL") or "bench.user@tokopoin.test"
+BENCH_ADMIN_EMAIL = os.getenv("BENCH_ADMIN_EMAIL") or "bench.admin@tokopoin.test"
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD") or "bench-password"
+
+SCENARIOS = {
+    "retrieve": {"path": "/api/retrieve-documents", "auth": "admin"},
+    "login": {"path": "/api/login/user", "auth": None},
+    "chat": {"path": "/api/query", "auth": "customer"},
+}
+
+STAGE_METRIC = re.compile(r'^rag_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.eE+-]+)$')
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+async def scrape_stages(client: httpx.AsyncClient) -> dict:
+    """Reads the cumulative sum/count of every pipeline stage histogram from /metrics."""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return {}
+
+    stages = {}
+    for line in response.text.splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            stages.setdefault(stage, {"sum": 0.0, "count": 0.0})[kind] = float(value)
+    return stages
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    breakdown = {}
+    for stage, values in after.items():
+        count = values["count"] - before.get(stage, {}).get("count", 0.0)
+        total = values["sum"] - before.get(stage, {}).get("sum", 0.0)
+        if count > 0:
+            breakdown[stage] = {"count": int(count), "mean_ms": round(total / count * 1000, 3)}
+    return breakdown
+
+async def get_token(client: httpx.AsyncClient, role: str) -> str:
+    path, email = ("/api/login/admin", BENCH_ADMIN_EMAIL) if role == "admin" else ("/api/login/user", BENCH_USER_EMAIL)
+    response = await client.post(path, json={"email": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+def build_payload(scenario: str, query: str) -> dict:
+    if scenario == "login":
+        return {"email": BENCH_USER_EMAIL, "password": BENCH_PASSWORD}
+    return {"query": query}
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, queries: list[str], concurrency: int, warmup: int) -> dict:
+    spec = SCENARIOS[scenario]
+    headers = {}
+    if spec["auth"]:
+        headers["Authorization"] = f"Bearer {await get_token(client, spec['auth'])}"
+
+    async def send(query: str):
+        start = time.perf_counter()
+        try:
+            response = await client.post(spec["path"], json=build_payload(scenario, query), headers=headers)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        return time.perf_counter() - start, status
+
+    for query in queries[:warmup]:
+        await send(query)
+
+    latencies = []
+    statuses = {}
+    work = asyncio.Queue()
+    for query in queries:
+        work.put_nowait(query)
+
+    async def worker():
+        while not work.empty():
+            latency, status = await send(work.get_nowait())
+            latencies.append(latency)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    stages_before = await scrape_stages(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stages_after = await scrape_stages(client)
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "status_codes": statuses,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "stages": stage_breakdown(stages_before, stages_after),
+    }
+
+async def run(args) -> dict:
+    queries = generate_queries(args.requests, seed=args.seed)
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "parallel": args.parallel,
+        },
+        "scenarios": {},
+    }
+    if args.parallel:
+        limits = httpx.Limits(max_connections=args.concurrency * len(args.scenario), max_keepalive_connections=args.concurrency * len(args.scenario))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        if args.parallel:
+            print(f"▶ Running {', '.join(args.scenario)} in parallel ({args.requests} requests each, concurrency {args.concurrency})")
+            summaries = await asyncio.gather(*(run_scenario(client, scenario, queries, args.concurrency, args.warmup) for scenario in args.scenario))
+            results["scenarios"] = dict(zip(args.scenario, summaries))
+            return results
+
+        for scenario in args.scenario:
+            print(f"▶ Running {scenario} ({args.requests} requests, concurrency {args.concurrency})")
+            results["scenarios"][scenario] = await run_scenario(client, scenario, queries, args.concurrency, args.warmup)
+    return results
+
+def print_report(results: dict):
+    print("=" * 60)
+    print(f"LOAD TEST SUMMARY (commit {results['commit'] or '-'})")
+    print("=" * 60)
+    for scenario, summary in results["scenarios"].items():
+        latency = summary["latency_ms"]
+        print(f"{scenario}: {summary['throughput_rps']} req/s, errors {summary['errors']}/{summary['requests']}")
+        print(f"  p50 {latency['p50']} ms | p95 {latency['p95']} ms | p99 {latency['p99']} ms | max {latency['max']} ms")
+        for stage, values in sorted(summary["stages"].items()):
+            print(f"  - {stage:<14} {values['mean_ms']:>10} ms  (n={values['count']})")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG chatbot API")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL") or "http://127.0.0.1:8000")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Repeat to run several scenarios")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic query corpus")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--parallel", action="store_true", help="Run the scenarios concurrently instead of one after another")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["retrieve", "login"]
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[v] Benchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
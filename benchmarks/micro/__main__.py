@@ -0,0 +1,60 @@
+"""
+Runs the microbenchmark suite and writes the results to a JSON file for `benchmarks.micro.compare`.
+
+Usage:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter search --scales 1000,100000,1000000 --output bench_results/micro/head.json
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import time
+# Imported for its side effect: the @benchmark decorators register the suite in BENCHMARKS
+import benchmarks.micro.suite  # noqa: F401
+from benchmarks.load_test import git_commit
+from benchmarks.micro.runner import BENCHMARKS, result_name, run
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the microbenchmark suite")
+    parser.add_argument("--filter", default="*", help="fnmatch pattern on benchmark names")
+    parser.add_argument("--scales", help="Comma separated catalog sizes for the scaled benchmarks, e.g. 1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per sample")
+    parser.add_argument("--output", help="Result file, bench_results/micro/<commit>.json by default")
+    args = parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(",")] if args.scales else None
+    results = {}
+    for bench in BENCHMARKS:
+        if not fnmatch.fnmatch(bench.name, f"*{args.filter}*" if "*" not in args.filter else args.filter):
+            continue
+        for param in (scales if bench.scaled and scales else bench.params):
+            name = result_name(bench, param)
+            try:
+                results[name] = run(bench, param, args.repeat, args.min_time)
+            except Exception as e:
+                print(f"{name:<48} failed: {e!r}")
+                continue
+            line = f"{name:<48} {results[name]['ops_per_sec']:>12.2f} ops/s"
+            if "items_per_sec" in results[name]:
+                line += f" {results[name]['items_per_sec']:>12.1f} items/s"
+            print(f"{line}  peak {results[name]['peak_alloc_bytes'] / 1024:>10.1f} KiB  {results[name]['retained_blocks']:>8} retained blocks")
+
+    commit = git_commit()
+    output = args.output or f"bench_results/micro/{commit}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+    print(f"[v] Benchmark results saved to {output}")
+
+if __name__ == "__main__":
+    main()
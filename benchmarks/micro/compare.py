@@ -0,0 +1,70 @@
+"""
+Compares two microbenchmark result files written by `benchmarks/micro/runner.py`.
+
+Usage:
+    python -m benchmarks.micro.compare bench_results/micro/base.json bench_results/micro/head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Allocation changes below this many bytes are noise from the interpreter, not the code
+MIN_ALLOC_BYTES = 4096
+
+def compare(base: dict, head: dict, threshold: float, alloc_threshold: float) -> list[str]:
+    """
+    Prints the relative change of ops/sec and allocations per benchmark.
+
+    Args:
+        base: Results of the baseline run.
+        head: Results of the run to check.
+        threshold: Allowed ops/sec regression in percent.
+        alloc_threshold: Allowed growth of peak allocation and retained blocks in percent.
+
+    Returns:
+        A list of "benchmark.metric" names that regressed beyond their threshold.
+    """
+    regressions = []
+    for name, head_result in head["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            print(f"{name}: no baseline")
+            continue
+
+        print(f"{name}:")
+        # Higher is better for throughput, lower is better for allocations
+        metrics = [
+            ("ops_per_sec", -1, threshold, 0),
+            ("peak_alloc_bytes", 1, alloc_threshold, MIN_ALLOC_BYTES),
+            ("retained_blocks", 1, alloc_threshold, 0),
+        ]
+        for metric, direction, limit, min_delta in metrics:
+            base_value, head_value = base_result[metric], head_result[metric]
+            change = (head_value - base_value) / base_value * 100 if base_value else 0.0
+            regressed = change * direction > limit and abs(head_value - base_value) > min_delta
+            if regressed:
+                regressions.append(f"{name}.{metric}")
+            print(f"  {metric:<18} {base_value:>14} -> {head_value:>14} ({change:+.1f}%){'  ⚠️ REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two microbenchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed ops/sec regression in percent")
+    parser.add_argument("--alloc-threshold", type=float, default=20.0, help="Allowed allocation growth in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"Comparing {base.get('commit') or args.base} -> {head.get('commit') or args.head}")
+    regressions = compare(base, head, args.threshold, args.alloc_threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Offline fixtures for the microbenchmarks: products parsed from the MySQL dump, scaled
+synthetic catalogs and a deterministic fake encoder.
+"""
+import random
+import re
+import zlib
+import numpy as np
+
+DUMP_FILE = "rag/data/tokopoin.sql"
+
+INSERT_RE = re.compile(r"INSERT INTO `(\w+)` \(([^)]*)\) VALUES\s*")
+TOKEN_RE = re.compile(r"'((?:[^'\\]|\\.|'')*)'|(NULL)|(-?\d+(?:\.\d+)?)|([(),;])", re.S)
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "Z": "\x1a"}
+NUMERIC_COLUMNS = ("price", "shipping_fee", "discount", "discount_percentage", "weight")
+
+def _unescape(value: str) -> str:
+    value = value.replace("''", "'")
+    return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(1)), value)
+
+def read_dump_tables(path: str = DUMP_FILE, tables: tuple = ("products", "categories", "brands", "attributes")) -> dict:
+    """
+    Parses the INSERT statements of a mysqldump file.
+
+    Returns:
+        Table name -> list of row dicts, for the requested tables.
+    """
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+
+    rows = {table: [] for table in tables}
+    for insert in INSERT_RE.finditer(sql):
+        table = insert.group(1)
+        if table not in rows:
+            continue
+        columns = [column.strip(" `") for column in insert.group(2).split(",")]
+        row, depth = None, 0
+        for token in TOKEN_RE.finditer(sql, insert.end()):
+            string, null, number, punct = token.groups()
+            if punct == "(":
+                row, depth = [], depth + 1
+            elif punct == ")":
+                rows[table].append(dict(zip(columns, row)))
+                depth -= 1
+            elif punct == ";" and depth == 0:
+                break
+            elif punct is None and row is not None:
+                row.append(_unescape(string) if string is not None else None if null else float(number) if "." in number else int(number))
+    return rows
+
+def load_products(path: str = DUMP_FILE) -> tuple:
+    """
+    Products joined with category, sub category and brand names like `get_all_products`.
+
+    Returns:
+        A tuple of the product rows and the attribute id -> name map.
+    """
+    tables = read_dump_tables(path)
+    categories = {row["id"]: row["name"] for row in tables["categories"]}
+    brands = {row["id"]: row["name"] for row in tables["brands"]}
+    products = []
+    for row in tables["products"]:
+        if row.get("deleted_at") is not None:
+            continue
+        product = dict(row)
+        # Decimal columns are quoted in the dump, psycopg2 returns them as numbers
+        for column in NUMERIC_COLUMNS:
+            if isinstance(product.get(column), str):
+                product[column] = float(product[column])
+        product["category_name"] = categories.get(row["category_id"])
+        product["sub_category_name"] = categories.get(row["sub_category_id"])
+        product["brand_name"] = brands.get(row["brand_id"])
+        products.append(product)
+    attributes = {row["id"]: row["name"] for row in tables["attributes"]}
+    return products, attributes
+
+def synthetic_catalog(products: list[dict], size: int, seed: int = 42) -> list[dict]:
+    """Scales the real catalog to `size` products with unique ids and perturbed names and prices."""
+    rng = random.Random(seed)
+    catalog = []
+    for i in range(size):
+        product = dict(products[i % len(products)])
+        product["id"] = i + 1
+        product["name"] = f"{product['name']} #{i // len(products)}"
+        product["price"] = round(float(product["price"] or 0) * rng.uniform(0.8, 1.2), -2)
+        catalog.append(product)
+    return catalog
+
+class FakeEncoder:
+    """
+    Deterministic offline stand-in for the sentence-transformers encoder.
+
+    Each token maps to a fixed random unit vector seeded by its CRC32 and a text is the
+    normalized sum of its tokens, so similar texts still land close to each other.
+    """
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self._cache = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._cache.get(token)
+        if vector is None:
+            vector = np.random.default_rng(zlib.crc32(token.encode())).standard_normal(self.dim).astype(np.float32)
+            self._cache[token] = vector
+        return vector
+
+    def encode(self, texts: list[str], batch_size: int = 32, convert_to_numpy: bool = True, normalize_embeddings: bool = True) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                embeddings[row] += self._token_vector(token)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+def random_vectors(n: int, dim: int, seed: int = 42) -> np.ndarray:
+    """Unit vectors for catalogs too large to encode, generated in chunks to bound peak memory."""
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 65536):
+        chunk = rng.standard_normal((min(65536, n - start), dim), dtype=np.float32)
+        vectors[start:start + len(chunk)] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
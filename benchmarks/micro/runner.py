@@ -0,0 +1,101 @@
+"""
+Minimal asv-style microbenchmark runner.
+
+Benchmarks are registered with `@benchmark`, optionally parametrized. For each parameter
+`setup(param)` builds the state outside the timed region, then the benchmark is called
+`number` times per sample (calibrated so a sample takes at least `min_time`) for `repeat`
+samples. One extra call runs under tracemalloc to record its peak allocation and what it retains.
+The command line lives in `benchmarks/micro/__main__.py`.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+
+BENCHMARKS = []
+
+class Benchmark:
+    def __init__(self, name: str, func, params: list, setup, items, scaled: bool):
+        self.name = name
+        self.func = func
+        self.params = params
+        self.setup = setup
+        self.items = items
+        self.scaled = scaled
+
+def benchmark(name: str = None, params: list = None, setup=None, items=None, scaled: bool = False):
+    """
+    Registers a benchmark.
+
+    Args:
+        name: Benchmark name, the function name when omitted.
+        params: Parameter values, each one is a separate result ("name[param]").
+        setup: Called with the parameter, returns the state passed to the benchmark.
+        items: Called with the state, returns how many items one call processes, to report items/sec.
+        scaled: The parameter is a catalog size, replaced by --scales on the command line.
+    """
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name or func.__name__, func, params or [None], setup or (lambda param: param), items, scaled))
+        return func
+    return decorator
+
+def time_samples(func, state, repeat: int, min_time: float) -> tuple:
+    # Calibrate the calls per sample like timeit.autorange, a single slow call is its own sample
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func(state)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / number]
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                func(state)
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples, number
+
+def measure_allocations(func, state) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(state)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {"peak_alloc_bytes": peak - baseline, "retained_bytes": current - baseline, "retained_blocks": blocks}
+
+def run(bench: Benchmark, param, repeat: int, min_time: float) -> dict:
+    state = bench.setup(param)
+    samples, number = time_samples(bench.func, state, repeat, min_time)
+    median = statistics.median(samples)
+    result = {
+        "ops_per_sec": round(1 / median, 3) if median else 0.0,
+        "median_seconds": median,
+        "stdev_seconds": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": len(samples),
+        "number": number,
+    }
+    if bench.items is not None:
+        result["items"] = bench.items(state)
+        result["items_per_sec"] = round(result["items"] / median, 1) if median else 0.0
+    result.update(measure_allocations(bench.func, state))
+    return result
+
+def result_name(bench: Benchmark, param) -> str:
+    return bench.name if param is None else f"{bench.name}[{param}]"
@@ -0,0 +1,85 @@
+"""
+Microbenchmarks of the document, cleaning and retrieval hot paths.
+
+Fixtures come from `rag/data/tokopoin.sql` and synthetic catalogs scaled from it, queries
+are encoded with `FakeEncoder`, so nothing needs a database, a GPU or the network.
+"""
+from functools import lru_cache
+import faiss
+import numpy as np
+import rag.helpers.cleaning as c
+from rag.helpers.document_utils import product_page_content, generate_product_documents
+from rag.retriever import search
+from rag.shards import ReadWriteLock, UNSHARDED
+from benchmarks.corpus import generate_queries
+from benchmarks.micro.fixtures import FakeEncoder, load_products, synthetic_catalog, random_vectors
+from benchmarks.micro.runner import benchmark
+
+EMBEDDING_DIM = 1024  # bge-m3
+TOP_K = 5
+
+@lru_cache(maxsize=None)
+def real_catalog() -> tuple:
+    return load_products()
+
+@lru_cache(maxsize=None)
+def descriptions() -> tuple:
+    return tuple(product["description"] or "" for product in real_catalog()[0])
+
+@lru_cache(maxsize=None)
+def plain_descriptions() -> tuple:
+    return tuple(c.clean_html(text) for text in descriptions())
+
+# Cleaning steps, each over every product description of the dump. clean_html gets the raw
+# HTML, the text-level steps get its output like in `clean_page_content`.
+CLEANING_STEPS = [
+    ("clean_html", c.clean_html, descriptions),
+    ("normalize_whitespace", c.normalize_whitespace, plain_descriptions),
+    ("normalize_punctuation", c.normalize_punctuation, plain_descriptions),
+    ("decode_html_entities", c.decode_html_entities, plain_descriptions),
+    ("remove_non_informative", c.remove_non_informative, plain_descriptions),
+    ("remove_emoji", c.remove_emoji, plain_descriptions),
+    ("remove_special_symbols", c.remove_special_symbols, plain_descriptions),
+    ("remove_accents", c.remove_accents, plain_descriptions),
+]
+
+def _register_cleaning(name, func, texts):
+    @benchmark(name=f"cleaning.{name}", setup=lambda param: texts(), items=len)
+    def run(state):
+        for text in state:
+            func(text)
+
+for _name, _func, _texts in CLEANING_STEPS:
+    _register_cleaning(_name, _func, _texts)
+
+@benchmark(name="document_utils.product_page_content", setup=lambda param: real_catalog(), items=lambda state: len(state[0]))
+def page_content(state):
+    products, attributes = state
+    for product in products:
+        product_page_content(product=product, attributes_data=attributes)
+
+def catalog_setup(size: int) -> tuple:
+    products, attributes = real_catalog()
+    return synthetic_catalog(products, size), attributes
+
+@benchmark(name="document_utils.generate_product_documents", params=[1000], setup=catalog_setup,
+           items=lambda state: len(state[0]), scaled=True)
+def product_documents(state):
+    products, attributes = state
+    generate_product_documents(products, attributes)
+
+def search_setup(size: int, batch: int) -> dict:
+    # One flat IP shard like the embedder builds, catalog vectors are random at scale
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+    index.add_with_ids(random_vectors(size, EMBEDDING_DIM), np.arange(1, size + 1, dtype=np.int64))
+    queries = FakeEncoder(EMBEDDING_DIM).encode(generate_queries(batch, include_seed_queries=False))
+    return {"shards": {UNSHARDED: {"index": index, "sparse": None, "lock": ReadWriteLock()}}, "queries": queries}
+
+@benchmark(name="retriever.search", params=[1000, 100000], setup=lambda size: search_setup(size, 1), scaled=True)
+def faiss_search(state):
+    search(state["queries"], None, TOP_K, shards=state["shards"])
+
+@benchmark(name="retriever.search_batch32", params=[1000, 100000], setup=lambda size: search_setup(size, 32),
+           items=lambda state: len(state["queries"]), scaled=True)
+def faiss_search_batch(state):
+    search(state["queries"], None, TOP_K, shards=state["shards"])
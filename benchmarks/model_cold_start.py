@@ -0,0 +1,94 @@
+"""
+LLM cold start: quantize-on-load from the full-precision checkpoint vs the pre-quantized artifact cache.
+
+Loads the model several times through `load_quantized` with an empty cache (reads the
+bf16 checkpoint and quantizes to nf4), exports it once, then loads it again from the
+cache. Checks both models produce the same greedy tokens. bitsandbytes nf4 runs on CPU,
+so the default tiny randomly initialised Llama needs no GPU and no download.
+
+Usage:
+    python -m benchmarks.model_cold_start
+    python -m benchmarks.model_cold_start --model HuggingFaceTB/SmolLM2-135M-Instruct --runs 3 --output bench_results/cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from rag.model_cache import artifact_path, export_quantized, load_quantized, nf4_settings
+
+def tiny_checkpoint(path: str) -> str:
+    import torch
+    from transformers import AutoModelForCausalLM, LlamaConfig
+
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=32000, hidden_size=512, intermediate_size=1536, num_hidden_layers=8,
+                         num_attention_heads=8, num_key_value_heads=4)
+    AutoModelForCausalLM.from_config(config).to(torch.bfloat16).save_pretrained(path)
+    return path
+
+def timed_loads(model_id: str, cache_dir: str, runs: int) -> tuple:
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model = load_quantized(model_id, nf4_settings(), cache_dir=cache_dir, device_map="cpu", export_on_miss=False)
+        seconds.append(time.perf_counter() - start)
+    return model, seconds
+
+def greedy(model, steps: int = 16) -> list[int]:
+    import torch
+    ids = torch.tensor([[1, 450, 4996, 17354, 1701]])
+    with torch.no_grad():
+        return model.generate(ids, max_new_tokens=steps, do_sample=False)[0].tolist()
+
+def summary(seconds: list[float]) -> dict:
+    return {"runs": len(seconds), "median_seconds": round(statistics.median(seconds), 3), "min_seconds": round(min(seconds), 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start of the quantized LLM with and without the artifact cache")
+    parser.add_argument("--model", help="Model id or local checkpoint, a tiny random Llama when omitted")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_id = args.model or tiny_checkpoint(os.path.join(workdir, "tiny-llama"))
+        cache_dir = os.path.join(workdir, "model_cache")
+
+        quantized, checkpoint_seconds = timed_loads(model_id, cache_dir, args.runs)
+        export_start = time.perf_counter()
+        path = export_quantized(quantized, model_id, nf4_settings(), cache_dir=cache_dir, max_shard_size="100MB")
+        export_seconds = time.perf_counter() - export_start
+        cached, cache_seconds = timed_loads(model_id, cache_dir, args.runs)
+
+        shards = [name for name in os.listdir(path) if name.endswith(".safetensors")]
+        results = {
+            "model": args.model or "tiny-random-llama",
+            "checkpoint": summary(checkpoint_seconds),
+            "cache": summary(cache_seconds),
+            "export_seconds": round(export_seconds, 3),
+            "artifact": {"key": os.path.basename(artifact_path(model_id, nf4_settings(), cache_dir)), "shards": len(shards),
+                         "bytes": sum(os.path.getsize(os.path.join(path, name)) for name in shards)},
+            "identical_output": greedy(quantized) == greedy(cached),
+        }
+
+    speedup = results["checkpoint"]["median_seconds"] / results["cache"]["median_seconds"]
+    print("=" * 72)
+    print(f"LLM COLD START ({results['model']}, nf4, {args.runs} runs each)")
+    print("=" * 72)
+    print(f"Quantize on load : {results['checkpoint']['median_seconds']:>8.3f}s median")
+    print(f"Artifact cache   : {results['cache']['median_seconds']:>8.3f}s median ({speedup:.1f}x faster)")
+    print(f"Export           : {results['export_seconds']:>8.3f}s, {results['artifact']['shards']} shard(s), "
+          f"{results['artifact']['bytes'] / 1e6:.1f} MB")
+    print(f"Identical output : {results['identical_output']}")
+    print("=" * 72)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[v] Benchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Serialization time and bytes on the wire of top-k retrieval responses.
+
+Builds a top-k `RetrievalResponse` from the real product documents in CHUNK_FILE and
+reports, for each result mode (full / snippet / ids):
+  - serialization time of stdlib json (the JSONResponse path), Pydantic `model_dump_json`
+    (FastAPI's path when a response_model is set) and orjson
+  - payload size raw, gzip and brotli (when the `brotli` package is installed)
+  - bytes on the wire through the app and its compression middleware, per Accept-Encoding
+
+The wire measurement runs in process against `benchmarks.stub_app` with retrieval replaced
+by a fixed result list, so no model or database is needed.
+
+Usage:
+    python -m benchmarks.response_size --top-k 20 --output bench_results/response_size.json
+"""
+import argparse
+import gzip
+import json
+import os
+import pickle
+import time
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+def load_documents() -> list[str]:
+    with open(os.getenv("CHUNK_FILE") or "rag/data/chunk_texts.pkl", "rb") as f:
+        documents = pickle.load(f)
+    return list(documents.values()) if isinstance(documents, dict) else list(documents)
+
+def time_per_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def compressed_sizes(body: bytes) -> dict:
+    sizes = {"raw": len(body), "gzip": len(gzip.compress(body, compresslevel=9))}
+    try:
+        import brotli
+        sizes["brotli"] = len(brotli.compress(body))
+    except ImportError:
+        pass
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure retrieval response serialization and size")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("JWT_SECRET_KEY", "response-size-benchmark-secret-key")
+    os.environ["RATE_LIMIT_ADMIN_PER_MINUTE"] = "0"
+    from fastapi.testclient import TestClient
+    # The stub patches the database module, so it has to be imported before api.main
+    from benchmarks.stub_app import app
+    import api.main as main_module
+    from api.utils import create_access_token
+
+    documents = load_documents()
+    hits = [{"id": i, "text": documents[i % len(documents)], "score": 1.0 - i / 100} for i in range(args.top_k)]
+    main_module.retrieve_docs = lambda db_conn, query: hits
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token(user_id=1, role='admin')}"}
+
+    results = {"config": vars(args), "modes": {}}
+    for mode in ("full", "snippet", "ids"):
+        response = main_module.RetrievalResponse(
+            success=True,
+            status_code=200,
+            message="Successfully Retrieve Product Document Data",
+            result=[main_module.RetrievalResult(**main_module.retrieval_result(hit["id"], hit["score"], hit["text"], mode)) for hit in hits],
+        )
+        as_dict = response.model_dump(exclude_none=True)
+        body = orjson.dumps(as_dict)
+
+        wire = {}
+        for encoding in ("identity", "gzip", "br"):
+            reply = client.post(
+                "/api/retrieve-documents", params={"mode": mode}, json={"query": "bench"},
+                headers={**headers, "Accept-Encoding": encoding},
+            )
+            reply.raise_for_status()
+            wire[encoding] = {"bytes": reply.num_bytes_downloaded, "content_encoding": reply.headers.get("content-encoding", "identity")}
+
+        results["modes"][mode] = {
+            "serialize_us": {
+                "stdlib_json": round(time_per_call(lambda: json.dumps(jsonable_encoder(response, exclude_none=True), ensure_ascii=False, separators=(",", ":")).encode(), args.repeat), 2),
+                "pydantic_dump_json": round(time_per_call(lambda: response.model_dump_json(exclude_none=True), args.repeat), 2),
+                "orjson": round(time_per_call(lambda: orjson.dumps(response.model_dump(exclude_none=True)), args.repeat), 2),
+            },
+            "payload_bytes": compressed_sizes(body),
+            "wire": wire,
+        }
+
+    print("=" * 72)
+    print(f"RETRIEVAL RESPONSE SIZE (top-k {args.top_k})")
+    print("=" * 72)
+    for mode, summary in results["modes"].items():
+        serialize, payload = summary["serialize_us"], summary["payload_bytes"]
+        print(f"{mode}:")
+        print("  serialize  " + " | ".join(f"{name} {value} us" for name, value in serialize.items()))
+        print("  payload    " + " | ".join(f"{name} {value} B" for name, value in payload.items()))
+        print("  wire       " + " | ".join(f"{enc} {value['bytes']} B ({value['content_encoding']})" for enc, value in summary["wire"].items()))
+    print("=" * 72)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[v] Benchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Top-k result cache on a Zipf-distributed replay of a query log.
+
+Real traffic is heavily skewed, a few questions (promo products, "rekomendasi hp murah")
+make up most of it. The replay draws queries from the log with probability proportional
+to 1 / rank^s and runs them through `retrieve_docs` twice: once with the cache cleared
+before every query (the uncached baseline) and once starting from an empty cache, reporting
+the hit ratio, latency percentiles and throughput of both.
+
+The log is one query per line (e.g. exported from the chat history), the synthetic
+corpus is used when none is given. The index must carry a version stamped by the
+embedder, unversioned indexes are never cached. Set RESULT_CACHE_MAX_ENTRIES to try
+smaller caches.
+
+Usage:
+    python -m benchmarks.result_cache --requests 5000 --zipf 1.1 --output bench_results/result_cache.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+import numpy as np
+from prometheus_client import REGISTRY
+from api.db.database import db_connection
+from benchmarks.corpus import generate_queries
+from rag.result_cache import get_result_cache
+from rag.retriever import retrieve_docs, warm_retrieval, get_index_version
+
+def zipf_replay(queries: list[str], requests: int, s: float, seed: int) -> list[str]:
+    """Samples `requests` queries, the query at rank k with probability proportional to 1 / k^s."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(queries) + 1) ** s
+    ranks = rng.choice(len(queries), size=requests, p=weights / weights.sum())
+    return [queries[rank] for rank in ranks]
+
+def cache_hits() -> float:
+    return REGISTRY.get_sample_value("rag_result_cache_requests_total", {"result": "hit"}) or 0.0
+
+def replay(db_conn, stream: list[str], cached: bool) -> dict:
+    cache = get_result_cache()
+    cache.clear()
+    hits = cache_hits()
+    latencies = []
+    wall = time.perf_counter()
+    for query in stream:
+        if not cached:
+            cache.clear()
+        start = time.perf_counter()
+        retrieve_docs(db_conn, query)
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(stream),
+        "hit_ratio": round((cache_hits() - hits) / len(stream), 4),
+        "queries_per_second": round(len(stream) / wall, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "cache_entries": len(cache),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a Zipf-distributed query log with and without the result cache")
+    parser.add_argument("--log", help="Query log, one query per line, the synthetic corpus when omitted")
+    parser.add_argument("--distinct", type=int, default=1000, help="Distinct synthetic queries when no log is given")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent s, higher is more skewed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            # Rank the distinct queries by how often they were asked
+            queries = [query for query, _ in Counter(line.strip() for line in f if line.strip()).most_common()]
+    else:
+        # The corpus repeats templates, duplicates would merge ranks and inflate the hit ratio
+        queries = list(dict.fromkeys(generate_queries(args.distinct, seed=args.seed)))
+    stream = zipf_replay(queries, args.requests, args.zipf, args.seed)
+
+    db_conn = db_connection()
+    warm_retrieval()
+    if get_index_version().value is None:
+        print("[!] The index has no version, rebuild it with the embedder to enable the result cache")
+        return
+    retrieve_docs(db_conn, queries[0])
+
+    results = {
+        "config": {**vars(args), "distinct_queries": len(queries), "cache_max_entries": get_result_cache().max_entries},
+        "uncached": replay(db_conn, stream, cached=False),
+        "cached": replay(db_conn, stream, cached=True),
+    }
+    results["speedup"] = round(results["cached"]["queries_per_second"] / max(results["uncached"]["queries_per_second"], 1e-9), 2)
+
+    print("=" * 60)
+    print(f"RESULT CACHE, ZIPF s={args.zipf} OVER {len(queries)} QUERIES")
+    print("=" * 60)
+    for mode in ("uncached", "cached"):
+        summary = results[mode]
+        print(f"{mode:<9} hit {summary['hit_ratio']:>6.1%}  {summary['queries_per_second']:>9} q/s  "
+              f"p50 {summary['p50_ms']:>8} ms  p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms")
+    print(f"Speedup: {results['speedup']}x")
+    print("=" * 60)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[v] Benchmark results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Creates the customer and admin accounts used by the benchmarks.
+
+Run after the Postgres container from `benchmarks/docker-compose.bench.yaml` has loaded
+`rag/data/prod.sql`. Credentials are read from BENCH_USER_EMAIL, BENCH_ADMIN_EMAIL and
+BENCH_PASSWORD (see `benchmarks/load_test.py` for the defaults).
+"""
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+import api.db.database as db
+from benchmarks.load_test import BENCH_USER_EMAIL, BENCH_ADMIN_EMAIL, BENCH_PASSWORD
+
+load_dotenv()
+
+def seed(conn):
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+
+    if not db.get_user(conn, BENCH_USER_EMAIL):
+        db.create_user(conn, "Bench User", BENCH_USER_EMAIL, "080000000000", hashed_password)
+        print(f"✅ Created customer {BENCH_USER_EMAIL}")
+
+    if not db.get_admin(conn, BENCH_ADMIN_EMAIL):
+        cursor = conn.cursor()
+        cursor.execute(
+            # The dump inserts admins with explicit ids, so the sequence is not advanced
+            "INSERT INTO admins (id, name, user_name, email, password, status) "
+            "VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM admins), %s, %s, %s, %s, '1')",
+            ("Bench Admin", "bench-admin", BENCH_ADMIN_EMAIL, hashed_password),
+        )
+        conn.commit()
+        cursor.close()
+        print(f"✅ Created admin {BENCH_ADMIN_EMAIL}")
+
+if __name__ == "__main__":
+    conn = db.db_connection()
+    seed(conn)
+    conn.close()
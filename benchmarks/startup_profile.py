@@ -0,0 +1,93 @@
+"""
+Startup profile of the API process.
+
+Prints an import-time breakdown of `api.main` (via `python -X importtime`) and, optionally,
+the load time of every lazily loaded component once the process is warmed up.
+
+Usage:
+    python -m benchmarks.startup_profile --top 25
+    python -m benchmarks.startup_profile --warm --output startup_profile.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+def profile_imports(module: str = "api.main") -> list[dict]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime` and parses the report.
+
+    Args:
+        module: Dotted module path to import.
+
+    Returns:
+        A list of {"module", "self_us", "cumulative_us"} entries, one per imported module.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            "module": name.rstrip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return entries
+
+def profile_warmup() -> dict:
+    from rag.retriever import warm_retrieval
+    from rag.components import component_status
+
+    start = time.perf_counter()
+    warm_retrieval()
+    return {"retrieval_ready_seconds": round(time.perf_counter() - start, 3), "components": component_status()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and warmup profile of the API")
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest imports to show")
+    parser.add_argument("--warm", action="store_true", help="Also load retrieval components and time them")
+    parser.add_argument("--output", help="Write the full profile as JSON to this path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    entries = profile_imports(args.module)
+    wall = time.perf_counter() - start
+    root = next((e for e in entries if e["module"].strip() == args.module), None)
+
+    print("=" * 60)
+    print(f"IMPORT PROFILE: {args.module}")
+    print("=" * 60)
+    print(f"Interpreter wall time : {wall:.3f}s")
+    if root:
+        print(f"Import cumulative     : {root['cumulative_us'] / 1e6:.3f}s")
+    print()
+    print(f"{'cumulative [s]':>15} {'self [s]':>10}  module")
+    for entry in sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:args.top]:
+        print(f"{entry['cumulative_us'] / 1e6:>15.3f} {entry['self_us'] / 1e6:>10.3f}  {entry['module']}")
+
+    profile = {"module": args.module, "wall_seconds": round(wall, 3), "imports": entries}
+    if args.warm:
+        profile["warmup"] = profile_warmup()
+        print()
+        print(f"Retrieval ready after : {profile['warmup']['retrieval_ready_seconds']}s")
+        for name, status in profile["warmup"]["components"].items():
+            print(f"  {name:<20} warm={status['warm']} load_seconds={status['load_seconds']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(profile, f, indent=2)
+        print(f"\n[v] Startup profile saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
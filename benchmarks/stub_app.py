@@ -0,0 +1,62 @@
+"""
+API app backed by an in-memory stand-in for Postgres.
+
+Lets the load test run without a seeded database: users, admins and the RAG
+configuration live in process memory, retrieval and the LLM still run for real.
+
+Logins work without any model, so the login scenario runs with nothing but the app. Tokens
+are still signed, JWT_SECRET_KEY must be set or every login fails with 500.
+
+Usage:
+    JWT_SECRET_KEY=... uvicorn benchmarks.stub_app:app --port 8000
+"""
+from datetime import datetime
+import itertools
+import threading
+from passlib.context import CryptContext
+import api.db.database as db
+from benchmarks.load_test import BENCH_USER_EMAIL, BENCH_ADMIN_EMAIL, BENCH_PASSWORD
+
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_hashed_password = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(BENCH_PASSWORD)
+_users = {BENCH_USER_EMAIL: {"id": next(_ids), "email": BENCH_USER_EMAIL, "password": _hashed_password}}
+_admins = {BENCH_ADMIN_EMAIL: {"id": 1, "email": BENCH_ADMIN_EMAIL, "password": _hashed_password}}
+_rag_config = {
+    "main_instruction": "You are a highly accurate e-commerce chatbot assistant expert.",
+    "critical_instruction": "ALWAYS respond in Bahasa Indonesia.",
+    "additional_guideline": "Use a friendly, professional tone typical of Indonesian customer service.",
+    "retriever_instruction": "Given a product search query, retrieve relevant product passages that answer the query",
+    "top_k_retrieval": 5,
+    "created_at": datetime(2025, 6, 27),
+    "updated_at": datetime(2025, 6, 27),
+}
+
+def get_user(conn, email: str):
+    return _users.get(email)
+
+def get_admin(conn, email: str):
+    return _admins.get(email)
+
+def create_user(conn, name: str, email: str, phone_number: str, hashed_password: str):
+    with _lock:
+        user_id = next(_ids)
+        _users[email] = {"id": user_id, "email": email, "password": hashed_password}
+    return user_id
+
+def get_rag_configuration(conn):
+    return dict(_rag_config)
+
+def update_rag_configuration(conn, data: dict):
+    _rag_config.update(data, updated_at=datetime.now())
+    return dict(_rag_config)
+
+# Patch before api.main is imported so every `from api.db.database import ...` binds the stubs
+db.db_connection = lambda: None
+db.get_user = get_user
+db.get_admin = get_admin
+db.create_user = create_user
+db.get_rag_configuration = get_rag_configuration
+db.update_rag_configuration = update_rag_configuration
+
+from api.main import app  # noqa: E402
@@ -0,0 +1,136 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+The first request for a key runs the work, requests arriving with the same key while it
+runs wait for its result instead of repeating it. The flight is dropped as soon as it
+finishes, so nothing is cached: a request arriving afterwards starts a new flight.
+
+A flight can also publish partial results (the tokens of a streamed answer). Late joiners
+first replay what was published so far, then follow the live stream.
+
+Followers hold a thread while they wait, so they are bounded: beyond COALESCING_MAX_FOLLOWERS
+a caller runs the work itself (through the same admission as any leader), and a follower
+waiting longer than COALESCING_WAIT_TIMEOUT_SECONDS gets FlightTimeout.
+"""
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from rag.telemetry import COALESCED_REQUESTS
+
+COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "true").lower() == "true"
+COALESCING_MAX_FOLLOWERS = int(os.getenv("COALESCING_MAX_FOLLOWERS") or 16)
+COALESCING_WAIT_TIMEOUT_SECONDS = float(os.getenv("COALESCING_WAIT_TIMEOUT_SECONDS") or 120)
+
+class FlightTimeout(TimeoutError):
+    pass
+
+def normalize_query(query: str) -> str:
+    # Casing, spacing and trailing punctuation do not change what is being asked
+    return " ".join(query.casefold().split()).rstrip("?!. ")
+
+class Flight:
+    """One computation in progress, its result and the chunks it streamed so far."""
+    def __init__(self):
+        self.future = Future()
+        self.chunks = []
+        self.followers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, result=None, error: BaseException = None):
+        with self._cond:
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+            self._cond.notify_all()
+
+    def result(self, timeout: float = None):
+        try:
+            return self.future.result(timeout)
+        except FutureTimeout:
+            raise FlightTimeout(f"No result within {timeout}s")
+
+    def stream(self, timeout: float = None):
+        """
+        Yields every published chunk from the first one, then raises the flight's error if it failed.
+
+        A flight that published nothing yields its whole result at the end. `timeout` bounds
+        each wait for the next chunk.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: sent < len(self.chunks) or self.future.done(), timeout):
+                    raise FlightTimeout(f"Nothing new within {timeout}s")
+                chunks = self.chunks[sent:]
+                done = self.future.done()
+            sent += len(chunks)
+            yield from chunks
+            if done and sent == len(self.chunks):
+                break
+        result = self.future.result()
+        if not sent and result:
+            yield result
+
+class SingleFlight:
+    """
+    Flights by key for one kind of work (retrieval, answers).
+
+    Callers are threads (sync endpoints run in the threadpool), followers block on the
+    leader's future for at most `wait_timeout` seconds.
+    """
+    def __init__(self, name: str, max_followers: int = COALESCING_MAX_FOLLOWERS, wait_timeout: float = COALESCING_WAIT_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_followers = max_followers
+        self.wait_timeout = wait_timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key) -> tuple[Flight, bool]:
+        """
+        Returns the flight of `key` and whether the caller leads it.
+
+        The leader must end the flight with `finish`, a None key is never shared. A caller
+        finding the flight full leads a private one.
+        """
+        if key is None:
+            COALESCED_REQUESTS.labels(flight=self.name, role="leader").inc()
+            return Flight(), True
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight, role = Flight(), "leader"
+                self._flights[key] = flight
+            elif flight.followers >= self.max_followers:
+                flight, role = Flight(), "overflow"
+            else:
+                flight.followers += 1
+                role = "follower"
+        COALESCED_REQUESTS.labels(flight=self.name, role=role).inc()
+        return flight, role != "follower"
+
+    def finish(self, key, flight: Flight, result=None, error: BaseException = None):
+        # Drop the flight first, a request arriving after the result is out starts fresh
+        with self._lock:
+            if key is not None and self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(result, error)
+
+    def run(self, key, func, *args, **kwargs):
+        """Runs `func(*args, **kwargs)` once per concurrent key and returns its result to every caller."""
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.result(self.wait_timeout)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result
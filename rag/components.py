@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from functools import wraps
+from dotenv import load_dotenv
+from rag.telemetry import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID") or "BAAI/bge-m3"
+
+_lock = threading.RLock()
+_loaders = {}
+_instances = {}
+_load_seconds = {}
+
+def lazy_component(name: str):
+    """
+    Registers a loader as a named, lazily created component.
+
+    The decorated function is only executed on the first call, the result is kept in
+    memory and returned on every next call. Loading is guarded by a lock so concurrent
+    requests never load the same heavy model twice.
+
+    Args:
+        name: Component name reported by `component_status`.
+
+    Returns:
+        A decorator wrapping the loader into a cached accessor.
+    """
+    def decorator(loader):
+        _loaders[name] = loader
+
+        @wraps(loader)
+        def accessor():
+            # One read, a concurrent reset_component must not turn a hit into a KeyError
+            instance = _instances.get(name)
+            if instance is not None:
+                return instance
+
+            with _lock:
+                instance = _instances.get(name)
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = _instances[name] = loader()
+                    _load_seconds[name] = round(time.perf_counter() - start, 3)
+                    logger.info("Loaded %s in %ss", name, _load_seconds[name])
+                return instance
+
+        return accessor
+    return decorator
+
+def is_warm(name: str) -> bool:
+    return name in _instances
+
+def reset_component(name: str):
+    """Drops a loaded component so the next access reloads it (e.g. after re-indexing)."""
+    with _lock:
+        _instances.pop(name, None)
+        _load_seconds.pop(name, None)
+
+def replace_component(name: str, instance):
+    """Swaps a loaded component for a new instance, callers holding the old one keep using it."""
+    with _lock:
+        _instances[name] = instance
+
+def component_status() -> dict:
+    return {
+        name: {"warm": name in _instances, "load_seconds": _load_seconds.get(name)}
+        for name in _loaders
+    }
+
+@lazy_component("embedding_tokenizer")
+def get_embedding_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(EMBEDDING_MODEL_ID)
+
+@lazy_component("embedding_model")
+def get_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_ID)
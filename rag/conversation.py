@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from rag.components import lazy_component
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS") or 1800)
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT") or 10000)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET") or 1024)
+
+def copy_session(session: dict) -> dict:
+    return {"summary": session["summary"], "turns": [list(turn) for turn in session["turns"]]}
+
+class InMemorySessionStore:
+    """
+    In-process session store with TTL expiry and a hard cap on the number of sessions.
+
+    Sessions are kept in write order, which is also expiry order, so the least recently
+    saved session is evicted first once `max_sessions` is reached. Reads return a copy,
+    like the Redis store, so callers never mutate the stored session in place.
+    """
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_COUNT):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+
+            expires_at, session = item
+            if expires_at < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            return copy_session(session)
+
+    def set(self, session_id: str, session: dict):
+        session = copy_session(session)
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, session)
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest entries sit at the front, stop at the first one still alive
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at >= now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+class RedisSessionStore:
+    """Session store backed by any Redis-compatible server, expiry is handled by the server."""
+    def __init__(self, url: str, ttl_seconds: int = SESSION_TTL_SECONDS, prefix: str = "rag:session:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, session_id: str):
+        raw = self.client.get(self.prefix + session_id)
+        return json.loads(raw) if raw else None
+
+    def set(self, session_id: str, session: dict):
+        self.client.setex(self.prefix + session_id, self.ttl_seconds, json.dumps(session, separators=(",", ":")))
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+@lazy_component("session_store")
+def get_session_store():
+    url = os.getenv("SESSION_STORE_URL")
+    if url:
+        return RedisSessionStore(url)
+    return InMemorySessionStore()
+
+def session_key(payload: dict) -> str:
+    # Customers and admins have separate id sequences, keep their sessions apart
+    return f"{payload.get('role')}:{payload.get('sub')}"
+
+def new_session() -> dict:
+    return {"summary": "", "turns": []}
+
+def load_session(session_id: str) -> dict:
+    return get_session_store().get(session_id) or new_session()
+
+def save_session(session_id: str, session: dict):
+    get_session_store().set(session_id, session)
+
+def clear_session(session_id: str):
+    get_session_store().delete(session_id)
+
+def has_history(session: dict) -> bool:
+    return bool(session["summary"] or session["turns"])
+
+def append_turn(session: dict, query: str, answer: str, count_tokens, summarize, token_budget: int = HISTORY_TOKEN_BUDGET) -> dict:
+    """
+    Appends a question/answer pair and keeps the verbatim history inside the token budget.
+
+    Turns that no longer fit are folded into the running summary, so older context is
+    summarized incrementally instead of being re-summarized from scratch on every turn.
+
+    Args:
+        session: Session dict with "summary" and "turns" keys.
+        query: The user question of the current turn.
+        answer: The generated answer of the current turn.
+        count_tokens: Callable returning the token count of a string.
+        summarize: Callable (previous_summary, evicted_turns) -> new summary.
+        token_budget: Maximum number of tokens kept as verbatim turns.
+
+    Returns:
+        The updated session dict.
+    """
+    session["turns"].append(["user", query, count_tokens(query)])
+    session["turns"].append(["assistant", answer, count_tokens(answer)])
+
+    evicted = []
+    # Always keep the latest pair verbatim, even when it alone exceeds the budget
+    while len(session["turns"]) > 2 and sum(turn[2] for turn in session["turns"]) > token_budget:
+        evicted.extend(session["turns"][:2])
+        session["turns"] = session["turns"][2:]
+
+    if evicted:
+        session["summary"] = summarize(session["summary"], evicted)
+
+    return session
+
+def format_history(session: dict) -> str:
+    lines = []
+    if session["summary"]:
+        lines.append(f"Summary of earlier conversation: {session['summary']}")
+    for role, text, _ in session["turns"]:
+        lines.append(f"{'User' if role == 'user' else 'Assistant'}: {text}")
+    return "\n".join(lines)
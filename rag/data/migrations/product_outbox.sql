@@ -0,0 +1,61 @@
+-- --------------------------------------------------------
+
+--
+-- Change feed for near-real-time index updates
+--
+-- Every write on products (and on the categories / brands rendered into product
+-- documents) records the affected product ids in product_outbox and wakes the index
+-- updater through NOTIFY product_changes. The outbox is the source of truth, the
+-- notification only cuts the polling delay.
+--
+
+CREATE TABLE IF NOT EXISTS product_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  product_id bigint NOT NULL,
+  op varchar(10) NOT NULL,
+  changed_at timestamp NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS product_outbox_changed_at_idx ON product_outbox (changed_at);
+
+CREATE OR REPLACE FUNCTION product_outbox_notify() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    INSERT INTO product_outbox (product_id, op) VALUES (OLD.id, TG_OP);
+  ELSE
+    INSERT INTO product_outbox (product_id, op) VALUES (NEW.id, TG_OP);
+  END IF;
+  PERFORM pg_notify('product_changes', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_outbox_trigger ON products;
+CREATE TRIGGER products_outbox_trigger
+AFTER INSERT OR UPDATE OR DELETE ON products
+FOR EACH ROW EXECUTE FUNCTION product_outbox_notify();
+
+-- Category and brand names are part of the product document
+CREATE OR REPLACE FUNCTION product_outbox_notify_related() RETURNS trigger AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'categories' THEN
+    INSERT INTO product_outbox (product_id, op)
+    SELECT id, 'UPDATE' FROM products WHERE category_id = NEW.id OR sub_category_id = NEW.id;
+  ELSE
+    INSERT INTO product_outbox (product_id, op)
+    SELECT id, 'UPDATE' FROM products WHERE brand_id = NEW.id;
+  END IF;
+  PERFORM pg_notify('product_changes', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS categories_outbox_trigger ON categories;
+CREATE TRIGGER categories_outbox_trigger
+AFTER UPDATE OF name ON categories
+FOR EACH ROW EXECUTE FUNCTION product_outbox_notify_related();
+
+DROP TRIGGER IF EXISTS brands_outbox_trigger ON brands;
+CREATE TRIGGER brands_outbox_trigger
+AFTER UPDATE OF name ON brands
+FOR EACH ROW EXECUTE FUNCTION product_outbox_notify_related();
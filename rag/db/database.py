@@ -46,3 +46,65 @@ def get_all_attributes(db):
     cursor.close()
     attributes = {row["id"]: row["name"] for row in rows}
     return attributes
+
+def get_products_by_ids(db, product_ids: list):
+    cursor = db.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""\
+        SELECT 
+            p.*, 
+            c.name AS category_name,
+            sc.name AS sub_category_name,
+            b.name AS brand_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id AND p.category_id IS NOT NULL
+        LEFT JOIN categories sc ON p.sub_category_id = sc.id AND p.sub_category_id IS NOT NULL
+        LEFT JOIN brands b ON p.brand_id = b.id AND p.brand_id IS NOT NULL
+        WHERE p.deleted_at IS NULL AND p.status != '2' AND p.id = ANY(%s)
+    """, (list(product_ids),))
+    
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def get_product_changes(db, limit: int = 256, exclude_ids: list = None):
+    # Applied rows stay in the outbox until the index is persisted, the consumer skips them meanwhile
+    cursor = db.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""\
+        SELECT id, product_id, op, EXTRACT(EPOCH FROM (NOW() - changed_at)) AS age_seconds
+        FROM product_outbox
+        WHERE NOT (id = ANY(%s))
+        ORDER BY id
+        LIMIT %s
+    """, (list(exclude_ids or []), limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def delete_product_changes(db, change_ids: list):
+    cursor = db.cursor()
+    try:
+        cursor.execute("DELETE FROM product_outbox WHERE id = ANY(%s)", (list(change_ids),))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def try_advisory_lock(db, name: str) -> bool:
+    """Takes a session-level advisory lock without waiting, it is held until the connection closes."""
+    cursor = db.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+    locked = bool(cursor.fetchone()[0])
+    cursor.close()
+    return locked
+
+def get_product_change_lag(db, exclude_ids: list = None) -> float:
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT COALESCE(EXTRACT(EPOCH FROM (NOW() - MIN(changed_at))), 0) FROM product_outbox WHERE NOT (id = ANY(%s))",
+        (list(exclude_ids or []),),
+    )
+    lag = float(cursor.fetchone()[0])
+    cursor.close()
+    return lag
@@ -1,50 +1,140 @@
 import rag.db.database as db
 import rag.helpers.document_utils as utils
-from transformers import AutoTokenizer
-from sentence_transformers import SentenceTransformer
-import faiss
+from rag.helpers.render_cache import RenderCache
+from rag.components import get_embedding_model, get_embedding_tokenizer
+from rag.retriever import reload_index, get_shards
+from rag.sparse import hybrid_enabled, encode_hybrid, SparseIndex
+from rag.shards import SHARD_BY, UNSHARDED, shard_key, shard_ids, shard_index_path, shard_sparse_path, load_shard, read_manifest, write_manifest, manifest_path, write_index_version, \
+    replace_file
+from rag.result_cache import new_index_version
+from rag.facets import FacetIndex, facet_index_path
+from rag.similar import build_neighbours, neighbours_path, reload_neighbours
+from rag.telemetry import get_logger
+from collections import defaultdict
+import numpy as np
+import pickle
 import os
 
-tokenizer = AutoTokenizer.from_pretrained("BAAI/bge-m3")
-model = SentenceTransformer('BAAI/bge-m3')
+logger = get_logger(__name__)
 
-def embedd_product_data(db_conn): 
-    products = db.get_all_products(db_conn)
-    attributes = db.get_all_attributes(db_conn)
-
-    print("📝 Generating product documents...")
-    documents = utils.generate_product_documents(products, attributes)
-    print(f"✅ Success Generated {len(documents)} documents")
+def encode_documents(texts: list[str]):
+    tokenizer = get_embedding_tokenizer()
 
     # Check if the document exceed token limit
-    texts = [f"Passage: {doc.page_content}" for doc in documents]
-
     for i, text in enumerate(texts):
         tokens = tokenizer.encode(text, truncation=False)
         # print(f"Doc {i} → {len(tokens)} tokens")
 
         if len(tokens) > 8194:
-            print(f"⚠️ Doc {i} Exceeds token limit! Token: ", len(tokens))
-    
+            logger.warning("⚠️ Doc %d Exceeds token limit! Token: %d", i, len(tokens))
+
     # Embedd product data
-    embeddings = model.encode(
+    if hybrid_enabled():
+        # Dense vectors and lexical weights from the same forward pass
+        return encode_hybrid(texts)
+
+    embeddings = get_embedding_model().encode(
         texts,
         show_progress_bar=True,
         convert_to_numpy=True,
         normalize_embeddings=True  # for cosine similarity
     )
-    print(f"✅ Embeddings created with shape: {embeddings.shape}")
+    return embeddings, None
+
+def write_shard(key: str, ids: np.ndarray, embeddings: np.ndarray, lexical_weights):
+    import faiss
+
+    # Store embedding data, vectors are keyed by product id so results survive re-indexing
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+    index.add_with_ids(embeddings, ids)
+    # Written aside and renamed, searches and followers loading the shard meanwhile read a whole file
+    replace_file(shard_index_path(key), lambda path: faiss.write_index(index, path))
+    logger.info("✅ Added %d vectors to FAISS index shard %s", embeddings.shape[0], key)
+
+    if lexical_weights is not None:
+        sparse_index = SparseIndex.from_lexical_weights(lexical_weights, ids)
+        replace_file(shard_sparse_path(key), sparse_index.save)
+        logger.info("✅ Stored lexical weights of %d documents (%d postings)", len(ids), len(sparse_index.indices))
+
+def embedd_product_data(db_conn, shard: str = None):
+    """
+    Renders, embeds and indexes the product catalog.
+
+    Args:
+        db_conn: Database connection.
+        shard: Only rebuild this shard (e.g. "category-3"), the other shards are left untouched.
+
+    A change feed consumer in the same process must not persist while the files are being
+    written, run the rebuild under `ProductChangeConsumer.rebuilding`.
+    """
+    products = db.get_all_products(db_conn)
+    attributes = db.get_all_attributes(db_conn)
+
+    logger.info("📝 Generating product documents...")
+    documents = utils.generate_product_documents(products, attributes, cache=RenderCache())
+    logger.info("✅ Success Generated %d documents", len(documents))
+
+    groups = defaultdict(list)
+    for doc in documents:
+        groups[shard_key(doc.metadata)].append(doc)
+
+    if shard is not None:
+        groups = {shard: groups.get(shard, [])}
+
+    manifest = read_manifest() if shard is not None else {"shard_by": SHARD_BY, "shards": {}}
+    if manifest["shard_by"] != SHARD_BY:
+        raise ValueError(f"Index is sharded by {manifest['shard_by']} but SHARD_BY is {SHARD_BY}, run a full rebuild first")
+    chunk_file = os.getenv("CHUNK_FILE")
+    id_to_doc = {}
+    if shard is not None and os.path.exists(chunk_file):
+        with open(chunk_file, "rb") as f:
+            id_to_doc = pickle.load(f)
+        # Drop the previous documents of the rebuilt shard, products may have left it
+        if shard in manifest["shards"]:
+            for product_id in shard_ids(load_shard(shard)).tolist():
+                id_to_doc.pop(product_id, None)
+
+    for key, shard_documents in groups.items():
+        if not shard_documents:
+            manifest["shards"].pop(key, None)
+            logger.info("🗑️ Shard %s is empty, removed from the manifest", key)
+            continue
+
+        texts = [f"Passage: {doc.page_content}" for doc in shard_documents]
+        ids = np.array([doc.metadata["id"] for doc in shard_documents], dtype=np.int64)
+
+        embeddings, lexical_weights = encode_documents(texts)
+        logger.info("✅ Embeddings created with shape: %s", embeddings.shape)
+
+        write_shard(key, ids, embeddings, lexical_weights)
+        manifest["shards"][key] = {"file": shard_index_path(key), "count": len(ids)}
+        id_to_doc.update(zip(ids.tolist(), texts))
+
+    # Facets of the whole catalog, the products are all loaded anyway
+    replace_file(facet_index_path(), FacetIndex.build(products, attributes).save)
+    logger.info("✅ Built facet index of %d products", len(products))
 
-    # Store embedding data
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dimension)
+    # Export the product id -> document text map and the shard list
+    def write_documents(path):
+        with open(path, "wb") as f:
+            pickle.dump(id_to_doc, f)
+    replace_file(chunk_file, write_documents)
+    if list(manifest["shards"]) == [UNSHARDED]:
+        if os.path.exists(manifest_path()):
+            os.remove(manifest_path())
+    else:
+        write_manifest(manifest)
+    # A new version invalidates every cached result of the previous build
+    write_index_version(new_index_version())
+    logger.info("💾 Successfully export index data")
 
-    index.add(embeddings)
-    print(f"✅ Added {embeddings.shape[0]} vectors to FAISS index")
+    # Serve the fresh index on the next retrieval
+    reload_index()
 
-    # Export FAISS Index
-    faiss.write_index(index, os.getenv("INDEX_FILE"))
-    print("💾 Successfully export index data")
+    # Neighbours of products outside a rebuilt shard can change too, so recompute them all
+    build_neighbours(get_shards()).save(neighbours_path())
+    reload_neighbours()
+    logger.info("💾 Successfully export similar products")
     
 
 if __name__ == "__main__":
@@ -52,4 +142,3 @@ if __name__ == "__main__":
     conn = db.db_connection()
 
     embedd_product_data(conn)
-    
\ No newline at end of file
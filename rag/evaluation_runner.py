@@ -0,0 +1,118 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from typing import List, Dict
+from rag.retriever import get_detailed_instruct, encode_queries, search
+from api.db.database import db_connection, get_rag_configuration
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class BatchRetrievalEvaluator:
+    def __init__(self, k_values: List[int] = None, batch_size: int = 64):
+        """
+        Initialize the batched evaluator
+
+        Args:
+            k_values: K values of the sweep, all of them are served by a single search at max(k_values)
+            batch_size: Encoder batch size
+        """
+        self.k_values = sorted(k_values or range(1, 21))
+        self.batch_size = batch_size
+
+    def retrieve(self, db_conn, queries: List[str]) -> np.ndarray:
+        """
+        Encode every query in one batch and run a single FAISS search for the whole sweep
+
+        Args:
+            queries: Query texts
+
+        Returns:
+            (n_queries, max_k) int64 matrix of retrieved product ids in ranked order
+        """
+        task = get_rag_configuration(db_conn)['retriever_instruction']
+        embeddings, lexical_weights = encode_queries([get_detailed_instruct(task, query) for query in queries], batch_size=self.batch_size)
+        _, I = search(embeddings, lexical_weights, self.k_values[-1])
+        return I
+
+    def compute_metrics(self, retrieved: np.ndarray, relevant: List[List[int]]) -> pd.DataFrame:
+        """
+        Compute Precision@K, Recall@K and MRR@K for every K of the sweep, vectorized over all queries
+
+        Args:
+            retrieved: (n_queries, max_k) matrix of retrieved ids in ranked order
+            relevant: Relevant ids of every query
+
+        Returns:
+            DataFrame with one row per K and the mean metrics across queries
+        """
+        # Pad the ragged relevant lists with -2, FAISS uses -1 for missing results so neither can match
+        max_relevant = max(len(ids) for ids in relevant)
+        relevant_matrix = np.full((len(relevant), max_relevant), -2, dtype=np.int64)
+        for row, ids in enumerate(relevant):
+            relevant_matrix[row, :len(ids)] = ids
+        n_relevant = np.array([len(ids) for ids in relevant], dtype=np.float64)
+
+        hits = (retrieved[:, :, None] == relevant_matrix[:, None, :]).any(axis=2)
+        cumulative_hits = hits.cumsum(axis=1)
+        first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+
+        rows = []
+        for k in self.k_values:
+            reciprocal_rank = np.where(first_hit < k, 1.0 / (first_hit + 1), 0.0)
+            rows.append({
+                'k': k,
+                'precision@k': np.mean(cumulative_hits[:, k - 1] / k),
+                'recall@k': np.mean(cumulative_hits[:, k - 1] / np.maximum(n_relevant, 1)),
+                'MRR@k': np.mean(reciprocal_rank)
+            })
+        return pd.DataFrame(rows)
+
+    def evaluate_dataset(self, db_conn, evaluation_data: List[Dict]) -> pd.DataFrame:
+        """
+        Evaluate the entire dataset for every K of the sweep
+
+        Args:
+            evaluation_data: List of dictionaries with keys:
+                - query_id: str
+                - query_text: str
+                - relevant_ids: List[int] (product ids)
+
+        Returns:
+            DataFrame with the mean metrics per K
+        """
+        retrieved = self.retrieve(db_conn, [data['query_text'] for data in evaluation_data])
+        return self.compute_metrics(retrieved, [data['relevant_ids'] for data in evaluation_data])
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched retrieval evaluation over a K sweep")
+    parser.add_argument("cases", help="JSON file with a list of {query_id, query_text, relevant_ids}")
+    parser.add_argument("--max-k", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--output", default="./rag/evaluation/retrieval_sweep.csv")
+    args = parser.parse_args()
+
+    with open(args.cases) as f:
+        test_cases = json.load(f)
+
+    evaluator = BatchRetrievalEvaluator(k_values=list(range(1, args.max_k + 1)), batch_size=args.batch_size)
+    db_conn = db_connection()
+
+    start = time.perf_counter()
+    df = evaluator.evaluate_dataset(db_conn, test_cases)
+    elapsed = time.perf_counter() - start
+
+    print("=" * 60)
+    print("RAG RETRIEVAL EVALUATION SWEEP")
+    print("=" * 60)
+    print(f"Total Queries Evaluated: {len(test_cases)} in {elapsed:.2f}s\n")
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print("=" * 60)
+
+    df.to_csv(args.output, index=False)
+    print(f"[v] Retrieval sweep saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import numpy as np
+from rag.components import lazy_component
+from rag.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Unit -> (dimension, factor to the dimension's base unit)
+UNITS = {
+    "mb": ("storage", 1 / 1024), "gb": ("storage", 1.0), "tb": ("storage", 1024.0),
+    "ml": ("volume", 1.0), "l": ("volume", 1000.0), "liter": ("volume", 1000.0), "litre": ("volume", 1000.0),
+    "mm": ("length", 1 / 25.4), "cm": ("length", 1 / 2.54), "inch": ("length", 1.0), "inci": ("length", 1.0), "in": ("length", 1.0), '"': ("length", 1.0),
+    "mg": ("weight", 1e-6), "g": ("weight", 1e-3), "gr": ("weight", 1e-3), "gram": ("weight", 1e-3), "kg": ("weight", 1.0),
+    "w": ("power", 1.0), "watt": ("power", 1.0), "kw": ("power", 1000.0),
+    "mp": ("resolution", 1.0),
+    "mah": ("battery", 1.0),
+    "hz": ("refresh_rate", 1.0),
+}
+
+# Columns taken from the product row itself, one value per product
+ROW_COLUMNS = {"price": "price", "discount": "discount", "weight": "weight"}
+
+# Memory sizes share units with storage, they are told apart by the attribute name or a memory
+# word at most MEMORY_WINDOW_WORDS words before or after the value in a query
+MEMORY_WORDS = ("ram", "memori", "memory")
+# "Memori Internal", "internal memory" and "kartu memori" are storage
+MEMORY_NAME_RE = re.compile(rf'(?<![a-z])(?<!internal )(?<!kartu )(?:{"|".join(MEMORY_WORDS)})(?![a-z])(?!\s*(?:internal|eksternal|external|card))')
+MEMORY_WINDOW_WORDS = 2
+
+MULTIPLIERS = {"rb": 1e3, "ribu": 1e3, "k": 1e3, "jt": 1e6, "juta": 1e6}
+
+# Too ambiguous in free text ("HP 5G", "2 in 1")
+QUERY_EXCLUDED_UNITS = {"g", "in", '"'}
+
+def _unit_pattern(units) -> str:
+    return "|".join(sorted((re.escape(unit) for unit in units), key=len, reverse=True))
+
+VALUE_RE = re.compile(rf'^(\d+(?:[.,]\d+)?)\s*({_unit_pattern(UNITS)})$')
+# "8/256gb" style pairs are skipped, which side is memory is not reliable
+QUERY_VALUE_RE = re.compile(rf'(?<![a-z0-9/])(\d+(?:[.,]\d+)?)\s*({_unit_pattern(set(UNITS) - QUERY_EXCLUDED_UNITS)})(?![a-z0-9/])')
+PRICE_RE = re.compile(r'(?:harga|rp\.?)\s*(?:di\s*bawah|dibawah|kurang\s*dari|maksimal|max|di\s*atas|diatas|lebih\s*dari|minimal|min)?\s*(?:rp\.?\s*)?(\d+(?:[.,]\d+)?)\s*(rb|ribu|k|jt|juta)?(?![a-z])')
+AT_LEAST = ("ke atas", "keatas", "minimal", "min", "lebih dari", "di atas", "diatas", ">=", ">")
+AT_MOST = ("ke bawah", "kebawah", "maksimal", "max", "kurang dari", "di bawah", "dibawah", "<=", "<")
+
+def _words_pattern(words) -> re.Pattern:
+    # Whole words only, "aluminium" must not read as "min"
+    return re.compile(rf'(?<![a-z])(?:{_unit_pattern(words)})(?![a-z])')
+
+AT_LEAST_RE = _words_pattern(AT_LEAST)
+AT_MOST_RE = _words_pattern(AT_MOST)
+
+def normalize_value(value: str) -> str:
+    return value.lower().replace("-", " ").strip()
+
+def parse_value(value: str):
+    """
+    Parses one attribute value such as "1tb", "8-gb" or "1.5 l".
+
+    Returns:
+        A tuple of (dimension, value in the base unit), or None for non-numeric values.
+    """
+    match = VALUE_RE.match(normalize_value(value))
+    if not match:
+        return None
+    number, unit = match.groups()
+    dimension, factor = UNITS[unit]
+    return dimension, float(number.replace(",", ".")) * factor
+
+class FacetIndex:
+    """
+    Typed facets of every product in columnar arrays.
+
+    Attribute values are multi-valued, so each facet is a pair of parallel arrays: the
+    product positions and the values (float32 in the base unit for numeric facets, int32
+    codes into `vocab` for categorical ones). Constraints become boolean masks over
+    `product_ids` with a handful of vectorized numpy operations.
+    """
+    def __init__(self, product_ids: np.ndarray, numeric: dict, categorical: dict, vocab: dict):
+        self.product_ids = product_ids
+        self.numeric = numeric          # key -> (positions int32, values float32)
+        self.categorical = categorical  # key -> (positions int32, codes int32)
+        self.vocab = vocab              # key -> list of categorical values
+
+    @classmethod
+    def build(cls, products: list[dict], attributes_data: dict) -> "FacetIndex":
+        """
+        Parses `attributes_value` of every product into numeric and categorical facets.
+
+        Numeric values are keyed by attribute id and by dimension ("dim:storage"), so a
+        query can constrain "Kapasitas" specifically or any storage size. Sizes of attributes
+        named like RAM go to "dim:memory" instead of "dim:storage".
+        """
+        numeric, categorical = {}, {}
+        for position, product in enumerate(products):
+            for column, field in ROW_COLUMNS.items():
+                if product.get(field) is not None:
+                    numeric.setdefault(column, ([], []))
+                    numeric[column][0].append(position)
+                    numeric[column][1].append(float(product[field]))
+
+            try:
+                attributes = json.loads(product.get("attributes_value") or "[]")
+            except (TypeError, json.JSONDecodeError):
+                continue
+            for item in attributes:
+                attr_id = str(item.get("attribute_id", ""))
+                if not attr_id.isdigit() or int(attr_id) not in attributes_data:
+                    continue
+                memory = bool(MEMORY_NAME_RE.search((attributes_data[int(attr_id)] or "").lower()))
+                for value in item.get("values", []):
+                    parsed = parse_value(value)
+                    if parsed is not None:
+                        dimension, number = parsed
+                        if dimension == "storage" and memory:
+                            dimension = "memory"
+                        for key in (attr_id, f"dim:{dimension}"):
+                            numeric.setdefault(key, ([], []))
+                            numeric[key][0].append(position)
+                            numeric[key][1].append(number)
+                    else:
+                        categorical.setdefault(attr_id, ([], []))
+                        categorical[attr_id][0].append(position)
+                        categorical[attr_id][1].append(normalize_value(value))
+
+        vocab, categorical_codes = {}, {}
+        for key, (positions, values) in categorical.items():
+            vocab[key], codes = np.unique(np.array(values), return_inverse=True)
+            vocab[key] = vocab[key].tolist()
+            categorical_codes[key] = (np.array(positions, dtype=np.int32), codes.astype(np.int32))
+
+        return cls(
+            np.array([product["id"] for product in products], dtype=np.int64),
+            {key: (np.array(positions, dtype=np.int32), np.array(values, dtype=np.float32)) for key, (positions, values) in numeric.items()},
+            categorical_codes,
+            vocab,
+        )
+
+    def update(self, products: list[dict], attributes_data: dict, changed_ids) -> "FacetIndex":
+        """
+        Returns a copy with the rows of `changed_ids` replaced by the facets of `products`.
+
+        Changed ids missing from `products` (deleted, inactive) are dropped. Kept rows are
+        renumbered and the new products appended after them, categorical codes are
+        re-encoded over the merged vocabulary.
+        """
+        fresh = FacetIndex.build(products, attributes_data)
+        keep = ~np.isin(self.product_ids, np.asarray(changed_ids, dtype=np.int64))
+        renumbered = (np.cumsum(keep) - 1).astype(np.int32)
+        offset = int(keep.sum())
+
+        def merge(old, new, decode):
+            merged = {}
+            for key in old.keys() | new.keys():
+                positions, values = [], []
+                if key in old:
+                    kept = keep[old[key][0]]
+                    positions.append(renumbered[old[key][0][kept]])
+                    values.append(decode(key, old[key][1][kept], self))
+                if key in new:
+                    positions.append(new[key][0] + offset)
+                    values.append(decode(key, new[key][1], fresh))
+                merged[key] = (np.concatenate(positions).astype(np.int32), np.concatenate(values))
+            return merged
+
+        numeric = merge(self.numeric, fresh.numeric, lambda key, values, index: values.astype(np.float32))
+        categorical, vocab = {}, {}
+        decoded = merge(self.categorical, fresh.categorical, lambda key, codes, index: np.array(index.vocab[key], dtype=str)[codes])
+        for key, (positions, values) in decoded.items():
+            vocab[key], codes = np.unique(values, return_inverse=True)
+            vocab[key] = vocab[key].tolist()
+            categorical[key] = (positions, codes.astype(np.int32))
+
+        return FacetIndex(np.concatenate([self.product_ids[keep], fresh.product_ids]), numeric, categorical, vocab)
+
+    @classmethod
+    def load(cls, path: str) -> "FacetIndex":
+        with np.load(path) as f:
+            meta = json.loads(str(f["meta"]))
+            numeric = {key: (f[f"n:{key}:pos"], f[f"n:{key}:val"]) for key in meta["numeric"]}
+            categorical = {key: (f[f"c:{key}:pos"], f[f"c:{key}:val"]) for key in meta["vocab"]}
+            return cls(f["product_ids"], numeric, categorical, meta["vocab"])
+
+    def save(self, path: str):
+        arrays = {"product_ids": self.product_ids, "meta": np.array(json.dumps({"numeric": list(self.numeric), "vocab": self.vocab}))}
+        for key, (positions, values) in self.numeric.items():
+            arrays[f"n:{key}:pos"], arrays[f"n:{key}:val"] = positions, values
+        for key, (positions, codes) in self.categorical.items():
+            arrays[f"c:{key}:pos"], arrays[f"c:{key}:val"] = positions, codes
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def mask(self, constraints: list[dict]) -> np.ndarray:
+        """
+        Evaluates constraints into a boolean mask over `product_ids`, all of them must hold.
+
+        Args:
+            constraints: Dicts with a "key" (attribute id, "dim:<dimension>" or a row column
+                such as "price") and either "min"/"max" (numeric, inclusive, base unit) or
+                "values" (categorical equality, any of, normalized like the indexed values). A key
+                missing from the index matches nothing.
+
+        Returns:
+            (n_products,) boolean mask.
+        """
+        mask = np.ones(len(self.product_ids), dtype=bool)
+        for constraint in constraints:
+            key = str(constraint["key"])
+            matched = np.zeros(len(self.product_ids), dtype=bool)
+            if "values" in constraint:
+                if key in self.categorical:
+                    positions, codes = self.categorical[key]
+                    values = {normalize_value(value) for value in constraint["values"]}
+                    wanted = [code for code, value in enumerate(self.vocab[key]) if value in values]
+                    matched[positions[np.isin(codes, wanted)]] = True
+            elif key in self.numeric:
+                positions, values = self.numeric[key]
+                hit = np.ones(len(values), dtype=bool)
+                # Values are float32 after unit conversion, compare with a relative tolerance
+                if constraint.get("min") is not None:
+                    hit &= values >= constraint["min"] * (1 - 1e-6)
+                if constraint.get("max") is not None:
+                    hit &= values <= constraint["max"] * (1 + 1e-6)
+                matched[positions[hit]] = True
+            mask &= matched
+        return mask
+
+    def filter_ids(self, constraints: list[dict]) -> np.ndarray:
+        return self.product_ids[self.mask(constraints)]
+
+def _bound(text: str, start: int, end: int):
+    """Returns "min", "max" or None from the comparison words around a value."""
+    around = f"{text[max(0, start - 20):start]} {text[end:end + 12]}"
+    if AT_LEAST_RE.search(around):
+        return "min"
+    if AT_MOST_RE.search(around):
+        return "max"
+    return None
+
+def _memory_dimensions(text: str, matches: list) -> dict:
+    """
+    Tells memory sizes from storage sizes among the storage-unit values of a query.
+
+    Each memory word claims the nearest storage value on either side within MEMORY_WINDOW_WORDS
+    words ("ram minimal 8gb", "16gb ram ke atas"). A word with a value on both sides
+    ("8gb ram 256gb") cannot tell which one it names, both become ambiguous.
+
+    Returns:
+        {value start: "memory" or None}, None for ambiguous values, absent for storage.
+    """
+    def near(start: int, end: int) -> bool:
+        return len(text[start:end].split()) <= MEMORY_WINDOW_WORDS
+
+    dimensions = {}
+    for word in MEMORY_NAME_RE.finditer(text):
+        before = [i for i, match in enumerate(matches) if match.end() <= word.start() and near(match.end(), word.start())]
+        after = [i for i, match in enumerate(matches) if match.start() >= word.end() and near(word.end(), match.start())]
+        claimed = [matches[i].start() for i in before[-1:] + after[:1]]
+        for start in claimed:
+            dimensions[start] = "memory" if len(claimed) == 1 and dimensions.get(start, "memory") else None
+    return dimensions
+
+def parse_constraints(query: str) -> list[dict]:
+    """
+    Extracts numeric constraints from a query, e.g. "RAM 8GB ke atas" -> {"key": "dim:memory", "min": 8}.
+
+    Only values with a comparison word become constraints. A bare "256GB" or "harga 2 juta"
+    says what the user is looking at, not a limit, and is left to the embedding. Prices are
+    read from "harga di bawah 2 juta" style phrases.
+    """
+    text = query.lower()
+    constraints = []
+    matches = list(QUERY_VALUE_RE.finditer(text))
+    memory = _memory_dimensions(text, [match for match in matches if UNITS[match.group(2)][0] == "storage"])
+    for match in matches:
+        bound = _bound(text, match.start(), match.end())
+        if bound is None:
+            continue
+        number, unit = match.groups()
+        dimension, factor = UNITS[unit]
+        if dimension == "storage" and match.start() in memory:
+            dimension = memory[match.start()]
+            if dimension is None:
+                # Memory or storage, a wrong hard filter would hide every right product
+                continue
+        value = float(number.replace(",", ".")) * factor
+        constraints.append({"key": f"dim:{dimension}", bound: value})
+
+    for match in PRICE_RE.finditer(text):
+        bound = _bound(text, match.start(1), match.end())
+        if bound is None:
+            continue
+        number, multiplier = match.groups()
+        value = float(number.replace(",", ".")) * MULTIPLIERS.get(multiplier, 1)
+        constraints.append({"key": "price", bound: value})
+    return constraints
+
+def facet_index_path(index_file: str = None) -> str:
+    return (os.getenv("FACET_INDEX_FILE") if index_file is None else None) or f"{index_file or os.getenv('INDEX_FILE')}.facets.npz"
+
+@lazy_component("facets")
+def get_facet_index():
+    return FacetIndex.load(facet_index_path())
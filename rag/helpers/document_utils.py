@@ -1,14 +1,17 @@
 from langchain.schema import Document
 import rag.helpers.cleaning as c
+from rag.helpers.render_cache import RenderCache, attributes_version
 import json
-import locale
 
-def generate_product_documents(products:list[dict], attributes_data : dict) -> list[Document]:
-    return [Document(page_content=product_page_content(product=product, attributes_data=attributes_data), 
+def generate_product_documents(products:list[dict], attributes_data : dict, cache: RenderCache = None) -> list[Document]:
+    contents = render_page_contents(products, attributes_data, cache) if cache is not None \
+        else [product_page_content(product=product, attributes_data=attributes_data) for product in products]
+    return [Document(page_content=content, 
                      metadata={
                          "id": product["id"],
                          "product_type" : product["product_type"],
                          "brand_name" : format_brand(product["brand_name"]),  
+                         "category_id" : product["category_id"],
                          "category_name" : format_category(product["category_name"]),
                          "sub_category_name" : format_category(product["sub_category_name"]),
                          "seller_id" : product["seller_id"],
@@ -16,7 +19,25 @@ def generate_product_documents(products:list[dict], attributes_data : dict) -> l
                          "discount" : product["discount"], 
                          "shipping_fee" : product["shipping_fee"], 
                          "weight" : product["weight"]
-                     }) for product in products]
+                     }) for product, content in zip(products, contents)]
+
+def render_page_contents(products: list[dict], attributes_data: dict, cache: RenderCache) -> list[str]:
+    # Only products whose row or the attribute map changed since the last build are rendered again
+    attr_version = attributes_version(attributes_data)
+    versions = {product["id"]: cache.version(product, attr_version) for product in products}
+    cached = cache.get_many(versions)
+
+    contents, rendered = [], []
+    for product in products:
+        content = cached.get(product["id"])
+        if content is None:
+            content = product_page_content(product=product, attributes_data=attributes_data)
+            rendered.append((product["id"], versions[product["id"]], content))
+        contents.append(content)
+
+    if rendered:
+        cache.put_many(rendered)
+    return contents
 
 def product_page_content(product:dict, attributes_data : dict) -> str :
     format = f"""\
@@ -90,9 +111,10 @@ def format_shipping_country(country_str: str) -> str:
         return "Shipping information is currently unavailable"
 
 def format_currency(price) -> str:
-    locale.setlocale(locale.LC_ALL, 'id_ID.UTF-8')
-    formatted_price = locale.currency(price, symbol=True, grouping=True)
-    return formatted_price
+    # id_ID.UTF-8 currency format ("Rp1.234.567,00") built by hand, setlocale is process-wide and not thread-safe
+    amount = float(price)
+    grouped = f"{abs(amount):,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"{'-' if amount < 0 else ''}Rp{grouped}"
 
 def clean_page_content(page_content: str) -> str :
     cleaned_whitespace = c.normalize_whitespace(page_content)
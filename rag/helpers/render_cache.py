@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+# Bump when product_page_content or the cleaning chain changes so cached documents are re-rendered
+RENDER_VERSION = 1
+
+def render_cache_path() -> str:
+    return os.getenv("RENDER_CACHE_FILE") or f"{os.getenv('CHUNK_FILE')}.render.sqlite"
+
+def row_hash(product: dict) -> str:
+    # Hash the whole joined row, category and brand renames change the document without touching updated_at
+    return hashlib.sha1(json.dumps(product, sort_keys=True, default=str).encode()).hexdigest()
+
+def attributes_version(attributes_data: dict) -> str:
+    return hashlib.sha1(json.dumps(sorted(attributes_data.items()), default=str).encode()).hexdigest()
+
+class RenderCache:
+    """
+    Rendered product documents in a local SQLite file, one row per product.
+
+    A row is reused only when the product row hash, the attribute map version and
+    RENDER_VERSION all match, anything else is a miss and gets overwritten.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or render_cache_path()
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    product_id INTEGER PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    content TEXT NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def version(product: dict, attributes_version: str) -> str:
+        return f"{RENDER_VERSION}:{attributes_version}:{row_hash(product)}"
+
+    def get_many(self, versions: dict) -> dict:
+        """
+        Args:
+            versions: Product id -> expected version.
+
+        Returns:
+            Product id -> cached content for every product whose stored version matches.
+        """
+        hits = {}
+        ids = list(versions)
+        with closing(sqlite3.connect(self.path)) as conn:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                rows = conn.execute(
+                    f"SELECT product_id, version, content FROM documents WHERE product_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                hits.update({product_id: content for product_id, version, content in rows if versions[product_id] == version})
+        return hits
+
+    def put_many(self, entries: list[tuple]):
+        """
+        Args:
+            entries: (product id, version, content) tuples.
+        """
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO documents (product_id, version, content) VALUES (?, ?, ?)", entries)
@@ -0,0 +1,166 @@
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from rag.components import lazy_component
+from rag.facets import FacetIndex, facet_index_path
+from rag.shards import load_shards, shard_files, read_index_version
+from rag.telemetry import get_logger, INDEX_RESIDENT, INDEX_RESIDENT_BYTES, INDEX_LOAD_SECONDS, INDEX_EVICTIONS
+
+logger = get_logger(__name__)
+
+DEFAULT_INDEX = "default"
+INDEX_MEMORY_BUDGET_MB = float(os.getenv("INDEX_MEMORY_BUDGET_MB") or 4096)
+
+class UnknownIndex(KeyError):
+    pass
+
+class HostedIndex:
+    """Shards, documents and facets of one catalog, loaded together and evicted together."""
+    def __init__(self, name: str, shards: dict, documents: dict, facets=None, size_bytes: int = 0, facets_loader=None,
+                 version: str = None):
+        self.name = name
+        self.shards = shards
+        self.documents = documents
+        self.facets = facets
+        self.size_bytes = size_bytes
+        self.facets_loader = facets_loader
+        # Build version for the result cache, None disables caching for the index
+        self.version = version
+
+    def get_facets(self):
+        if self.facets is None and self.facets_loader is not None:
+            return self.facets_loader()
+        if self.facets is None:
+            raise FileNotFoundError(f"Index {self.name} has no facet index")
+        return self.facets
+
+def read_registry_config() -> dict:
+    """
+    Named indexes from INDEX_REGISTRY, a JSON file path or inline JSON:
+    {"staging": {"index_file": "...", "chunk_file": "..."}, "tokopoin-en": {...}}.
+    """
+    config = os.getenv("INDEX_REGISTRY")
+    if not config:
+        return {}
+    if os.path.exists(config):
+        with open(config) as f:
+            return json.load(f)
+    return json.loads(config)
+
+class IndexRegistry:
+    """
+    Named indexes loaded on first use and kept in LRU order within a memory budget.
+
+    An index is sized from its files before loading (FAISS shards, sparse weights, facets
+    and the pickled documents), and the least recently used indexes nobody is searching are
+    evicted until it fits. An index larger than the whole budget is still served, the
+    budget only decides what stays resident. The default index (INDEX_FILE/CHUNK_FILE) is
+    not hosted here, it stays in the component registry where the live updater mutates it.
+    """
+    def __init__(self, specs: dict, budget_bytes: int):
+        self.specs = specs
+        self.budget_bytes = budget_bytes
+        self._resident = OrderedDict()
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def names(self) -> list[str]:
+        return list(self.specs)
+
+    def resident(self) -> dict:
+        with self._lock:
+            return {name: index.size_bytes for name, index in self._resident.items()}
+
+    def files(self, name: str) -> list[str]:
+        spec = self.specs[name]
+        files = shard_files(spec["index_file"]) + [spec["chunk_file"]]
+        if os.path.exists(facet_index_path(spec["index_file"])):
+            files.append(facet_index_path(spec["index_file"]))
+        return files
+
+    def _load(self, name: str, size_bytes: int) -> HostedIndex:
+        spec = self.specs[name]
+        start = time.perf_counter()
+        version = read_index_version(spec["index_file"])
+        shards = load_shards(spec["index_file"])
+        with open(spec["chunk_file"], "rb") as f:
+            documents = pickle.load(f)
+        facets_path = facet_index_path(spec["index_file"])
+        facets = FacetIndex.load(facets_path) if os.path.exists(facets_path) else None
+        seconds = time.perf_counter() - start
+
+        INDEX_LOAD_SECONDS.labels(index=name).observe(seconds)
+        logger.info("✅ Index %s loaded in %.2fs (%.1f MB)", name, seconds, size_bytes / 1e6)
+        return HostedIndex(name, shards, documents, facets, size_bytes, version=version)
+
+    def _make_room(self, size_bytes: int):
+        # Called with the lock held, evicts cold unpinned indexes in LRU order
+        used = sum(index.size_bytes for index in self._resident.values())
+        for name in list(self._resident):
+            if used + size_bytes <= self.budget_bytes:
+                break
+            if self._pins.get(name):
+                continue
+            evicted = self._resident.pop(name)
+            used -= evicted.size_bytes
+            INDEX_RESIDENT.labels(index=name).set(0)
+            INDEX_RESIDENT_BYTES.labels(index=name).set(0)
+            INDEX_EVICTIONS.labels(index=name).inc()
+            logger.info("♻️ Index %s evicted (%.1f MB)", name, evicted.size_bytes / 1e6)
+        if used + size_bytes > self.budget_bytes:
+            logger.warning("Index memory budget exceeded: %.1f MB resident, %.1f MB budget",
+                           (used + size_bytes) / 1e6, self.budget_bytes / 1e6)
+
+    def _acquire(self, name: str) -> HostedIndex:
+        if name not in self.specs:
+            raise UnknownIndex(name)
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                self._pins[name] = self._pins.get(name, 0) + 1
+                return self._resident[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One load per index at a time, other indexes stay searchable meanwhile
+        with load_lock:
+            with self._lock:
+                if name in self._resident:
+                    self._resident.move_to_end(name)
+                    self._pins[name] = self._pins.get(name, 0) + 1
+                    return self._resident[name]
+                size_bytes = sum(os.path.getsize(path) for path in self.files(name))
+                self._make_room(size_bytes)
+
+            index = self._load(name, size_bytes)
+            with self._lock:
+                self._resident[name] = index
+                self._pins[name] = self._pins.get(name, 0) + 1
+                INDEX_RESIDENT.labels(index=name).set(1)
+                INDEX_RESIDENT_BYTES.labels(index=name).set(size_bytes)
+            return index
+
+    @contextmanager
+    def use(self, name: str):
+        """Pins an index, loading it if needed, so it is not evicted while a search runs on it."""
+        index = self._acquire(name)
+        try:
+            yield index
+        finally:
+            with self._lock:
+                self._pins[name] -= 1
+
+    def evict(self, name: str):
+        """Drops an index regardless of the budget, e.g. after it was rebuilt on disk."""
+        with self._lock:
+            if self._resident.pop(name, None) is not None:
+                INDEX_RESIDENT.labels(index=name).set(0)
+                INDEX_RESIDENT_BYTES.labels(index=name).set(0)
+
+@lazy_component("index_registry")
+def get_index_registry():
+    return IndexRegistry(read_registry_config(), int(INDEX_MEMORY_BUDGET_MB * 1024 * 1024))
@@ -0,0 +1,286 @@
+import os
+import pickle
+import select
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import rag.db.database as db
+import rag.helpers.document_utils as utils
+from rag.helpers.render_cache import RenderCache
+from rag.embedder import encode_documents
+from rag.components import replace_component, is_warm
+from rag.facets import get_facet_index, facet_index_path
+from rag.retriever import get_shards, get_id_to_doc, get_index_version, reload_index
+from rag.sparse import SparseIndex
+from rag.shards import ReadWriteLock, shard_key, shard_index_path, shard_sparse_path, read_manifest, write_manifest, \
+    read_index_version, write_index_version, replace_file, UNSHARDED
+from rag.telemetry import get_logger, span, INDEX_UPDATE_LAG, INDEX_STALENESS, INDEX_UPDATES
+
+logger = get_logger(__name__)
+
+CHANGE_FEED_CHANNEL = "product_changes"
+CHANGE_BATCH_SIZE = int(os.getenv("CHANGE_BATCH_SIZE") or 32)
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS") or 5)
+INDEX_PERSIST_SECONDS = float(os.getenv("INDEX_PERSIST_SECONDS") or 60)
+
+def apply_product_changes(db_conn, product_ids: list) -> tuple[int, int]:
+    """
+    Re-renders, re-embeds and upserts the given products in the live index.
+
+    Products that no longer exist (deleted, inactive) are removed from every shard.
+    Products whose shard key changed are moved to their new shard.
+
+    Args:
+        db_conn: Database connection.
+        product_ids: Ids of the changed products.
+
+    Returns:
+        A tuple of (upserted, deleted) document counts.
+    """
+    import faiss
+
+    # Searches iterate the live dict, new shards go into a copy that is swapped in at the end
+    shards = dict(get_shards())
+    if not all(isinstance(shard["index"], faiss.IndexIDMap2) for shard in shards.values()):
+        raise RuntimeError("Live updates need an index keyed by product id, rebuild it with /api/embedd-products")
+
+    products = db.get_products_by_ids(db_conn, product_ids)
+    attributes = db.get_all_attributes(db_conn)
+    documents = utils.generate_product_documents(products, attributes, cache=RenderCache())
+
+    texts = [f"Passage: {doc.page_content}" for doc in documents]
+    ids = np.array([doc.metadata["id"] for doc in documents], dtype=np.int64)
+    deleted = sorted(set(product_ids) - set(ids.tolist()))
+
+    embeddings, lexical_weights = encode_documents(texts) if texts else (None, None)
+
+    id_to_doc = get_id_to_doc()
+    changed_ids = np.array(list(product_ids), dtype=np.int64)
+    # Documents go in before their vectors, a search never finds an id without its text
+    id_to_doc.update(zip(ids.tolist(), texts))
+
+    keys = [shard_key(doc.metadata) for doc in documents]
+    for key in set(keys) - set(shards):
+        dimension = next(iter(shards.values()))["index"].d
+        shards[key] = {"index": faiss.IndexIDMap2(faiss.IndexFlatIP(dimension)), "sparse": None, "lock": ReadWriteLock()}
+
+    # Each shard drops the changed products and takes back its current ones under one write lock,
+    # so searches see it before or after the update, never without the product. Shards gaining
+    # products go first: a product moving shards is briefly in both rather than in neither.
+    for key in sorted(shards, key=lambda key: key not in keys):
+        shard = shards[key]
+        rows = [row for row, doc_key in enumerate(keys) if doc_key == key]
+        weights = [lexical_weights[row] for row in rows] if lexical_weights is not None else []
+        # The sparse arrays are rebuilt outside the lock, only the swap happens under it
+        sparse = shard["sparse"]
+        if sparse is not None:
+            sparse = sparse.update(changed_ids, weights, ids[rows])
+        elif weights:
+            sparse = SparseIndex.from_lexical_weights(weights, ids[rows])
+
+        with shard["lock"].write():
+            shard["index"].remove_ids(faiss.IDSelectorBatch(changed_ids))
+            if rows:
+                shard["index"].add_with_ids(embeddings[rows], ids[rows])
+            shard["sparse"] = sparse
+
+    replace_component("faiss_index", shards)
+    # Facet rows of the changed products are replaced too, a constrained search would otherwise
+    # miss new products and keep matching old attribute values
+    try:
+        replace_component("facets", get_facet_index().update(products, attributes, changed_ids))
+    except FileNotFoundError:
+        pass
+    for product_id in deleted:
+        id_to_doc.pop(product_id, None)
+    # Bumped once the shards changed, results cached meanwhile under the old version are never read again
+    get_index_version().bump()
+
+    INDEX_UPDATES.labels(op="upsert").inc(len(ids))
+    INDEX_UPDATES.labels(op="delete").inc(len(deleted))
+    return len(ids), len(deleted)
+
+def persist_index() -> str:
+    """
+    Writes the live shards, the manifest, the facets and the document map back to disk.
+
+    Every file is written to a temporary path and renamed into place, the version stamp
+    goes last so followers only reload complete files.
+
+    Returns:
+        The persisted index version.
+    """
+    import faiss
+
+    shards = get_shards()
+    manifest = read_manifest()
+    for key, shard in shards.items():
+        with shard["lock"].read():
+            replace_file(shard_index_path(key), lambda path: faiss.write_index(shard["index"], path))
+            if shard["sparse"] is not None:
+                replace_file(shard_sparse_path(key), shard["sparse"].save)
+        manifest["shards"][key] = {"file": shard_index_path(key), "count": shard["index"].ntotal}
+
+    if list(manifest["shards"]) != [UNSHARDED]:
+        write_manifest(manifest)
+    if is_warm("facets"):
+        replace_file(facet_index_path(), get_facet_index().save)
+
+    def write_documents(path):
+        with open(path, "wb") as f:
+            pickle.dump(dict(get_id_to_doc()), f)
+    replace_file(os.getenv("CHUNK_FILE"), write_documents)
+
+    version = get_index_version().value or get_index_version().bump()
+    write_index_version(version)
+    logger.info("💾 Persisted live index (%d shards)", len(shards))
+    return version
+
+class ProductChangeConsumer:
+    """
+    Applies the product_outbox change feed to the live index.
+
+    Waits on LISTEN product_changes and falls back to polling every CHANGE_POLL_SECONDS,
+    so a missed notification only delays an update, it never loses it.
+
+    One consumer per index owns the outbox, the one holding its Postgres advisory lock. It
+    applies changes, persists the index every INDEX_PERSIST_SECONDS and only then deletes
+    the applied rows, so a crash before a persist replays them on the next start. Consumers
+    in other processes follow the files instead: whenever the version stamp on disk changes
+    (a persist or a rebuild) they reload the index. The owner follows rebuilds the same way
+    and re-applies the rows it had not persisted yet.
+
+    Processes that serve retrieval through the sidecar run no consumer, the sidecar does.
+    """
+    def __init__(self, batch_size: int = CHANGE_BATCH_SIZE, poll_seconds: float = CHANGE_POLL_SECONDS,
+                 persist_seconds: float = INDEX_PERSIST_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.persist_seconds = persist_seconds
+        self.owner = False
+        self._stop = threading.Event()
+        # Held by every pass of the loop, `sync_with_disk` never reloads under a batch or a persist
+        self._lock = threading.Lock()
+        self._thread = None
+        # Outbox rows applied in memory but not persisted yet
+        self._pending = []
+        self._disk_version = None
+        self._last_persist = time.monotonic()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="product-change-consumer", daemon=True)
+        self._thread.start()
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+
+    def run(self):
+        conn = db.db_connection()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {CHANGE_FEED_CHANNEL}")
+        cursor.close()
+        self._disk_version = read_index_version()
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    with self._lock:
+                        self.follow_disk()
+                        if not self.owner:
+                            self.owner = db.try_advisory_lock(conn, f"{CHANGE_FEED_CHANNEL}:{os.getenv('INDEX_FILE')}")
+                            if self.owner:
+                                logger.info("🔑 This process now owns the product change feed")
+                        if self.owner:
+                            while self.process_batch(conn) == self.batch_size:
+                                pass
+                            INDEX_STALENESS.set(db.get_product_change_lag(conn, exclude_ids=self._pending))
+                            self.maybe_persist(conn)
+                except Exception as e:
+                    logger.exception("Change feed error: %s", e)
+
+                # Sleep until a notification arrives or the poll interval elapses
+                if select.select([conn], [], [], self.poll_seconds) != ([], [], []):
+                    conn.poll()
+                    conn.notifies.clear()
+        finally:
+            try:
+                with self._lock:
+                    if self._pending:
+                        self.persist(conn)
+            finally:
+                conn.close()
+
+    @contextmanager
+    def rebuilding(self):
+        """
+        Holds the loop while a rebuild in this process writes the index files.
+
+        A persist in the middle of the rebuild would write the old live index over the new
+        files. Afterwards the consumer follows the rebuild like one from another process.
+        """
+        with self._lock:
+            try:
+                yield
+            finally:
+                if self.running():
+                    self.follow_disk()
+
+    def sync_with_disk(self):
+        """Reloads the index now if a rebuild replaced it on disk, safe to call from any thread."""
+        with self._lock:
+            self.follow_disk()
+
+    def follow_disk(self):
+        version = read_index_version()
+        if version == self._disk_version:
+            return
+        # Unpersisted changes are dropped with the old index, their rows are still in the outbox
+        logger.info("🔄 Index on disk changed (%s -> %s), reloading", self._disk_version, version)
+        reload_index()
+        get_shards()
+        get_id_to_doc()
+        self._pending = []
+        self._disk_version = version
+
+    def process_batch(self, conn) -> int:
+        changes = db.get_product_changes(conn, limit=self.batch_size, exclude_ids=self._pending)
+        if not changes:
+            return 0
+
+        product_ids = sorted({change["product_id"] for change in changes})
+        start = time.perf_counter()
+        with span("index_update"):
+            upserted, deleted = apply_product_changes(conn, product_ids)
+        self._pending.extend(change["id"] for change in changes)
+
+        # age_seconds was measured when the batch was read, add the time spent applying it
+        elapsed = time.perf_counter() - start
+        for change in changes:
+            INDEX_UPDATE_LAG.observe(float(change["age_seconds"]) + elapsed)
+        logger.info("🔄 Applied %d product changes (%d upserted, %d deleted)", len(changes), upserted, deleted)
+        return len(changes)
+
+    def maybe_persist(self, conn):
+        if self._pending and time.monotonic() - self._last_persist >= self.persist_seconds:
+            self.persist(conn)
+
+    def persist(self, conn):
+        # The rows are deleted only once the index holding their changes is on disk
+        self._disk_version = persist_index()
+        db.delete_product_changes(conn, self._pending)
+        self._pending = []
+        self._last_persist = time.monotonic()
+
+if __name__ == "__main__":
+    consumer = ProductChangeConsumer(persist_seconds=0)
+    try:
+        consumer.run()
+    except KeyboardInterrupt:
+        pass
@@ -1,39 +1,300 @@
-import torch
 import os
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, pipeline
-from huggingface_hub import login
-from rag.retriever import retrieve_docs
+import threading
+import time
+from contextlib import ExitStack, nullcontext
+from rag.components import lazy_component
+from rag.retriever import retrieve_docs, get_index_version
+from rag.index_registry import DEFAULT_INDEX, get_index_registry
+from rag.shards import read_index_version
+from rag.coalescing import COALESCING_ENABLED, SingleFlight, Flight, normalize_query
+from rag.intent import route, record_llm_answer
+from rag.model_cache import load_quantized, nf4_settings
+from rag.sidecar_client import sidecar_enabled, get_sidecar_client
+from rag.telemetry import get_logger, span, observe_stage, LLM_GENERATED_TOKENS
+import rag.conversation as conv
+from rag.speculative import speculative_enabled, get_drafter, speculative_generate, record_stats
 from api.db.database import get_rag_configuration
 
-login(token=os.getenv("HUGGINGFACE_TOKEN"))
+logger = get_logger(__name__)
 
-model_id = "meta-llama/Llama-3.3-70B-Instruct"
+model_id = os.getenv("LLM_ID") or "meta-llama/Llama-3.3-70B-Instruct"
 
-bnb_config= BitsAndBytesConfig(
-    load_in_4bit=True,
-    llm_int8_threshold=6.0,
-    llm_int8_has_fp16_weight=False, 
-    # bnb_4bit_use_double_quant=True,
-    bnb_4bit_compute_dtype=torch.bfloat16,
-    bnb_4bit_quant_type="nf4"
-)
+answer_flights = SingleFlight("answer")
 
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-model = AutoModelForCausalLM.from_pretrained(model_id, 
-                                             device_map="auto", 
-                                             torch_dtype=torch.bfloat16, 
-                                             quantization_config=bnb_config)
+@lazy_component("llm_tokenizer")
+def get_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_id)
 
-print("[DEBUG] Model device:", next(model.parameters()).device)
+@lazy_component("llm_model")
+def get_model():
+    import torch
+    from huggingface_hub import login
 
-llm = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    login(token=os.getenv("HUGGINGFACE_TOKEN"))
 
-print("[DEBUG] CUDA available:", torch.cuda.is_available())
-print("[DEBUG] CUDA device count:", torch.cuda.device_count())
+    # nf4 weights come pre-quantized from the artifact cache when `python -m rag.model_cache` was run
+    model = load_quantized(model_id, nf4_settings())
+
+    logger.info("Model device: %s, CUDA available: %s, CUDA device count: %d",
+                next(model.parameters()).device, torch.cuda.is_available(), torch.cuda.device_count())
+    return model
+
+@lazy_component("llm")
+def get_llm():
+    from transformers import pipeline
+    return pipeline("text-generation", model=get_model(), tokenizer=get_tokenizer())
+
+def warm_llm():
+    get_llm()
+
+class GenerationTimer:
+    """
+    Streamer splitting generation time into prefill and decode.
+
+    `generate` pushes the prompt ids first and then every new token, so the time until
+    the first new token is the prefill, everything after it is decoding. With `on_text`
+    the new tokens are also decoded and passed on word by word.
+    """
+    def __init__(self, tokenizer=None, on_text=None):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end_at = None
+        self.new_tokens = 0
+        self._prompt_seen = False
+        self.on_text = on_text
+        self._text_streamer = None
+        self._emitted = False
+        if on_text is not None:
+            from transformers import TextStreamer
+            self._text_streamer = TextStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+            self._text_streamer.on_finalized_text = self._emit
+
+    def _emit(self, text: str, stream_end: bool = False):
+        # The returned answer is stripped, so is the start of the stream
+        if not self._emitted:
+            text = text.lstrip()
+        if text:
+            self._emitted = True
+            self.on_text(text)
+
+    def put(self, value):
+        if self._text_streamer is not None:
+            self._text_streamer.put(value)
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.new_tokens += value.numel()
+
+    def end(self):
+        self.end_at = time.perf_counter()
+        if self._text_streamer is not None:
+            self._text_streamer.end()
+
+    def record(self):
+        end_at = self.end_at or time.perf_counter()
+        first_token_at = self.first_token_at or end_at
+        observe_stage("llm_prefill", first_token_at - self.start)
+        observe_stage("llm_decode", end_at - first_token_at)
+        LLM_GENERATED_TOKENS.inc(self.new_tokens)
+
+def complete(prompt: str, max_tokens: int, on_text=None) -> str:
+    if speculative_enabled():
+        # Speculative decoding accepts tokens in runs, the answer is passed on whole
+        answer = complete_speculative(prompt, max_tokens)
+        if on_text is not None and answer:
+            on_text(answer)
+        return answer
+
+    llm = get_llm()
+    timer = GenerationTimer(get_tokenizer() if on_text is not None else None, on_text)
+    result = llm(prompt, max_new_tokens=max_tokens, do_sample=False, streamer=timer)
+    timer.record()
+    return result[0]["generated_text"][len(prompt):].strip()
+
+def complete_speculative(prompt: str, max_tokens: int) -> str:
+    # Same greedy output as the pipeline, with several tokens per forward pass of the 70B model
+    tokenizer, model = get_tokenizer(), get_model()
+    input_ids = tokenizer(prompt)["input_ids"]
+    eos_token_ids = model.generation_config.eos_token_id
+    eos_token_ids = set(eos_token_ids if isinstance(eos_token_ids, list) else [eos_token_ids])
+
+    generated, stats = speculative_generate(model, get_drafter(), input_ids, max_tokens, eos_token_ids=eos_token_ids)
+    record_stats(stats)
+    return tokenizer.decode(generated, skip_special_tokens=True).strip()
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text, add_special_tokens=False))
+
+def summarize_history(summary: str, turns: list) -> str:
+    dialogue = "\n".join(f"{'User' if role == 'user' else 'Assistant'}: {text}" for role, text, _ in turns)
+    prompt = f"""Update the running summary of a customer conversation with an e-commerce assistant.
+Keep product names, prices, brands and the customer's preferences. Write at most 3 sentences in Bahasa Indonesia.
+
+CURRENT SUMMARY:
+{summary or "-"}
+
+NEW TURNS:
+{dialogue}
+
+UPDATED SUMMARY:"""
+    return complete(prompt, max_tokens=256)
+
+def rewrite_query(session: dict, query: str) -> str:
+    """Rewrites a follow-up question into a standalone retrieval query using the conversation history."""
+    prompt = f"""Rewrite the last user question into a standalone product search query in Bahasa Indonesia.
+Resolve references such as "yang lebih murah" or "produk itu" using the conversation. Only output the query.
+
+CONVERSATION:
+{conv.format_history(session)}
+
+LAST USER QUESTION: {query}
+
+STANDALONE QUERY:"""
+    rewritten = complete(prompt, max_tokens=64).split("\n")[0].strip()
+    return rewritten or query
+
+def index_version(index_name: str = None) -> str:
+    # Read without loading the index, retrieval may run in the sidecar
+    if index_name and index_name != DEFAULT_INDEX:
+        spec = get_index_registry().specs.get(index_name)
+        return read_index_version(spec["index_file"]) if spec else None
+    return read_index_version() if sidecar_enabled() else get_index_version().value
+
+def answer_key(db_conn, query: str, session: dict, index_name: str = None):
+    """
+    Coalescing key of a question: normalized query, config version and index version.
+
+    None when the answer depends on the conversation so far, follow-ups are never shared.
+    """
+    if not COALESCING_ENABLED or conv.has_history(session):
+        return None
+    with span("config_fetch"):
+        rag_config = get_rag_configuration(db_conn)
+    return normalize_query(query), str(rag_config.get("updated_at")), index_name or DEFAULT_INDEX, index_version(index_name)
+
+def record_turn(session_id: str, session: dict, query: str, answer: str, admit=nullcontext):
+    """
+    Appends the turn to the session and saves it.
+
+    Folding evicted turns into the summary is an LLM call, it takes a slot of `admit` like an
+    answer does. Without a slot the evicted turns are dropped and the previous summary is kept,
+    the answer itself is already out and is never failed for it.
+    """
+    if not session_id:
+        return
+
+    def summarize(summary: str, turns: list) -> str:
+        gate = ExitStack()
+        try:
+            gate.enter_context(admit())
+        except Exception as e:
+            logger.warning("Summary of %d turns skipped, no LLM slot: %s", len(turns), e)
+            return summary
+        with gate:
+            return summarize_history(summary, turns)
+
+    conv.append_turn(session, query, answer, count_tokens=count_tokens, summarize=summarize)
+    conv.save_session(session_id, session)
+
+def lead_answer(key, flight: Flight, db_conn, query: str, session: dict, max_tokens: int, index_name: str, gate: ExitStack,
+                stream: bool = False):
+    # Every caller of the flight gets the result or the error, the leader included. Tokens are
+    # only decoded as they come when the leader streams, stream followers of a blocking leader
+    # get the whole answer at the end.
+    try:
+        with gate:
+            answer = answer_question(db_conn, query, session, max_tokens, index_name, on_text=flight.publish if stream else None)
+    except BaseException as e:
+        answer_flights.finish(key, flight, error=e)
+        return
+    answer_flights.finish(key, flight, answer)
+
+def start_response(db_conn, query: str, session: dict, max_tokens: int = 4096, index_name: str = None, admit=nullcontext,
+                   background: bool = False) -> Flight:
+    """
+    Joins the in-flight answer to the same question, or starts it.
+
+    Args:
+        db_conn: Database connection.
+        query: User question.
+        session: Conversation of the caller, see `answer_key`.
+        max_tokens: Maximum new tokens of the answer.
+        index_name: Registry index to answer from, the default index when None.
+        admit: Admission gate context manager entered by the leader only, followers hold no slot.
+        background: Generate in a thread and publish the text as it is decoded, for callers
+            following `Flight.stream`.
+
+    Returns:
+        The flight of the answer. Admission is decided before returning, a refused leader
+        raises here and its followers get the same error. Followers wait on it for at most
+        COALESCING_WAIT_TIMEOUT_SECONDS.
+    """
+    key = answer_key(db_conn, query, session, index_name)
+    flight, leader = answer_flights.join(key)
+    if not leader:
+        logger.debug("Joined the in-flight answer to %r", query)
+        return flight
+
+    gate = ExitStack()
+    try:
+        gate.enter_context(admit())
+    except BaseException as e:
+        answer_flights.finish(key, flight, error=e)
+        raise
+
+    args = (key, flight, db_conn, query, session, max_tokens, index_name, gate, background)
+    if background:
+        threading.Thread(target=lead_answer, args=args, name="answer-flight", daemon=True).start()
+    else:
+        lead_answer(*args)
+    return flight
+
+def generate_response(db_conn, query: str, max_tokens=4096, session_id: str = None, index_name: str = None, admit=nullcontext):
+    session = conv.load_session(session_id) if session_id else conv.new_session()
+    answer = start_response(db_conn, query, session, max_tokens, index_name, admit).result(answer_flights.wait_timeout)
+    record_turn(session_id, session, query, answer, admit)
+    return answer
+
+def stream_response(db_conn, query: str, max_tokens=4096, session_id: str = None, index_name: str = None, admit=nullcontext):
+    """
+    Starts or joins the answer and returns a generator of its text as it is decoded.
+
+    A late joiner first gets the text generated so far. The turn is recorded once the
+    stream is complete.
+    """
+    session = conv.load_session(session_id) if session_id else conv.new_session()
+    flight = start_response(db_conn, query, session, max_tokens, index_name, admit, background=True)
+
+    def chunks():
+        yield from flight.stream(answer_flights.wait_timeout)
+        record_turn(session_id, session, query, flight.result(), admit)
+    return chunks()
+
+def answer_question(db_conn, query: str, session: dict, max_tokens: int = 4096, index_name: str = None, on_text=None) -> str:
+    history = conv.format_history(session)
+
+    # Follow-up questions only make sense for retrieval once the references are resolved
+    retrieval_query = rewrite_query(session, query) if conv.has_history(session) else query
+    logger.debug("Retrieval query: %s", retrieval_query)
+
+    # Get relevant passages, from the retrieval sidecar when one is configured
+    if sidecar_enabled():
+        docs = get_sidecar_client().retrieve([retrieval_query], index_name=index_name)[0]
+    else:
+        docs = retrieve_docs(db_conn, retrieval_query, index_name=index_name)
+
+    # Single-product, single-field lookups are answered from the product row
+    # Other catalogs' products are not necessarily rows of this database
+    with span("intent_route"):
+        intent, answer = route(db_conn, retrieval_query, docs) if not index_name else ("other", None)
+    if answer is not None:
+        if on_text is not None:
+            on_text(answer)
+        return answer
 
-def generate_response(db_conn, query: str, max_tokens=4096):
-    # Get relevant passages
-    docs = retrieve_docs(db_conn, query)
     context = "\n\n".join([f"{i+1}. {doc['text']}" for i, doc in enumerate(docs)])
 
 #     prompt = f"""You are a highly accurate e-commerce chatbot assistant expert. Your main role is to help customers find product information and provide recommendations based **ONLY** on the provided product data.
@@ -57,26 +318,31 @@ def generate_response(db_conn, query: str, max_tokens=4096):
 # ANSWER:"""
     
     # Build prompt for llm
-    rag_config = get_rag_configuration(db_conn)
+    with span("config_fetch"):
+        rag_config = get_rag_configuration(db_conn)
 
-    prompt = f"""{rag_config["main_instruction"]}
+    with span("prompt_build"):
+        history_section = f"\nCONVERSATION HISTORY:\n{history}\n" if history else ""
+        prompt = f"""{rag_config["main_instruction"]}
 
 CRITICAL INSTRUCTIONS:
 {rag_config["critical_instruction"]}
 
 PROVIDED PRODUCT DATA:
 {context}
-
+{history_section}
 USER QUESTION: {query}
 
 ADDITIONAL RESPONSE GUIDELINES:
 {rag_config["additional_guideline"]}
 
 ANSWER:"""
-    print("[DEBUG] Prompt generated:", prompt)
+    logger.debug("Prompt generated with %d characters from %d documents", len(prompt), len(docs))
 
-    result = llm(prompt, max_new_tokens=max_tokens, do_sample=False)
-    return result[0]["generated_text"][len(prompt):].strip()
+    start = time.perf_counter()
+    answer = complete(prompt, max_tokens=max_tokens, on_text=on_text)
+    record_llm_answer(intent, time.perf_counter() - start)
+    return answer
 
 if __name__ == "__main__":
     import db.database as db
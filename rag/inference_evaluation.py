@@ -1,6 +1,6 @@
 from typing import List, Dict
 import evaluate
-from rag.inference import generate_response, model, tokenizer
+from rag.inference import generate_response, get_model, get_tokenizer
 from rag.db.database import db_connection
 from dotenv import load_dotenv
 import pandas as pd
@@ -21,16 +21,31 @@ class RAGGenerationEvaluator:
         self.rouge = evaluate.load("rouge")
         self.bertscore = evaluate.load("bertscore")
 
-    def compute_perplexity(self, texts: List[str]) -> float:
+    def compute_perplexity(self, texts: List[str], batch_size: int = 8) -> float:
         self.model.eval()
+        # Padded by hand, the tokenizer is shared with the serving path and must not be reconfigured
+        pad_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else self.tokenizer.eos_token_id
 
         ppl_scores = []
-        for text in texts:
-            inputs = self.tokenizer(text, return_tensors="pt").to(self.model.device)
+        for start in range(0, len(texts), batch_size):
+            encoded = [self.tokenizer(text)["input_ids"] for text in texts[start:start + batch_size]]
+            width = max(len(ids) for ids in encoded)
+            inputs = {
+                "input_ids": torch.tensor([ids + [pad_id] * (width - len(ids)) for ids in encoded], device=self.model.device),
+                "attention_mask": torch.tensor([[1] * len(ids) + [0] * (width - len(ids)) for ids in encoded], device=self.model.device),
+            }
             with torch.no_grad():
-                outputs = self.model(**inputs, labels=inputs["input_ids"])
-                loss = outputs.loss
-            ppl_scores.append(math.exp(loss.item()))
+                logits = self.model(**inputs).logits
+
+            # Per-text mean token loss, padded positions are masked out of the average
+            shift_logits = logits[:, :-1, :].float()
+            shift_labels = inputs["input_ids"][:, 1:]
+            shift_mask = inputs["attention_mask"][:, 1:].float()
+            token_loss = torch.nn.functional.cross_entropy(
+                shift_logits.transpose(1, 2), shift_labels, reduction="none"
+            )
+            loss = (token_loss * shift_mask).sum(dim=1) / shift_mask.sum(dim=1).clamp(min=1)
+            ppl_scores.extend(math.exp(value) for value in loss.tolist())
         return round(sum(ppl_scores) / len(ppl_scores), 4)
 
     def compute_rouge(self, predictions: List[str], references: List[str]) -> dict:
@@ -131,7 +146,7 @@ if __name__ == "__main__":
 
     print("Running RAG Generation Evaluation...")
     print()
-    evaluator = RAGGenerationEvaluator(unit_tests=test_cases, model=model, tokenizer=tokenizer)
+    evaluator = RAGGenerationEvaluator(unit_tests=test_cases, model=get_model(), tokenizer=get_tokenizer())
 
     db_conn = db_connection()
     metrics, tc = evaluator.evaluate_generation(db_conn, lang="id")
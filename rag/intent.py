@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import threading
+import rag.db.database as db
+from rag.helpers.document_utils import format_currency
+from rag.telemetry import get_logger, INTENT_ROUTES, LLM_LATENCY_SAVED
+
+logger = get_logger(__name__)
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_MIN_NAME_COVERAGE = float(os.getenv("INTENT_MIN_NAME_COVERAGE") or 0.8)
+INTENT_MIN_MENTION_TOKENS = int(os.getenv("INTENT_MIN_MENTION_TOKENS") or 2)
+CONDITION_ATTRIBUTE_ID = int(os.getenv("CONDITION_ATTRIBUTE_ID") or 17)
+
+# Field -> keywords asking for it, matched on whole words of the lowercased query
+FIELD_PATTERNS = {
+    "shipping": r"ongkir|ongkirnya|ongkos\s+kirim(?:nya)?|biaya\s+(?:kirim|pengiriman)(?:nya)?|shipping",
+    "discount": r"diskon(?:nya)?|potongan\s+harga|promo(?:nya)?",
+    "price": r"harga(?:nya)?|berapaan|price",
+    "condition": r"kondisi(?:nya)?|baru|bekas|second|seken|original\s+baru",
+    "weight": r"berat(?:nya)?|bobot(?:nya)?",
+    "warranty": r"garansi(?:nya)?|warranty",
+    "min_purchase": r"minimal\s+(?:beli|pembelian|order)|min\s+(?:beli|order)",
+}
+FIELD_RES = {field: re.compile(rf"(?<![a-z0-9])(?:{pattern})(?![a-z0-9])") for field, pattern in FIELD_PATTERNS.items()}
+
+# Anything comparative or open-ended needs the LLM even if it names a single field
+OPEN_ENDED_RE = re.compile(
+    r"(?<![a-z0-9])(?:rekomendasi\w*|sarankan|saran|bandingkan|banding\w*|vs|versus|atau|lebih|paling|termurah|"
+    r"termahal|terbaik|murah|mahal|bagus|cocok|kenapa|mengapa|bagaimana|gimana|jelaskan|semua|daftar|produk\s+lain)(?![a-z0-9])"
+)
+
+STOPWORDS = {
+    "berapa", "berapakah", "apakah", "apa", "ini", "itu", "yang", "untuk", "dari", "di", "ke", "ya", "kak", "min", "gan",
+    "sis", "dong", "sih", "nya", "ada", "adalah", "produk", "barang", "item", "tolong", "info", "mau", "tanya", "saya",
+    "kalau", "kalo", "buat", "the", "of", "is", "how", "much", "what", "hp", "handphone", "sekarang", "skrg", "jual",
+    "disini", "kah", "masih",
+}
+
+# Condition a yes/no question asks about ("masih baru?", "ini bekas?")
+ASKED_CONDITION_RES = {
+    "bekas": re.compile(r"(?<![a-z0-9])(?:bekas|second|seken)(?![a-z0-9])"),
+    "baru": re.compile(r"(?<![a-z0-9])baru(?![a-z0-9])"),
+}
+
+NAME_RE = re.compile(r"\*\*Product Name\*\*\s*:\s*(.+)")
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def detect_field(query: str):
+    """
+    Returns the single product field a query asks about, or None.
+
+    Queries naming several fields ("harga dan ongkir") or asking for comparisons and
+    recommendations are left to the LLM.
+    """
+    text = query.lower()
+    if OPEN_ENDED_RE.search(text):
+        return None
+    fields = [field for field, pattern in FIELD_RES.items() if pattern.search(text)]
+    # "potongan harga" and "harga diskon" are discount questions, not two fields
+    if set(fields) == {"price", "discount"}:
+        fields = ["discount"]
+    return fields[0] if len(fields) == 1 else None
+
+def product_mention(query: str) -> set:
+    """Query tokens left once field keywords and filler words are removed, i.e. the product the query names."""
+    text = query.lower()
+    for pattern in FIELD_RES.values():
+        text = pattern.sub(" ", text)
+    return {token for token in _tokens(text) if token not in STOPWORDS}
+
+def match_product(query: str, docs: list[dict]):
+    """
+    Picks the one retrieved product the query names, or None when no product or several match.
+
+    The query has to name at least INTENT_MIN_MENTION_TOKENS product tokens, a brand alone
+    ("harga samsung") names no product. A candidate's name must contain at least
+    INTENT_MIN_NAME_COVERAGE of them, listing titles are long ("Xiaomi 14T 12/512gb New
+    garansi xiaomi indonesia - Black") so only the query side is measured.
+
+    The candidate sharing the most tokens wins, then the one naming them earliest: titles
+    lead with the product, accessories list what they fit further on ("Charger ... for
+    iPhone 16 15 14"). A tie on both is ambiguous ("samsung galaxy" with the A15 and the
+    S25 Ultra retrieved, "iphone 15" with the 15 and the 15 Pro).
+    """
+    mention = product_mention(query)
+    if len(mention) < INTENT_MIN_MENTION_TOKENS:
+        return None
+
+    ranks = {}
+    for doc in docs:
+        match = NAME_RE.search(doc["text"])
+        if not match:
+            continue
+        name_tokens = _tokens(match.group(1))
+        shared = mention.intersection(name_tokens)
+        if len(shared) / len(mention) >= INTENT_MIN_NAME_COVERAGE:
+            ranks[doc["id"]] = (-len(shared), sum(name_tokens.index(token) for token in shared))
+
+    if not ranks:
+        return None
+    candidates = sorted((rank, product_id) for product_id, rank in ranks.items())
+    if len(candidates) > 1 and candidates[0][0] == candidates[1][0]:
+        return None
+    return candidates[0][1]
+
+def _condition(product: dict):
+    try:
+        attributes = json.loads(product.get("attributes_value") or "[]")
+    except (TypeError, json.JSONDecodeError):
+        return None
+    for item in attributes:
+        if str(item.get("attribute_id")) == str(CONDITION_ATTRIBUTE_ID) and item.get("values"):
+            return item["values"][0].replace("-", " ").strip().lower()
+    return None
+
+def asked_condition(query: str):
+    """The condition ("baru" or "bekas") a query asks to confirm, None when it asks about both or neither."""
+    text = query.lower()
+    asked = [condition for condition, pattern in ASKED_CONDITION_RES.items() if pattern.search(text)]
+    return asked[0] if len(asked) == 1 else None
+
+def render_answer(field: str, product: dict, query: str = ""):
+    """
+    Templated Bahasa Indonesia answer for one field of a product row, None when the row lacks the field.
+
+    The query decides between "Ya" and "Tidak" when it asks to confirm a condition.
+    """
+    name = product["name"]
+    if field == "price":
+        answer = f"Harga {name} adalah {format_currency(product['price'])}."
+        if product.get("discount"):
+            answer += f" Saat ini ada diskon sebesar {format_currency(product['discount'])}."
+        return answer
+    if field == "discount":
+        if not product.get("discount"):
+            return f"Saat ini {name} tidak sedang diskon, harganya {format_currency(product['price'])}."
+        return f"{name} sedang diskon sebesar {format_currency(product['discount'])} dari harga {format_currency(product['price'])}."
+    if field == "shipping":
+        if product.get("shipping_fee") is None:
+            return None
+        if not product["shipping_fee"]:
+            return f"Pengiriman {name} gratis ongkir."
+        return f"Ongkos kirim untuk {name} adalah {format_currency(product['shipping_fee'])}."
+    if field == "condition":
+        condition = _condition(product)
+        if condition is None:
+            return None
+        asked = asked_condition(query)
+        if asked is None:
+            return f"{name} dijual dalam kondisi {condition}."
+        return f"{'Ya' if asked == condition else 'Tidak'}, {name} dijual dalam kondisi {condition}."
+    if field == "weight":
+        if product.get("weight") is None:
+            return None
+        return f"Berat {name} adalah {product['weight']} kg."
+    if field == "warranty":
+        if not product.get("warranty_policy"):
+            return f"{name} tidak mencantumkan informasi garansi."
+        return f"{name} memiliki garansi: {product['warranty_policy']}."
+    if field == "min_purchase":
+        return f"Minimal pembelian {name} adalah {product.get('minimum_purchase_qty') or 1} buah."
+    return None
+
+class LatencyTracker:
+    """Exponential moving average of LLM answer latency, the estimate of what a routed query saves."""
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.average = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.average = seconds if self.average is None else self.average + self.alpha * (seconds - self.average)
+
+llm_latency = LatencyTracker()
+
+def route(db_conn, query: str, docs: list[dict]):
+    """
+    Answers single-product, single-field lookups from the product row without the LLM.
+
+    Args:
+        db_conn: Database connection, the row is read fresh so prices are never stale.
+        query: Standalone user question.
+        docs: Retrieved documents for the query.
+
+    Returns:
+        A tuple of the detected intent ("other" for anything but a field lookup) and the
+        templated answer, the answer is None when the query has to go to the LLM.
+    """
+    field = detect_field(query) if INTENT_ROUTER_ENABLED else None
+    if field is None:
+        return "other", None
+    product_id = match_product(query, docs)
+    if product_id is None:
+        return field, None
+
+    rows = db.get_products_by_ids(db_conn, [product_id])
+    answer = render_answer(field, rows[0], query) if rows else None
+    if answer:
+        INTENT_ROUTES.labels(intent=field, route="template").inc()
+        if llm_latency.average is not None:
+            LLM_LATENCY_SAVED.inc(llm_latency.average)
+        logger.debug("Intent %s for product %s answered from template", field, product_id)
+    return field, answer
+
+def record_llm_answer(intent: str, seconds: float):
+    INTENT_ROUTES.labels(intent=intent, route="llm").inc()
+    llm_latency.observe(seconds)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from rag.telemetry import get_logger, MODEL_LOAD_SECONDS
+
+logger = get_logger(__name__)
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR") or "rag/data/model_cache"
+MODEL_CACHE_SHARD_SIZE = os.getenv("MODEL_CACHE_SHARD_SIZE") or "2GB"
+MODEL_CACHE_EXPORT_ON_MISS = os.getenv("MODEL_CACHE_EXPORT_ON_MISS", "false").lower() == "true"
+
+# Written last, a directory without it is an interrupted export
+MARKER_FILE = "artifact.json"
+
+def nf4_settings() -> dict:
+    """The 4-bit quantization the LLM is served with, also part of the cache key."""
+    return {
+        "load_in_4bit": True,
+        "llm_int8_threshold": 6.0,
+        "llm_int8_has_fp16_weight": False,
+        "bnb_4bit_compute_dtype": "bfloat16",
+        "bnb_4bit_quant_type": "nf4",
+    }
+
+def bnb_config(settings: dict):
+    import torch
+    from transformers import BitsAndBytesConfig
+    return BitsAndBytesConfig(**{**settings, "bnb_4bit_compute_dtype": getattr(torch, settings["bnb_4bit_compute_dtype"])})
+
+def artifact_key(model_id: str, settings: dict) -> str:
+    import transformers
+    # Serialized 4-bit layouts are only guaranteed to load with the library versions that wrote them
+    key = json.dumps({"model_id": model_id, "quantization": settings, "transformers": transformers.__version__}, sort_keys=True)
+    slug = re.sub(r"[^a-zA-Z0-9._-]+", "--", model_id).strip("-")
+    return f"{slug}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+def artifact_path(model_id: str, settings: dict, cache_dir: str = None) -> str:
+    return os.path.join(cache_dir or MODEL_CACHE_DIR, artifact_key(model_id, settings))
+
+def is_cached(model_id: str, settings: dict, cache_dir: str = None) -> bool:
+    return os.path.exists(os.path.join(artifact_path(model_id, settings, cache_dir), MARKER_FILE))
+
+def export_quantized(model, model_id: str, settings: dict, tokenizer=None, cache_dir: str = None,
+                     max_shard_size: str = MODEL_CACHE_SHARD_SIZE) -> str:
+    """
+    Saves an already quantized model into the artifact cache as sharded safetensors.
+
+    The files go to a temporary directory that is renamed into place once complete, so a
+    crashed export never leaves a directory the loader would pick up.
+
+    Returns:
+        The artifact directory.
+    """
+    path = artifact_path(model_id, settings, cache_dir)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    start = time.perf_counter()
+    model.save_pretrained(tmp_path, safe_serialization=True, max_shard_size=max_shard_size)
+    if tokenizer is not None:
+        tokenizer.save_pretrained(tmp_path)
+    with open(os.path.join(tmp_path, MARKER_FILE), "w") as f:
+        json.dump({"model_id": model_id, "quantization": settings, "exported_at": time.time()}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    logger.info("💾 Quantized %s exported to %s in %.1fs", model_id, path, time.perf_counter() - start)
+    return path
+
+def load_quantized(model_id: str, settings: dict = None, cache_dir: str = None, device_map="auto",
+                   export_on_miss: bool = MODEL_CACHE_EXPORT_ON_MISS, **kwargs):
+    """
+    Loads the quantized LLM, from the artifact cache when an export exists.
+
+    A cache hit reads the pre-quantized safetensors (memory mapped, the quantization config
+    travels in config.json) instead of reading the full-precision checkpoint and quantizing
+    it on the fly. On a miss the model is quantized from `model_id` and, with
+    `export_on_miss` (MODEL_CACHE_EXPORT_ON_MISS), exported for the next start.
+
+    Returns:
+        The model, its load time is logged and set on `rag_model_load_seconds{source}`.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    settings = settings or nf4_settings()
+    path = artifact_path(model_id, settings, cache_dir)
+    start = time.perf_counter()
+    if is_cached(model_id, settings, cache_dir):
+        source = "cache"
+        model = AutoModelForCausalLM.from_pretrained(path, device_map=device_map, **kwargs)
+    else:
+        source = "checkpoint"
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id, device_map=device_map, torch_dtype=torch.bfloat16, quantization_config=bnb_config(settings), **kwargs
+        )
+    seconds = time.perf_counter() - start
+    MODEL_LOAD_SECONDS.labels(source=source).set(seconds)
+    logger.info("✅ Loaded %s from %s in %.1fs", model_id, path if source == "cache" else "checkpoint", seconds)
+
+    if source == "checkpoint" and export_on_miss:
+        export_quantized(model, model_id, settings, cache_dir=cache_dir)
+    return model
+
+if __name__ == "__main__":
+    # One-time export: python -m rag.model_cache [model_id]
+    import sys
+    from transformers import AutoTokenizer
+    from huggingface_hub import login
+
+    model_id = sys.argv[1] if len(sys.argv) > 1 else (os.getenv("LLM_ID") or "meta-llama/Llama-3.3-70B-Instruct")
+    if os.getenv("HUGGINGFACE_TOKEN"):
+        login(token=os.getenv("HUGGINGFACE_TOKEN"))
+    settings = nf4_settings()
+    if is_cached(model_id, settings):
+        print(f"[v] {model_id} is already cached at {artifact_path(model_id, settings)}")
+    else:
+        model = load_quantized(model_id, settings, export_on_miss=False)
+        path = export_quantized(model, model_id, settings, tokenizer=AutoTokenizer.from_pretrained(model_id))
+        print(f"[v] {model_id} exported to {path}")
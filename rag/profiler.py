@@ -0,0 +1,156 @@
+"""
+On-demand profiling of a live worker.
+
+A profile samples the Python stack of every thread with `sys._current_frames` for a fixed
+time and, optionally, traces allocations with tracemalloc over the same window. Nothing is
+hooked into the interpreter outside a profile, so an idle profiler costs nothing.
+
+Stacks come out in the collapsed format of flamegraph.pl / speedscope / inferno:
+"thread;outer (file:line);...;leaf (file:line) count".
+"""
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from rag.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS") or 60)
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS") or 10)
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES") or 1)
+
+# Leaf frames of threads parked on a lock, queue or selector, dropped unless idle stacks are asked for
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+
+# Longest first so site-packages wins over the stdlib directory containing it
+_PATH_PREFIXES = sorted(
+    {os.path.join(os.getcwd(), "")} | {os.path.join(sysconfig.get_paths()[key], "") for key in ("purelib", "platlib", "stdlib")},
+    key=len,
+    reverse=True,
+)
+
+_running = threading.Lock()
+
+class ProfilerBusy(Exception):
+    pass
+
+def short_path(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+def collapse_stack(frame) -> tuple[str, bool]:
+    """
+    Returns the root-to-leaf stack of a frame joined with ";" and whether its leaf is idle.
+    """
+    code = frame.f_code
+    idle = (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(labels)), idle
+
+def sample_stacks(seconds: float, interval: float, include_idle: bool = False) -> tuple[Counter, int]:
+    """
+    Samples the stacks of every other thread until `seconds` have passed.
+
+    Returns:
+        A tuple of the collapsed stack -> sample count counter and the number of sampling rounds.
+    """
+    own = threading.get_ident()
+    stacks = Counter()
+    rounds = 0
+    deadline = time.monotonic() + seconds
+    while True:
+        started = time.monotonic()
+        if started >= deadline:
+            break
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack, idle = collapse_stack(frame)
+            if idle and not include_idle:
+                continue
+            stacks[f"{names.get(ident, ident)};{stack}"] += 1
+        rounds += 1
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return stacks, rounds
+
+def allocation_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> list[dict]:
+    # The profiler's own bookkeeping is not what anyone is looking for
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    sites = []
+    for stat in diff:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        sites.append({"file": short_path(frame.filename), "line": frame.lineno, "size_bytes": stat.size_diff, "count": stat.count_diff})
+        if len(sites) == limit:
+            break
+    return sites
+
+def run_profile(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000, allocations: bool = True,
+                include_idle: bool = False, top_allocations: int = 25) -> dict:
+    """
+    Profiles this process for a time-boxed window.
+
+    Args:
+        seconds: Length of the window, capped at PROFILE_MAX_SECONDS.
+        interval: Seconds between stack samples.
+        allocations: Trace allocations with tracemalloc during the window.
+        include_idle: Keep samples of threads parked on locks, queues and selectors.
+        top_allocations: Number of allocation sites to return.
+
+    Returns:
+        A dict with the collapsed stacks (most sampled first), the sampling rounds and, when
+        `allocations` is set, the top sites by bytes allocated and still alive at the end.
+
+    Raises:
+        ProfilerBusy: Another profile is running in this process.
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+
+    seconds = max(0.0, min(seconds, PROFILE_MAX_SECONDS))
+    interval = max(interval, 0.001)
+    started_tracing = False
+    try:
+        logger.info("🔬 Profiling worker %d for %.1fs (allocations: %s)", os.getpid(), seconds, allocations)
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            started_tracing = True
+        before = tracemalloc.take_snapshot() if allocations else None
+
+        stacks, rounds = sample_stacks(seconds, interval, include_idle)
+
+        sites = allocation_sites(before, tracemalloc.take_snapshot(), top_allocations) if allocations else None
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _running.release()
+
+    return {
+        "pid": os.getpid(),
+        "seconds": seconds,
+        "interval_ms": round(interval * 1000, 3),
+        "rounds": rounds,
+        "samples": sum(stacks.values()),
+        "stacks": [f"{stack} {count}" for stack, count in stacks.most_common()],
+        "allocations": sites,
+    }
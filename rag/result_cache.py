@@ -0,0 +1,139 @@
+"""
+Top-k retrieval results cached per (query, index version, top_k, filters).
+
+A search is deterministic for a given encoder input, index contents, top_k and filters,
+so its ids and scores can be reused as long as the index does not change. Every build of
+`embedd_product_data` stamps a new index version and live updates move the in-memory one,
+the version is part of the key, so a rebuild invalidates every entry at once without
+scanning the cache. Old entries are never read again and age out of the LRU (or the Redis TTL).
+
+Only ids and scores are stored, 12 bytes per hit, the texts come from the index documents.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+import orjson
+from rag.components import lazy_component, EMBEDDING_MODEL_ID
+from rag.sparse import hybrid_enabled
+from rag.telemetry import get_logger, RESULT_CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES") or 10000)
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS") or 3600)
+
+def new_index_version() -> str:
+    return uuid.uuid4().hex
+
+class IndexVersion:
+    """Version of the index this process serves, moved by live updates without reloading."""
+    def __init__(self, value: str = None):
+        self.value = value
+
+    def bump(self) -> str:
+        self.value = new_index_version()
+        return self.value
+
+def result_key(index_name: str, index_version: str, encoder_input: str, top_k: int,
+               shard_keys: list = None, constraints: list = None) -> str:
+    """
+    Cache key of one search.
+
+    The encoder input (instruction + query) and the embedding model fully determine the
+    query embedding, so they stand in for it and a hit skips the encode as well.
+    """
+    mode = "hybrid" if hybrid_enabled() else "dense"
+    payload = orjson.dumps([index_name, index_version, EMBEDDING_MODEL_ID, mode, encoder_input, top_k,
+                            sorted(shard_keys) if shard_keys else None, constraints], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha1(payload).hexdigest()
+
+def pack_results(ids: np.ndarray, scores: np.ndarray) -> bytes:
+    return np.asarray(ids, dtype="<i8").tobytes() + np.asarray(scores, dtype="<f4").tobytes()
+
+def unpack_results(payload: bytes) -> tuple[np.ndarray, np.ndarray]:
+    k = len(payload) // 12
+    return np.frombuffer(payload, dtype="<i8", count=k), np.frombuffer(payload, dtype="<f4", count=k, offset=8 * k)
+
+class ResultCache:
+    """In-process LRU of packed results, capped at `max_entries`."""
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key: str, payload: bytes):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisResultCache(ResultCache):
+    """
+    Results shared by every worker through Redis, with the in-process LRU in front.
+
+    Redis errors count as misses, a cache outage slows retrieval down but never fails it.
+    """
+    def __init__(self, url: str, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: int = RESULT_CACHE_TTL_SECONDS,
+                 prefix: str = "rag:results:"):
+        import redis
+
+        super().__init__(max_entries)
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._errors = redis.RedisError
+
+    def get(self, key: str) -> bytes:
+        payload = super().get(key)
+        if payload is not None:
+            return payload
+        try:
+            payload = self.client.get(self.prefix + key)
+        except self._errors as e:
+            logger.warning("Result cache read failed: %s", e)
+            return None
+        if payload is not None:
+            super().put(key, payload)
+        return payload
+
+    def put(self, key: str, payload: bytes):
+        super().put(key, payload)
+        try:
+            self.client.set(self.prefix + key, payload, ex=self.ttl)
+        except self._errors as e:
+            logger.warning("Result cache write failed: %s", e)
+
+@lazy_component("result_cache")
+def get_result_cache():
+    url = os.getenv("RESULT_CACHE_BACKEND_URL")
+    if url:
+        return RedisResultCache(url)
+    return ResultCache()
+
+def lookup(key: str):
+    """Returns the cached (ids, scores) of a search, or None."""
+    payload = get_result_cache().get(key)
+    RESULT_CACHE_REQUESTS.labels(result="miss" if payload is None else "hit").inc()
+    return None if payload is None else unpack_results(payload)
+
+def store(key: str, ids: np.ndarray, scores: np.ndarray):
+    get_result_cache().put(key, pack_results(ids, scores))
@@ -1,44 +1,225 @@
-import faiss
 import os
 import pickle
-from sentence_transformers import SentenceTransformer
+from contextlib import contextmanager
+import numpy as np
+import orjson
+from rag.components import lazy_component, reset_component, get_embedding_model
+from rag.sparse import hybrid_enabled, encode_hybrid, get_bge_m3_model
+from rag.shards import load_shards, search_shards, read_index_version
+from rag.facets import get_facet_index, parse_constraints
+from rag.index_registry import DEFAULT_INDEX, HostedIndex, get_index_registry
+from rag.result_cache import RESULT_CACHE_ENABLED, IndexVersion, result_key, lookup, store
+from rag.coalescing import COALESCING_ENABLED, SingleFlight, normalize_query
+from rag.telemetry import get_logger, span
 from api.db.database import get_rag_configuration
 
-def get_detailed_instruct(task_description: str, query: str) -> str:
-    return f'Instruct: {task_description}\nQuery: {query}'
+logger = get_logger(__name__)
+
+# Off by default, constraints parsed from free text are applied as hard filters
+FACET_QUERY_PARSING = os.getenv("FACET_QUERY_PARSING", "false").lower() == "true"
+
+retrieval_flights = SingleFlight("retrieval")
+
+if hybrid_enabled():
+    RETRIEVAL_COMPONENTS = ["bge_m3_model", "faiss_index", "documents"]
+else:
+    RETRIEVAL_COMPONENTS = ["embedding_model", "faiss_index", "documents"]
 
-def retrieve_docs(db_conn, qry) :
-    index = faiss.read_index(os.getenv("INDEX_FILE"))
+@lazy_component("faiss_index")
+def get_shards():
+    # Shard key -> {"index": FAISS index, "sparse": lexical weights index or None}
+    return load_shards()
+
+@lazy_component("documents")
+def get_id_to_doc():
+    # Product id -> document text. Indexes built before ids were stored map positions to a list,
+    # which is indexed the same way.
     with open(os.getenv("CHUNK_FILE"), "rb") as f:
-        id_to_doc = pickle.load(f)
+        return pickle.load(f)
 
-    model = SentenceTransformer("BAAI/bge-m3")
+@lazy_component("index_version")
+def get_index_version():
+    # Read with the shards, live updates bump it in memory and `persist_index` stamps it
+    return IndexVersion(read_index_version())
 
-    # Build instruction for embedding model
-    rag_config = get_rag_configuration(db_conn)
-    task = rag_config['retriever_instruction']
-    print("[DEBUG] Retriever Instruction :", task)
-    print("[DEBUG] Top-K Retrieval value :", rag_config['top_k_retrieval'])
+def reload_index():
+    reset_component("faiss_index")
+    reset_component("documents")
+    reset_component("facets")
+    reset_component("index_version")
+
+@contextmanager
+def open_index(index_name: str = None):
+    """
+    Yields the `HostedIndex` to search, the default index unless a registry index is named.
+
+    Registry indexes are pinned for the duration of the block so eviction never pulls them
+    from under a running search.
+    """
+    if not index_name or index_name == DEFAULT_INDEX:
+        # The version is read first, a live update landing meanwhile bumps it after changing the shards
+        version = get_index_version().value
+        yield HostedIndex(DEFAULT_INDEX, get_shards(), get_id_to_doc(), facets_loader=get_facet_index, version=version)
+        return
+    with get_index_registry().use(index_name) as index:
+        yield index
 
-    embedding = model.encode(
-        get_detailed_instruct(task, qry),
+def warm_retrieval():
+    if hybrid_enabled():
+        get_bge_m3_model()
+    else:
+        get_embedding_model()
+    get_shards()
+    get_id_to_doc()
+
+def encode_queries(queries: list[str], batch_size: int = 32):
+    """
+    Encodes queries with the configured embedding mode.
+
+    Returns:
+        A tuple of the (n, d) normalized dense matrix and the per-query lexical weights
+        (None in dense mode).
+    """
+    if hybrid_enabled():
+        return encode_hybrid(queries, batch_size=batch_size)
+
+    embeddings = get_embedding_model().encode(
+        queries,
+        batch_size=batch_size,
         convert_to_numpy=True,
         normalize_embeddings=True
-    ).reshape(1, -1)
+    )
+    return embeddings, None
+
+def search(embeddings, lexical_weights, top_k: int, shard_keys: list = None, allowed_ids: np.ndarray = None, shards: dict = None):
+    """Searches all (or the given) shards, dense and lexical scores come from the same encode."""
+    return search_shards(shards or get_shards(), embeddings, lexical_weights, top_k, keys=shard_keys, allowed_ids=allowed_ids)
+
+def facet_filter(query: str, constraints: list = None, get_facets=get_facet_index):
+    """
+    Resolves facet constraints to the product ids allowed in the search.
+
+    Args:
+        query: Query text, constraints are parsed from it when none are given and FACET_QUERY_PARSING is on.
+        constraints: Explicit constraints, see `FacetIndex.mask`.
+        get_facets: Facet index accessor of the index being searched.
+
+    Returns:
+        An int64 array of allowed product ids, or None when the search is unrestricted.
+        Constraints parsed from the query that match no product are dropped rather than
+        returning nothing, explicit ones are not.
+    """
+    parsed = constraints is None
+    if parsed:
+        constraints = parse_constraints(query) if FACET_QUERY_PARSING else []
+    if not constraints:
+        return None
+
+    try:
+        facets = get_facets()
+    except FileNotFoundError:
+        return None
+
+    allowed_ids = facets.filter_ids(constraints)
+    logger.debug("Facet constraints %s allow %d products", constraints, len(allowed_ids))
+    if parsed and len(allowed_ids) == 0:
+        return None
+    return allowed_ids
+
+def get_detailed_instruct(task_description: str, query: str) -> str:
+    return f'Instruct: {task_description}\nQuery: {query}'
+
+def retrieve_docs(db_conn, qry, shard_keys: list = None, constraints: list = None, index_name: str = None) :
+    # Build instruction for embedding model
+    with span("config_fetch"):
+        rag_config = get_rag_configuration(db_conn)
+    task = rag_config['retriever_instruction']
+    logger.debug("Retriever instruction: %s, top-k: %s", task, rag_config['top_k_retrieval'])
+
+    instructed = get_detailed_instruct(task, qry)
+    with open_index(index_name) as index:
+        # Identical queries arriving together share one encode and search
+        flight_key = None
+        if COALESCING_ENABLED:
+            flight_key = (normalize_query(qry), str(rag_config.get('updated_at')), index.name, index.version,
+                          tuple(shard_keys) if shard_keys else None, orjson.dumps(constraints, option=orjson.OPT_SORT_KEYS))
+        docs = retrieval_flights.run(flight_key, search_index, index, qry, instructed, rag_config['top_k_retrieval'], shard_keys, constraints)
+        return [dict(doc) for doc in docs]
+
+def search_index(index: HostedIndex, qry: str, instructed: str, top_k: int, shard_keys: list = None, constraints: list = None):
+    key = None
+    if RESULT_CACHE_ENABLED and index.version is not None:
+        key = result_key(index.name, index.version, instructed, top_k, shard_keys, constraints)
+        with span("result_cache"):
+            cached = lookup(key)
+        if cached is not None:
+            ids, scores = cached
+            with span("doc_lookup"):
+                return [{"id": int(i), "text": index.documents[i], "score": float(score)} for i, score in zip(ids, scores)]
+
+    with span("facet_filter"):
+        allowed_ids = facet_filter(qry, constraints, get_facets=index.get_facets)
+
+    with span("query_embed"):
+        embedding, lexical_weights = encode_queries([instructed])
 
 
     # Distance & Indices
-    print("🔍 Searching FAISS index...")
-    D, I = index.search(embedding, rag_config['top_k_retrieval'])
-    print(f"✅ Found {len(I[0])} results")
+    with span("faiss_search"):
+        D, I = search(embedding, lexical_weights, top_k, shard_keys=shard_keys, allowed_ids=allowed_ids, shards=index.shards)
+    logger.debug("Found %d results", len(I[0]))
 
-    return [{"text": id_to_doc[i], "score": float(D[0][idx])} for idx, i in enumerate(I[0])]
+    # FAISS pads with -1 when the index holds fewer than top-k vectors
+    found = I[0] != -1
+    if key is not None:
+        store(key, I[0][found], D[0][found])
 
-def get_docs(indices):
-    index = faiss.read_index(os.getenv("INDEX_FILE"))
-    with open(os.getenv("CHUNK_FILE"), "rb") as f:
-        id_to_doc = pickle.load(f)
-    return [id_to_doc[i] for i in indices]
+    with span("doc_lookup"):
+        return [{"id": int(i), "text": index.documents[i], "score": float(score)} for i, score in zip(I[0][found], D[0][found])]
+
+def retrieve_docs_batch(db_conn, queries: list[str], top_ks: list = None, batch_size: int = 32, shard_keys: list = None,
+                        index_name: str = None):
+    """
+    Retrieves documents for many queries with one batched encode and one search.
+
+    The search runs once at the largest requested top_k over the (n, d) query matrix, each
+    query's results are then cut to its own top_k.
+
+    Args:
+        db_conn: Database connection.
+        queries: Query texts.
+        top_ks: Per-query top_k, None entries (or no list) fall back to the configured top_k.
+        batch_size: Encoder batch size.
+        shard_keys: Shard keys to search, all shards when None.
+        index_name: Registry index to search, the default index when None.
+
+    Returns:
+        One list of {"id", "text", "score"} per query, in input order.
+    """
+    if not queries:
+        return []
+
+    with span("config_fetch"):
+        rag_config = get_rag_configuration(db_conn)
+    task = rag_config['retriever_instruction']
+    top_ks = [top_k or rag_config['top_k_retrieval'] for top_k in (top_ks or [None] * len(queries))]
+
+    with open_index(index_name) as index:
+        with span("query_embed"):
+            embeddings, lexical_weights = encode_queries([get_detailed_instruct(task, query) for query in queries], batch_size=batch_size)
+
+        with span("faiss_search"):
+            D, I = search(embeddings, lexical_weights, max(top_ks), shard_keys=shard_keys, shards=index.shards)
+
+        with span("doc_lookup"):
+            return [
+                [{"id": int(i), "text": index.documents[i], "score": float(D[row][col])} for col, i in enumerate(I[row][:top_k]) if i != -1]
+                for row, top_k in enumerate(top_ks)
+            ]
+
+def get_docs(ids):
+    id_to_doc = get_id_to_doc()
+    return [id_to_doc[i] for i in ids]
 
 def truncate_string(s, max_length=100):
     return s[:max_length] + '...' if len(s) > max_length else s
@@ -50,6 +231,6 @@ if __name__ == "__main__":
     query = input("Ask an Query to retrieval : ")
     result = retrieve_docs(conn, query)
     for i, item in enumerate(result, 1) : 
-        print(f"[{i}] Score : {item['score']}")
+        print(f"[{i}] Product ID : {item['id']} | Score : {item['score']}")
         print(f"Data : {truncate_string(item['text'], max_length=1000)}")
         print("-" * 60)
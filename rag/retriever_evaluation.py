@@ -1,9 +1,9 @@
 import json
 import numpy as np
-from typing import List, Dict, Set, Tuple, Optional
+from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 import pandas as pd
-from rag.retriever import retrieve_docs, get_docs
+from rag.retriever import retrieve_docs
 from api.db.database import db_connection, get_rag_configuration
 from dotenv import load_dotenv
 
@@ -14,8 +14,8 @@ class QueryEvaluation:
     """Data class to store evaluation results for a single query"""
     query_id: str
     query_text: str
-    retrieved_docs: List[str] #
-    relevant_docs: List[str] #
+    retrieved_ids: List[int]
+    relevant_ids: List[int]
     precision_at_k: float
     recall_at_k: float
     mean_reciprocal_rank: float
@@ -29,91 +29,90 @@ class RAGRetrievalEvaluator:
         # self.k_values = sorted(k_values)
         self.evaluations = []
     
-    def precision_at_k(self, retrieved_docs: List[str], relevant_docs: Set[str], k: int) -> float:
+    def precision_at_k(self, retrieved_ids: np.ndarray, relevant_ids: np.ndarray, k: int) -> float:
         """
         Calculate Precision@K
         
         Args:
-            retrieved_docs: List of retrieved document IDs in ranked order
-            relevant_docs: Set of relevant document IDs for the query
+            retrieved_ids: Array of retrieved product IDs in ranked order
+            relevant_ids: Array of relevant product IDs for the query
             k: Number of top documents to consider
             
         Returns:
             Precision@K score (0.0 to 1.0)
         """
-        if k == 0 or len(retrieved_docs) == 0:
+        if k == 0 or len(retrieved_ids) == 0:
             return 0.0
             
-        top_k = retrieved_docs[:k]
-        relevant_in_top_k = [doc for doc in top_k if doc in relevant_docs]
+        relevant_in_top_k = np.isin(retrieved_ids[:k], relevant_ids).sum()
         
-        return len(relevant_in_top_k) / k
+        return relevant_in_top_k / k
     
-    def recall_at_k(self, retrieved_docs: List[str], relevant_docs: Set[str], k: int) -> float:
+    def recall_at_k(self, retrieved_ids: np.ndarray, relevant_ids: np.ndarray, k: int) -> float:
         """
         Calculate Recall@K
         
         Args:
-            retrieved_docs: List of retrieved document IDs in ranked order
-            relevant_docs: Set of relevant document IDs for the query
+            retrieved_ids: Array of retrieved product IDs in ranked order
+            relevant_ids: Array of relevant product IDs for the query
             k: Number of top documents to consider
             
         Returns:
             Recall@K score (0.0 to 1.0)
         """
             
-        if k == 0 or len(retrieved_docs) == 0:
+        if k == 0 or len(retrieved_ids) == 0 or len(relevant_ids) == 0:
             return 0.0
             
-        top_k = retrieved_docs[:k]
-        relevant_in_top_k = [doc for doc in top_k if doc in relevant_docs]
+        relevant_in_top_k = np.isin(retrieved_ids[:k], relevant_ids).sum()
         
-        return len(relevant_in_top_k)/ len(relevant_docs)
+        return relevant_in_top_k / len(relevant_ids)
     
-    def mean_reciprocal_rank(self, retrieved_docs: List[str], relevant_docs: Set[str]) -> float:
+    def mean_reciprocal_rank(self, retrieved_ids: np.ndarray, relevant_ids: np.ndarray) -> float:
         """
         Calculate Mean Reciprocal Rank (MRR) for a single query
         
         Args:
-            retrieved_docs: List of retrieved document IDs in ranked order
-            relevant_docs: Set of relevant document IDs for the query
+            retrieved_ids: Array of retrieved product IDs in ranked order
+            relevant_ids: Array of relevant product IDs for the query
             
         Returns:
             Reciprocal rank (0.0 to 1.0)
         """
-        for i, doc in enumerate(retrieved_docs):
-            if doc in relevant_docs:
-                return 1.0 / (i + 1)  # +1 because ranking starts from 1
-        return 0.0
+        hits = np.flatnonzero(np.isin(retrieved_ids, relevant_ids))
+        if hits.size == 0:
+            return 0.0
+        return 1.0 / (hits[0] + 1)  # +1 because ranking starts from 1
     
     def evaluate_query(self, query_id: str, query_text: str, 
-                      retrieved_docs: List[str], relevant_docs: List[str], k: int) -> QueryEvaluation:
+                      retrieved_ids: List[int], relevant_ids: List[int], k: int) -> QueryEvaluation:
         """
         Evaluate retrieval performance for a single query
         
         Args:
             query_id: Unique identifier for the query
             query_text: The actual query text
-            retrieved_docs: List of retrieved document IDs in ranked order
-            relevant_docs: List of relevant document IDs for the query
+            retrieved_ids: List of retrieved product IDs in ranked order
+            relevant_ids: List of relevant product IDs for the query
             k: Number of top documents to consider
         Returns:
             QueryEvaluation object with all metrics
         """
-        relevant_set = set(relevant_docs)
+        retrieved = np.asarray(retrieved_ids, dtype=np.int64)
+        relevant = np.unique(np.asarray(relevant_ids, dtype=np.int64))
         
         # Calculate Precision@K and Recall@K for all K values
-        precision = self.precision_at_k(retrieved_docs, relevant_set, k)
-        recall = self.recall_at_k(retrieved_docs, relevant_set, k)
+        precision = self.precision_at_k(retrieved, relevant, k)
+        recall = self.recall_at_k(retrieved, relevant, k)
         
         # Calculate MRR
-        rr = self.mean_reciprocal_rank(retrieved_docs, relevant_set)
+        rr = self.mean_reciprocal_rank(retrieved, relevant)
         
         evaluation = QueryEvaluation(
             query_id=query_id,
             query_text=query_text,
-            retrieved_docs=retrieved_docs,
-            relevant_docs=relevant_docs,
+            retrieved_ids=list(retrieved_ids),
+            relevant_ids=list(relevant_ids),
             precision_at_k=precision,
             recall_at_k=recall,
             mean_reciprocal_rank=rr
@@ -130,8 +129,7 @@ class RAGRetrievalEvaluator:
             evaluation_data: List of dictionaries with keys:
                 - query_id: str
                 - query_text: str  
-                - retrieved_docs: List[str]
-                - relevant_docs: List[str]
+                - relevant_ids: List[int] (product ids)
             k: Number of top documents to consider
         
         Returns:
@@ -145,8 +143,8 @@ class RAGRetrievalEvaluator:
             self.evaluate_query(
                 query_id=data['query_id'],
                 query_text=data['query_text'],
-                retrieved_docs=data['retrieved_docs'],
-                relevant_docs=data['relevant_docs'],
+                retrieved_ids=data['retrieved_ids'],
+                relevant_ids=data['relevant_ids'],
                 k=rag_config['top_k_retrieval']
             )
         
@@ -193,8 +191,8 @@ class RAGRetrievalEvaluator:
             row = {
                 'query_id': eval.query_id,
                 'query_text': eval.query_text,
-                'num_retrieved': len(eval.retrieved_docs),
-                'num_relevant': len(eval.relevant_docs),
+                'num_retrieved': len(eval.retrieved_ids),
+                'num_relevant': len(eval.relevant_ids),
                 'mean_reciprocal_rank': eval.mean_reciprocal_rank,
                 'precision@k': eval.precision_at_k,
                 'recall@k' : eval.recall_at_k
@@ -240,14 +238,12 @@ def enrich_docs(db_conn, unit_tests):
 
     for ut in unit_tests:
         retrieved = retrieve_docs(db_conn, ut['query_text'])
-        retrieved_texts = [item['text'] for item in retrieved]
 
         enriched_unit_test.append({
             'query_id': ut['query_id'],
             'query_text': ut['query_text'],
-            'retrieved_docs': retrieved_texts,
-            'relevant_docs_idx': ut['relevant_docs_idx'],
-            'relevant_docs' : get_docs(ut['relevant_docs_idx'])
+            'retrieved_ids': [item['id'] for item in retrieved],
+            'relevant_ids': ut['relevant_ids']
         })
 
     return enriched_unit_test
@@ -285,27 +281,27 @@ if __name__ == "__main__":
         {
             'query_id': 'Q1',
             'query_text': 'Berikan saya rekomendasi handphone dengan brand xiaomi',
-            'relevant_docs_idx': [8, 14]  
+            'relevant_ids': [12, 18]  
         },
         {
             'query_id': 'Q2', 
             'query_text': 'Berikan saya rekomendasi serum dengan diskon terbesar',
-            'relevant_docs_idx': [31, 28, 32]  
+            'relevant_ids': [35, 32, 36]  
         },
         {
             'query_id': 'Q3',
             'query_text': 'Popok bayi dengan harga paling termurah',
-            'relevant_docs_idx': [61, 53, 52, 54, 58] 
+            'relevant_ids': [65, 57, 56, 58, 62] 
         },
         {
             'query_id': 'Q4',
             'query_text': 'Berapa saja kapasitas penyimpanan yang tersedia untuk Iphone 15?',
-            'relevant_docs_idx': [9] 
+            'relevant_ids': [13] 
         },
         {
             'query_id': 'Q5',
             'query_text': 'Apakah produk infinix smart 8 merupakan barang baru?',
-            'relevant_docs_idx': [12] 
+            'relevant_ids': [16] 
         }
     ]
     # Run Unit Test
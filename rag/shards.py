@@ -0,0 +1,207 @@
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from rag.sparse import SparseIndex, hybrid_search, HYBRID_CANDIDATE_FACTOR
+
+SHARD_BY = (os.getenv("SHARD_BY") or "none").lower()  # none | category | hash
+NUM_SHARDS = int(os.getenv("NUM_SHARDS") or 4)
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS") or os.cpu_count() or 1)
+
+UNSHARDED = "all"
+
+# FAISS releases the GIL during search, so shards are searched truly in parallel
+_executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="faiss-shard")
+
+class ReadWriteLock:
+    """Lets many searches run on a shard at once while live updates get exclusive access."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            # Waiting writers go first so a steady stream of searches cannot starve updates
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+def shard_key(metadata: dict) -> str:
+    """
+    Returns the shard a product document belongs to.
+
+    Args:
+        metadata: Document metadata from `generate_product_documents`.
+
+    Returns:
+        "category-<id>" or "hash-<n>" depending on SHARD_BY, "all" when sharding is off.
+    """
+    if SHARD_BY == "category":
+        return f"category-{metadata.get('category_id') or 0}"
+    if SHARD_BY == "hash":
+        return f"hash-{int(metadata['id']) % NUM_SHARDS}"
+    return UNSHARDED
+
+# Every path helper takes the base index file, INDEX_FILE when omitted. Other catalogs
+# hosted by the index registry pass their own.
+def manifest_path(index_file: str = None) -> str:
+    return f"{index_file or os.getenv('INDEX_FILE')}.shards.json"
+
+def shard_index_path(key: str, index_file: str = None) -> str:
+    index_file = index_file or os.getenv("INDEX_FILE")
+    return index_file if key == UNSHARDED else f"{index_file}.{key}"
+
+def shard_sparse_path(key: str, index_file: str = None) -> str:
+    if key == UNSHARDED:
+        return (os.getenv("SPARSE_INDEX_FILE") if index_file is None else None) or f"{index_file or os.getenv('INDEX_FILE')}.sparse.npz"
+    return f"{shard_index_path(key, index_file)}.sparse.npz"
+
+def read_manifest(index_file: str = None) -> dict:
+    if not os.path.exists(manifest_path(index_file)):
+        return {"shard_by": "none", "shards": {UNSHARDED: {"file": shard_index_path(UNSHARDED, index_file)}}}
+    with open(manifest_path(index_file)) as f:
+        return json.load(f)
+
+def replace_file(path: str, write):
+    # Written next to the target and renamed into place, a crash never leaves a partial file
+    write(f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+def write_manifest(manifest: dict):
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+    replace_file(manifest_path(), write)
+
+def index_version_path(index_file: str = None) -> str:
+    return f"{index_file or os.getenv('INDEX_FILE')}.version"
+
+def read_index_version(index_file: str = None) -> str:
+    """The version stamped by the last build, None for indexes built before versions were stamped."""
+    if not os.path.exists(index_version_path(index_file)):
+        return None
+    with open(index_version_path(index_file)) as f:
+        return f.read().strip() or None
+
+def write_index_version(version: str, index_file: str = None):
+    def write(path):
+        with open(path, "w") as f:
+            f.write(version)
+    replace_file(index_version_path(index_file), write)
+
+def load_shard(key: str, index_file: str = None) -> dict:
+    import faiss
+
+    sparse_path = shard_sparse_path(key, index_file)
+    return {
+        "index": faiss.read_index(shard_index_path(key, index_file)),
+        "sparse": SparseIndex.load(sparse_path) if os.path.exists(sparse_path) else None,
+        "lock": ReadWriteLock(),
+    }
+
+def load_shards(index_file: str = None) -> dict:
+    return {key: load_shard(key, index_file) for key in read_manifest(index_file)["shards"]}
+
+def shard_files(index_file: str = None) -> list[str]:
+    """Files `load_shards` reads, for sizing an index before loading it."""
+    files = []
+    for key in read_manifest(index_file)["shards"]:
+        files.append(shard_index_path(key, index_file))
+        if os.path.exists(shard_sparse_path(key, index_file)):
+            files.append(shard_sparse_path(key, index_file))
+    return files
+
+def shard_ids(shard: dict) -> np.ndarray:
+    import faiss
+    index = shard["index"]
+    # Indexes built before vectors were keyed by product id (a bare IndexFlatIP) are keyed by position
+    if not hasattr(index, "id_map"):
+        return np.arange(index.ntotal, dtype=np.int64)
+    return faiss.vector_to_array(index.id_map)
+
+def _search_one(shard: dict, embeddings: np.ndarray, lexical_weights, top_k: int, allowed_ids: np.ndarray = None):
+    with shard["lock"].read():
+        return _search_locked(shard, embeddings, lexical_weights, top_k, allowed_ids)
+
+def _search_locked(shard: dict, embeddings: np.ndarray, lexical_weights, top_k: int, allowed_ids: np.ndarray = None):
+    import faiss
+
+    index, sparse_index = shard["index"], shard["sparse"]
+    use_sparse = lexical_weights is not None and sparse_index is not None
+    # The selector makes FAISS skip filtered-out vectors during the scan instead of post-filtering
+    params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed_ids)) if allowed_ids is not None else None
+    D, I = index.search(embeddings, top_k * HYBRID_CANDIDATE_FACTOR if use_sparse else top_k, params=params)
+    if not use_sparse:
+        return D, I
+
+    fused = [hybrid_search(index, sparse_index, embeddings[row], D[row], I[row], lexical_weights[row], top_k, allowed_ids)
+             for row in range(len(embeddings))]
+    # Pad to a rectangle so every shard returns (n, top_k)
+    D = np.full((len(embeddings), top_k), -np.inf, dtype=np.float32)
+    I = np.full((len(embeddings), top_k), -1, dtype=np.int64)
+    for row, (ids, scores) in enumerate(fused):
+        I[row, :len(ids)], D[row, :len(scores)] = ids, scores
+    return D, I
+
+def search_shards(shards: dict, embeddings: np.ndarray, lexical_weights, top_k: int, keys: list = None,
+                  allowed_ids: np.ndarray = None):
+    """
+    Searches the selected shards in parallel and merges the per-shard top-k.
+
+    Args:
+        shards: Loaded shards from `load_shards`.
+        embeddings: (n, d) normalized query matrix.
+        lexical_weights: Per-query lexical weights for hybrid scoring, or None.
+        top_k: Number of results per query.
+        keys: Shard keys to search, all shards when None.
+        allowed_ids: int64 product ids the results are restricted to, None for no restriction.
+
+    Returns:
+        A tuple of (n, top_k) scores and product ids, like `index.search`. Missing results are -1.
+    """
+    selected = [shards[key] for key in (keys or shards) if key in shards]
+    if len(selected) == 1:
+        return _search_one(selected[0], embeddings, lexical_weights, top_k, allowed_ids)
+
+    results = list(_executor.map(lambda shard: _search_one(shard, embeddings, lexical_weights, top_k, allowed_ids), selected))
+
+    D = np.full((len(embeddings), top_k), -np.inf, dtype=np.float32)
+    I = np.full((len(embeddings), top_k), -1, dtype=np.int64)
+    for row in range(len(embeddings)):
+        candidates = (
+            (float(scores[row, col]), int(ids[row, col]))
+            for scores, ids in results
+            for col in range(ids.shape[1])
+            if ids[row, col] != -1
+        )
+        for col, (score, product_id) in enumerate(heapq.nlargest(top_k, candidates)):
+            D[row, col], I[row, col] = score, product_id
+    return D, I
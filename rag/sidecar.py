@@ -0,0 +1,227 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import rag.sidecar_protocol as proto
+from rag.retriever import retrieve_docs, retrieve_docs_batch, warm_retrieval, reload_index, get_id_to_doc
+from rag.similar import similar_documents, reload_neighbours
+from rag.index_registry import UnknownIndex
+from rag.index_updater import ProductChangeConsumer
+from rag.telemetry import get_logger, SIDECAR_REQUESTS
+
+logger = get_logger(__name__)
+
+RETRIEVAL_SIDECAR_SOCKET = os.getenv("RETRIEVAL_SIDECAR_SOCKET") or "/tmp/rag-retrieval.sock"
+RETRIEVAL_SIDECAR_HTTP_HOST = os.getenv("RETRIEVAL_SIDECAR_HTTP_HOST") or "127.0.0.1"
+RETRIEVAL_SIDECAR_HTTP_PORT = int(os.getenv("RETRIEVAL_SIDECAR_HTTP_PORT") or 8100)
+RETRIEVAL_SIDECAR_WORKERS = int(os.getenv("RETRIEVAL_SIDECAR_WORKERS") or 4)
+RETRIEVAL_SIDECAR_MAX_PENDING = int(os.getenv("RETRIEVAL_SIDECAR_MAX_PENDING") or 64)
+
+class RetrievalSidecar:
+    """
+    Long-running retrieval service, the encoder, FAISS shards and documents live only here.
+
+    Requests from both transports go through `run`: beyond `max_pending` queued requests new
+    ones are rejected as overloaded, and a request whose deadline passed while it was queued
+    is dropped without touching the models. Retrieval itself runs on a thread pool, the
+    encoder and FAISS release the GIL for the heavy parts.
+
+    The index lives here, so live updates do too: with CHANGE_FEED_ENABLED the sidecar runs
+    the change feed consumer, and a RELOAD picks up a rebuild written by an API worker.
+    """
+    def __init__(self, db_conn, workers: int = RETRIEVAL_SIDECAR_WORKERS, max_pending: int = RETRIEVAL_SIDECAR_MAX_PENDING,
+                 consumer: ProductChangeConsumer = None):
+        self.db_conn = db_conn
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.consumer = consumer
+
+    def reload(self):
+        # The consumer reloads itself so its unpersisted changes are dropped together with the old index
+        if self.consumer is not None and self.consumer.running():
+            self.consumer.sync_with_disk()
+        else:
+            reload_index()
+        # A rebuild recomputes the similar products too
+        reload_neighbours()
+        warm_retrieval()
+        logger.info("🔄 Retrieval sidecar reloaded the index")
+
+    async def run_reload(self, transport: str):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.reload)
+        except Exception as e:
+            logger.exception("Sidecar reload error: %s", e)
+            SIDECAR_REQUESTS.labels(transport=transport, status=str(proto.INTERNAL)).inc()
+            raise proto.SidecarError(proto.INTERNAL, "Reload failed")
+        SIDECAR_REQUESTS.labels(transport=transport, status="ok").inc()
+
+    def execute(self, params: dict, deadline: float) -> list[list[dict]]:
+        if time.monotonic() > deadline:
+            raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, "Deadline exceeded before retrieval started")
+        queries = params.get("queries") or []
+        top_ks = params.get("top_ks")
+        if not queries:
+            raise proto.SidecarError(proto.BAD_REQUEST, "No queries")
+
+        # Searches the way the API would in process: a search without top_ks is `retrieve_docs`
+        # (configured top_k, facets), a batch is `retrieve_docs_batch` whatever its size
+        if top_ks is None:
+            if len(queries) != 1:
+                raise proto.SidecarError(proto.BAD_REQUEST, "A search without top_ks takes one query")
+            return [retrieve_docs(self.db_conn, queries[0], shard_keys=params.get("shard_keys"), constraints=params.get("constraints"),
+                                  index_name=params.get("index"))]
+        if params.get("constraints"):
+            raise proto.SidecarError(proto.BAD_REQUEST, "Constraints only apply to a search without top_ks")
+        return retrieve_docs_batch(self.db_conn, queries, top_ks=top_ks, shard_keys=params.get("shard_keys"), index_name=params.get("index"))
+
+    def execute_similar(self, params: dict, deadline: float) -> list[list[dict]]:
+        if time.monotonic() > deadline:
+            raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, "Deadline exceeded before the lookup started")
+        try:
+            similar = similar_documents(int(params["product_id"]), int(params.get("k") or 10), get_id_to_doc())
+        except FileNotFoundError:
+            raise proto.SidecarError(proto.NOT_FOUND, "Similar products are not computed yet, run the product embedding first")
+        if similar is None:
+            raise proto.SidecarError(proto.NOT_FOUND, "Product not found")
+        return [similar]
+
+    async def run(self, params: dict, deadline_ms: int, transport: str, execute=None) -> list[list[dict]]:
+        if self.pending >= self.max_pending:
+            SIDECAR_REQUESTS.labels(transport=transport, status="overloaded").inc()
+            raise proto.SidecarOverloaded(proto.OVERLOADED, "Retrieval sidecar is overloaded")
+
+        deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else float("inf")
+        self.pending += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, execute or self.execute, params, deadline)
+        except proto.SidecarError as e:
+            SIDECAR_REQUESTS.labels(transport=transport, status=str(e.code)).inc()
+            raise
+        except UnknownIndex as e:
+            SIDECAR_REQUESTS.labels(transport=transport, status=str(proto.NOT_FOUND)).inc()
+            raise proto.SidecarError(proto.NOT_FOUND, f"Unknown index {e}")
+        except Exception as e:
+            logger.exception("Sidecar retrieval error: %s", e)
+            SIDECAR_REQUESTS.labels(transport=transport, status=str(proto.INTERNAL)).inc()
+            raise proto.SidecarError(proto.INTERNAL, "Retrieval failed")
+        finally:
+            self.pending -= 1
+        SIDECAR_REQUESTS.labels(transport=transport, status="ok").inc()
+        return results
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    msg_type, length = proto.parse_header(await reader.readexactly(proto.HEADER.size))
+                    payload = await reader.readexactly(length)
+                except asyncio.IncompleteReadError:
+                    break
+
+                if msg_type == proto.PING:
+                    writer.write(proto.frame(proto.PONG))
+                elif msg_type == proto.RELOAD:
+                    try:
+                        await self.run_reload("unix")
+                        writer.write(proto.frame(proto.RELOADED))
+                    except proto.SidecarError as e:
+                        writer.write(proto.frame(proto.ERROR, proto.encode_error(e.code, str(e))))
+                elif msg_type in (proto.RETRIEVE, proto.SIMILAR):
+                    try:
+                        deadline_ms, params = proto.decode_request(payload)
+                        execute = self.execute_similar if msg_type == proto.SIMILAR else self.execute
+                        results = await self.run(params, deadline_ms, "unix", execute)
+                        writer.write(proto.frame(proto.RESULTS, proto.encode_results(results, params.get("with_text", True))))
+                    except proto.SidecarError as e:
+                        writer.write(proto.frame(proto.ERROR, proto.encode_error(e.code, str(e))))
+                else:
+                    writer.write(proto.frame(proto.ERROR, proto.encode_error(proto.BAD_REQUEST, f"Unknown message type {msg_type:#x}")))
+                await writer.drain()
+        except proto.SidecarError as e:
+            logger.warning("Dropping sidecar connection: %s", e)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def http_app(self):
+        from fastapi import FastAPI, Response
+        from fastapi.responses import JSONResponse
+        from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+        app = FastAPI(title="Retrieval sidecar")
+
+        @app.post("/retrieve")
+        async def retrieve(params: dict):
+            try:
+                results = await self.run(params, int(params.get("deadline_ms") or 0), "http")
+            except proto.SidecarError as e:
+                return JSONResponse(status_code=e.code, content={"error": str(e)})
+            if not params.get("with_text", True):
+                results = [[{"id": doc["id"], "score": doc["score"]} for doc in docs] for docs in results]
+            return {"results": results}
+
+        @app.post("/similar")
+        async def similar(params: dict):
+            try:
+                results = await self.run(params, int(params.get("deadline_ms") or 0), "http", self.execute_similar)
+            except proto.SidecarError as e:
+                return JSONResponse(status_code=e.code, content={"error": str(e)})
+            if not params.get("with_text", True):
+                results = [[{"id": doc["id"], "score": doc["score"]} for doc in docs] for docs in results]
+            return {"results": results}
+
+        @app.post("/reload")
+        async def reload():
+            try:
+                await self.run_reload("http")
+            except proto.SidecarError as e:
+                return JSONResponse(status_code=e.code, content={"error": str(e)})
+            return {"status": "reloaded"}
+
+        @app.get("/health")
+        def health():
+            return {"status": "ok", "pending": self.pending}
+
+        @app.get("/metrics")
+        def metrics():
+            return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+        return app
+
+async def serve(db_conn, socket_path: str = RETRIEVAL_SIDECAR_SOCKET, http_host: str = RETRIEVAL_SIDECAR_HTTP_HOST,
+                http_port: int = RETRIEVAL_SIDECAR_HTTP_PORT):
+    """
+    Serves retrieval on a Unix domain socket and, unless `http_port` is 0, over HTTP.
+
+    Models are loaded before the socket is created, so a client that can connect gets answers.
+    """
+    consumer = ProductChangeConsumer() if os.getenv("CHANGE_FEED_ENABLED", "false").lower() == "true" else None
+    sidecar = RetrievalSidecar(db_conn, consumer=consumer)
+    await asyncio.get_running_loop().run_in_executor(None, warm_retrieval)
+    if consumer is not None:
+        consumer.start()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    unix_server = await asyncio.start_unix_server(sidecar.handle_connection, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    logger.info("✅ Retrieval sidecar listening on %s", socket_path)
+
+    try:
+        async with unix_server:
+            if http_port:
+                import uvicorn
+                logger.info("✅ Retrieval sidecar HTTP fallback on %s:%d", http_host, http_port)
+                await uvicorn.Server(uvicorn.Config(sidecar.http_app(), host=http_host, port=http_port, log_level="warning")).serve()
+            else:
+                await unix_server.serve_forever()
+    finally:
+        if consumer is not None:
+            consumer.stop()
+
+if __name__ == "__main__":
+    from api.db.database import db_connection
+    asyncio.run(serve(db_connection()))
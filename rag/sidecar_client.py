@@ -0,0 +1,250 @@
+import asyncio
+import os
+import queue
+import socket
+import time
+import rag.sidecar_protocol as proto
+from rag.components import lazy_component
+from rag.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+RETRIEVAL_SIDECAR_SOCKET = os.getenv("RETRIEVAL_SIDECAR_SOCKET")
+RETRIEVAL_SIDECAR_URL = os.getenv("RETRIEVAL_SIDECAR_URL")
+RETRIEVAL_SIDECAR_POOL_SIZE = int(os.getenv("RETRIEVAL_SIDECAR_POOL_SIZE") or 8)
+RETRIEVAL_SIDECAR_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_SIDECAR_TIMEOUT_SECONDS") or 2.0)
+RETRIEVAL_SIDECAR_RELOAD_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_SIDECAR_RELOAD_TIMEOUT_SECONDS") or 300)
+
+# The socket is unreachable, not slow: worth trying the HTTP fallback
+UNREACHABLE = (FileNotFoundError, ConnectionRefusedError)
+
+def sidecar_enabled() -> bool:
+    return bool(RETRIEVAL_SIDECAR_SOCKET or RETRIEVAL_SIDECAR_URL)
+
+def request_params(queries: list[str], top_ks: list = None, shard_keys: list = None, constraints: list = None,
+                   with_text: bool = True, index_name: str = None) -> dict:
+    return {"queries": queries, "top_ks": top_ks, "shard_keys": shard_keys, "constraints": constraints,
+            "with_text": with_text, "index": index_name}
+
+def http_results(response) -> list[list[dict]]:
+    if response.status_code != 200:
+        raise proto.error_for(response.status_code, response.json().get("error", response.text))
+    return response.json()["results"]
+
+class AsyncSidecarClient:
+    """
+    Pooled asyncio client of the retrieval sidecar.
+
+    Up to `pool_size` Unix socket connections are kept open and reused, one request per
+    connection at a time. Every call has a deadline covering the wait for a connection and
+    the round trip, the remaining budget is sent along so the sidecar drops work nobody
+    waits for. A connection interrupted mid-request is closed, never returned to the pool.
+    """
+    def __init__(self, socket_path: str = RETRIEVAL_SIDECAR_SOCKET, http_url: str = RETRIEVAL_SIDECAR_URL,
+                 pool_size: int = RETRIEVAL_SIDECAR_POOL_SIZE, timeout: float = RETRIEVAL_SIDECAR_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.http_url = http_url
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle = []
+        self._pool_size = pool_size
+        self._http = None
+
+    async def retrieve(self, queries: list[str], top_ks: list = None, shard_keys: list = None, constraints: list = None,
+                       with_text: bool = True, timeout: float = None, index_name: str = None) -> list[list[dict]]:
+        """
+        Returns:
+            One list of {"id", "score", "text"} per query ("text" only with `with_text`).
+
+        Raises:
+            SidecarTimeout: The deadline passed.
+            SidecarOverloaded: The sidecar shed the request.
+            SidecarError: Any other sidecar failure.
+        """
+        timeout = timeout or self.timeout
+        params = request_params(queries, top_ks, shard_keys, constraints, with_text, index_name)
+        deadline = asyncio.get_running_loop().time() + timeout
+        try:
+            return await asyncio.wait_for(self._retrieve(params, deadline), timeout)
+        except asyncio.TimeoutError:
+            raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, f"Retrieval sidecar did not answer within {timeout}s")
+
+    async def _retrieve(self, params: dict, deadline: float) -> list[list[dict]]:
+        if self.socket_path:
+            try:
+                return await self._call_socket(params, deadline)
+            except UNREACHABLE as e:
+                if not self.http_url:
+                    raise proto.SidecarError(proto.INTERNAL, f"Retrieval sidecar unreachable: {e}")
+                logger.warning("Retrieval sidecar socket unreachable, using HTTP: %s", e)
+        return await self._call_http(params, deadline)
+
+    async def _call_socket(self, params: dict, deadline: float) -> list[list[dict]]:
+        async with self._slots:
+            # A pooled connection may have been closed by a sidecar restart, retry once on a fresh one
+            for attempt in range(2):
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await asyncio.open_unix_connection(self.socket_path)
+                healthy = False
+                try:
+                    remaining_ms = int((deadline - asyncio.get_running_loop().time()) * 1000)
+                    writer.write(proto.frame(proto.RETRIEVE, proto.encode_request(params, max(1, remaining_ms))))
+                    await writer.drain()
+                    msg_type, length = proto.parse_header(await reader.readexactly(proto.HEADER.size))
+                    payload = await reader.readexactly(length)
+                    healthy = True
+                except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+                    if reused and attempt == 0:
+                        continue
+                    raise proto.SidecarError(proto.INTERNAL, "Retrieval sidecar closed the connection")
+                finally:
+                    if healthy:
+                        self._idle.append((reader, writer))
+                    else:
+                        writer.close()
+                return proto.parse_response(msg_type, payload)
+
+    async def _call_http(self, params: dict, deadline: float) -> list[list[dict]]:
+        import httpx
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.http_url, limits=httpx.Limits(max_connections=self._pool_size))
+        remaining = deadline - asyncio.get_running_loop().time()
+        try:
+            response = await self._http.post("/retrieve", json={**params, "deadline_ms": max(1, int(remaining * 1000))}, timeout=remaining)
+        except httpx.TimeoutException:
+            raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, "Retrieval sidecar did not answer in time")
+        except httpx.TransportError as e:
+            raise proto.SidecarError(proto.INTERNAL, f"Retrieval sidecar unreachable: {e}")
+        return http_results(response)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+        if self._http is not None:
+            await self._http.aclose()
+
+class SidecarClient:
+    """Blocking counterpart of `AsyncSidecarClient` for synchronous code such as `generate_response`."""
+    def __init__(self, socket_path: str = RETRIEVAL_SIDECAR_SOCKET, http_url: str = RETRIEVAL_SIDECAR_URL,
+                 pool_size: int = RETRIEVAL_SIDECAR_POOL_SIZE, timeout: float = RETRIEVAL_SIDECAR_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.http_url = http_url
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._pool_size = pool_size
+        self._http = None
+
+    def retrieve(self, queries: list[str], top_ks: list = None, shard_keys: list = None, constraints: list = None,
+                 with_text: bool = True, timeout: float = None, index_name: str = None) -> list[list[dict]]:
+        timeout = timeout or self.timeout
+        params = request_params(queries, top_ks, shard_keys, constraints, with_text, index_name)
+        return self._call(proto.RETRIEVE, "/retrieve", params, time.monotonic() + timeout)
+
+    def similar(self, product_id: int, k: int, with_text: bool = True, timeout: float = None) -> list[dict]:
+        """Returns the k most similar products of `product_id` that still have a document, see `similar_documents`."""
+        timeout = timeout or self.timeout
+        params = {"product_id": product_id, "k": k, "with_text": with_text}
+        return self._call(proto.SIMILAR, "/similar", params, time.monotonic() + timeout)[0]
+
+    def _call(self, msg_type: int, path: str, params: dict, deadline: float) -> list[list[dict]]:
+        if self.socket_path:
+            try:
+                return proto.parse_response(*self._exchange(
+                    deadline, lambda remaining_ms: proto.frame(msg_type, proto.encode_request(params, remaining_ms))))
+            except UNREACHABLE as e:
+                if not self.http_url:
+                    raise proto.SidecarError(proto.INTERNAL, f"Retrieval sidecar unreachable: {e}")
+                logger.warning("Retrieval sidecar socket unreachable, using HTTP: %s", e)
+        return http_results(self._post_http(path, params, deadline))
+
+    def reload(self, timeout: float = RETRIEVAL_SIDECAR_RELOAD_TIMEOUT_SECONDS):
+        """Makes the sidecar reload the default index from disk, e.g. after a rebuild, and waits until it has."""
+        deadline = time.monotonic() + timeout
+        if self.socket_path:
+            try:
+                return proto.check_reloaded(*self._exchange(deadline, lambda remaining_ms: proto.frame(proto.RELOAD)))
+            except UNREACHABLE as e:
+                if not self.http_url:
+                    raise proto.SidecarError(proto.INTERNAL, f"Retrieval sidecar unreachable: {e}")
+                logger.warning("Retrieval sidecar socket unreachable, using HTTP: %s", e)
+        self._post_http("/reload", {}, deadline)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+        chunks, remaining = [], size
+        while remaining:
+            chunk = sock.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise ConnectionResetError("Connection closed mid-frame")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _exchange(self, deadline: float, make_frame) -> tuple:
+        """Sends the frame built by `make_frame(remaining_ms)` and returns the (type, payload) of the answer."""
+        for attempt in range(2):
+            try:
+                sock, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                sock, reused = self._connect(), False
+
+            healthy = False
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                sock.settimeout(remaining)
+                sock.sendall(make_frame(int(remaining * 1000)))
+                msg_type, length = proto.parse_header(self._recv_exactly(sock, proto.HEADER.size))
+                payload = self._recv_exactly(sock, length)
+                healthy = True
+            except socket.timeout:
+                raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, "Retrieval sidecar did not answer in time")
+            except (ConnectionResetError, BrokenPipeError):
+                if reused and attempt == 0:
+                    continue
+                raise proto.SidecarError(proto.INTERNAL, "Retrieval sidecar closed the connection")
+            finally:
+                if healthy:
+                    try:
+                        self._idle.put_nowait(sock)
+                    except queue.Full:
+                        sock.close()
+                else:
+                    sock.close()
+            return msg_type, payload
+
+    def _post_http(self, path: str, body: dict, deadline: float):
+        import httpx
+
+        if self._http is None:
+            self._http = httpx.Client(base_url=self.http_url, limits=httpx.Limits(max_connections=self._pool_size))
+        remaining = deadline - time.monotonic()
+        try:
+            response = self._http.post(path, json={**body, "deadline_ms": max(1, int(remaining * 1000))}, timeout=remaining)
+        except httpx.TimeoutException:
+            raise proto.SidecarTimeout(proto.DEADLINE_EXCEEDED, "Retrieval sidecar did not answer in time")
+        except httpx.TransportError as e:
+            raise proto.SidecarError(proto.INTERNAL, f"Retrieval sidecar unreachable: {e}")
+        if response.status_code != 200:
+            raise proto.error_for(response.status_code, response.json().get("error", response.text))
+        return response
+
+@lazy_component("sidecar_client")
+def get_sidecar_client():
+    return SidecarClient()
+
+@lazy_component("sidecar_async_client")
+def get_async_sidecar_client():
+    # Created on first use inside the worker's event loop
+    return AsyncSidecarClient()
@@ -0,0 +1,123 @@
+"""
+Binary protocol between API workers and the retrieval sidecar over a Unix domain socket.
+
+Every message is a frame: a 6 byte header (version u8, type u8, payload length u32, network
+byte order) followed by the payload. A connection carries one request at a time.
+
+    RETRIEVE  deadline_ms u32 + JSON params {"queries", "top_ks", "shard_keys", "constraints", "with_text", "index"},
+              without top_ks one query searched like /api/retrieve-documents (constraints allowed),
+              with top_ks a batch searched like /api/retrieve-documents/batch
+    SIMILAR   deadline_ms u32 + JSON params {"product_id", "k", "with_text"}, answered by RESULTS with one list
+    RESULTS   n_queries u16, with_text u8, then per query: k u16, k ids (<i8), k scores (<f4),
+              and with_text k times (length u32 + UTF-8 text)
+    PING/PONG empty payload
+    RELOAD    empty payload, the sidecar reloads the default index from disk and answers RELOADED
+    ERROR     code u16 + UTF-8 message
+
+Results are the bulk of the traffic, so ids and scores travel as raw little-endian arrays
+instead of JSON numbers.
+"""
+import struct
+import numpy as np
+import orjson
+
+VERSION = 1
+HEADER = struct.Struct("!BBI")
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+RETRIEVE, PING, RELOAD, SIMILAR = 0x01, 0x02, 0x03, 0x04
+RESULTS, PONG, RELOADED, ERROR = 0x81, 0x82, 0x83, 0xFF
+
+# Error codes, mirrored by HTTP status codes on the fallback transport
+BAD_REQUEST, NOT_FOUND, OVERLOADED, DEADLINE_EXCEEDED, INTERNAL = 400, 404, 503, 504, 500
+
+class SidecarError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+class SidecarOverloaded(SidecarError):
+    pass
+
+class SidecarTimeout(SidecarError, TimeoutError):
+    pass
+
+def error_for(code: int, message: str) -> SidecarError:
+    if code == OVERLOADED:
+        return SidecarOverloaded(code, message)
+    if code == DEADLINE_EXCEEDED:
+        return SidecarTimeout(code, message)
+    return SidecarError(code, message)
+
+def frame(msg_type: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(VERSION, msg_type, len(payload)) + payload
+
+def parse_header(header: bytes) -> tuple:
+    version, msg_type, length = HEADER.unpack(header)
+    if version != VERSION:
+        raise SidecarError(BAD_REQUEST, f"Unsupported protocol version {version}")
+    if length > MAX_PAYLOAD:
+        raise SidecarError(BAD_REQUEST, f"Frame of {length} bytes exceeds the limit")
+    return msg_type, length
+
+def encode_request(params: dict, deadline_ms: int) -> bytes:
+    return struct.pack("!I", max(0, deadline_ms)) + orjson.dumps(params)
+
+def decode_request(payload: bytes) -> tuple:
+    (deadline_ms,) = struct.unpack_from("!I", payload)
+    return deadline_ms, orjson.loads(payload[4:])
+
+def encode_error(code: int, message: str) -> bytes:
+    return struct.pack("!H", code) + message.encode()
+
+def decode_error(payload: bytes) -> SidecarError:
+    (code,) = struct.unpack_from("!H", payload)
+    return error_for(code, bytes(payload[2:]).decode(errors="replace"))
+
+def encode_results(results: list[list[dict]], with_text: bool) -> bytes:
+    parts = [struct.pack("!HB", len(results), with_text)]
+    for docs in results:
+        parts.append(struct.pack("!H", len(docs)))
+        parts.append(np.array([doc["id"] for doc in docs], dtype="<i8").tobytes())
+        parts.append(np.array([doc["score"] for doc in docs], dtype="<f4").tobytes())
+        if with_text:
+            for doc in docs:
+                text = doc["text"].encode()
+                parts.append(struct.pack("!I", len(text)))
+                parts.append(text)
+    return b"".join(parts)
+
+def decode_results(payload: bytes) -> list[list[dict]]:
+    view = memoryview(payload)
+    n_queries, with_text = struct.unpack_from("!HB", view)
+    offset = 3
+    results = []
+    for _ in range(n_queries):
+        (k,) = struct.unpack_from("!H", view, offset)
+        offset += 2
+        ids = np.frombuffer(view, dtype="<i8", count=k, offset=offset)
+        offset += 8 * k
+        scores = np.frombuffer(view, dtype="<f4", count=k, offset=offset)
+        offset += 4 * k
+        docs = [{"id": int(i), "score": float(score)} for i, score in zip(ids, scores)]
+        if with_text:
+            for doc in docs:
+                (length,) = struct.unpack_from("!I", view, offset)
+                offset += 4
+                doc["text"] = bytes(view[offset:offset + length]).decode()
+                offset += length
+        results.append(docs)
+    return results
+
+def check_reloaded(msg_type: int, payload: bytes):
+    if msg_type == ERROR:
+        raise decode_error(payload)
+    if msg_type != RELOADED:
+        raise SidecarError(INTERNAL, f"Unexpected message type {msg_type:#x}")
+
+def parse_response(msg_type: int, payload: bytes) -> list[list[dict]]:
+    if msg_type == RESULTS:
+        return decode_results(payload)
+    if msg_type == ERROR:
+        raise decode_error(payload)
+    raise SidecarError(INTERNAL, f"Unexpected message type {msg_type:#x}")
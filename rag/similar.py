@@ -0,0 +1,112 @@
+import os
+import numpy as np
+from rag.components import lazy_component, reset_component
+from rag.shards import search_shards
+from rag.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+SIMILAR_TOP_N = int(os.getenv("SIMILAR_TOP_N") or 20)
+
+def neighbours_path() -> str:
+    return os.getenv("NEIGHBOURS_FILE") or f"{os.getenv('INDEX_FILE')}.neighbours.npz"
+
+class NeighbourTable:
+    """
+    Precomputed top-N similar products of every product.
+
+    Row r holds the neighbours of `ids[r]` as int32 product ids and float16 cosine scores,
+    best first and padded with -1. `ids` is sorted so a lookup is a single binary search.
+    """
+    def __init__(self, ids: np.ndarray, neighbours: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @classmethod
+    def load(cls, path: str) -> "NeighbourTable":
+        with np.load(path) as f:
+            return cls(f["ids"], f["neighbours"], f["scores"])
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, ids=self.ids, neighbours=self.neighbours, scores=self.scores)
+
+    def lookup(self, product_id: int, k: int = None):
+        """
+        Returns the k most similar products of `product_id`.
+
+        Returns:
+            A list of (product id, score) pairs, or None when the product is not indexed.
+        """
+        row = int(np.searchsorted(self.ids, product_id))
+        if row == len(self.ids) or self.ids[row] != product_id:
+            return None
+        neighbours, scores = self.neighbours[row, :k], self.scores[row, :k]
+        return [(int(i), float(s)) for i, s in zip(neighbours, scores) if i != -1]
+
+def build_neighbours(shards: dict, top_n: int = SIMILAR_TOP_N, batch_size: int = 1024) -> NeighbourTable:
+    """
+    Finds the top-N neighbours of every indexed product with a batched self-search.
+
+    Neighbours are searched over all shards, so a product can be similar to one in another
+    category. Only dense vectors are used, lexical weights say little about item similarity.
+
+    Args:
+        shards: Loaded shards from `load_shards`, every index must be an IndexIDMap2.
+        top_n: Neighbours kept per product.
+        batch_size: Products searched per call.
+
+    Returns:
+        The neighbour table of every product in the shards.
+    """
+    import faiss
+
+    ids, vectors = [], []
+    for shard in shards.values():
+        index = shard["index"]
+        ids.append(faiss.vector_to_array(index.id_map))
+        vectors.append(index.index.reconstruct_n(0, index.ntotal))
+    ids, vectors = np.concatenate(ids), np.concatenate(vectors)
+
+    order = np.argsort(ids)
+    ids, vectors = ids[order], vectors[order]
+    neighbours = np.full((len(ids), top_n), -1, dtype=np.int32)
+    scores = np.zeros((len(ids), top_n), dtype=np.float16)
+
+    for start in range(0, len(ids), batch_size):
+        # One extra result because every product finds itself first
+        D, I = search_shards(shards, vectors[start:start + batch_size], None, top_n + 1)
+        for offset, (row_scores, row_ids) in enumerate(zip(D, I)):
+            keep = (row_ids != ids[start + offset]) & (row_ids != -1)
+            row_ids, row_scores = row_ids[keep][:top_n], row_scores[keep][:top_n]
+            neighbours[start + offset, :len(row_ids)] = row_ids
+            scores[start + offset, :len(row_scores)] = row_scores
+
+    logger.info("✅ Computed %d neighbours for %d products", top_n, len(ids))
+    return NeighbourTable(ids, neighbours, scores)
+
+@lazy_component("neighbours")
+def get_neighbours():
+    return NeighbourTable.load(neighbours_path())
+
+def similar_documents(product_id: int, k: int, documents: dict):
+    """
+    Returns up to k most similar products of `product_id` as {"id", "score", "text"}.
+
+    The table only changes with a rebuild, neighbours deleted by live updates since have no
+    document anymore and are skipped.
+
+    Returns:
+        The similar documents, or None when the product is not indexed.
+
+    Raises:
+        FileNotFoundError: No rebuild has computed the neighbours yet.
+    """
+    similar = get_neighbours().lookup(product_id)
+    if similar is None:
+        return None
+    return [{"id": i, "score": score, "text": documents[i]} for i, score in similar if i in documents][:max(1, k)]
+
+def reload_neighbours():
+    reset_component("neighbours")
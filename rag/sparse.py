@@ -0,0 +1,172 @@
+import os
+import numpy as np
+from rag.components import lazy_component, EMBEDDING_MODEL_ID
+
+EMBEDDING_MODE = (os.getenv("EMBEDDING_MODE") or "dense").lower()
+SPARSE_WEIGHT = float(os.getenv("SPARSE_WEIGHT") or 0.3)
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR") or 4)
+
+def hybrid_enabled() -> bool:
+    return EMBEDDING_MODE == "hybrid"
+
+@lazy_component("bge_m3_model")
+def get_bge_m3_model():
+    # SentenceTransformer only exposes the dense head, FlagEmbedding returns dense and sparse together
+    from FlagEmbedding import BGEM3FlagModel
+    return BGEM3FlagModel(EMBEDDING_MODEL_ID, use_fp16=os.getenv("EMBEDDING_FP16", "false").lower() == "true")
+
+def encode_hybrid(texts: list[str], batch_size: int = 16) -> tuple[np.ndarray, list[dict]]:
+    """
+    Encodes texts into dense vectors and lexical weights in a single forward pass.
+
+    Args:
+        texts: Texts to encode.
+        batch_size: Encoder batch size.
+
+    Returns:
+        A tuple of the normalized (n, d) float32 dense matrix and one {token_id: weight} dict per text.
+    """
+    output = get_bge_m3_model().encode(
+        texts,
+        batch_size=batch_size,
+        return_dense=True,
+        return_sparse=True,
+        return_colbert_vecs=False,
+    )
+    dense = np.ascontiguousarray(output["dense_vecs"], dtype=np.float32)
+    lexical_weights = [{int(token): float(weight) for token, weight in weights.items()} for weights in output["lexical_weights"]]
+    return dense, lexical_weights
+
+class SparseIndex:
+    """
+    Inverted index of bge-m3 lexical weights stored in CSR layout.
+
+    Row t of the matrix is the posting list of token t: `indices[indptr[t]:indptr[t + 1]]`
+    are document positions and `data` the matching weights. `doc_ids` maps positions to
+    product ids.
+    """
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, doc_ids: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.doc_ids = doc_ids
+        self.position_of = {int(doc_id): position for position, doc_id in enumerate(doc_ids.tolist())}
+
+    @classmethod
+    def from_lexical_weights(cls, lexical_weights: list[dict], doc_ids, offset: int = 0) -> "SparseIndex":
+        terms, docs, weights = cls._to_coo(lexical_weights, offset)
+        return cls._from_coo(terms, docs, weights, np.asarray(doc_ids, dtype=np.int64))
+
+    @staticmethod
+    def _to_coo(lexical_weights: list[dict], offset: int = 0):
+        terms, docs, weights = [], [], []
+        for position, doc_weights in enumerate(lexical_weights, start=offset):
+            terms.extend(doc_weights.keys())
+            docs.extend([position] * len(doc_weights))
+            weights.extend(doc_weights.values())
+        return np.asarray(terms, dtype=np.int64), np.asarray(docs, dtype=np.int32), np.asarray(weights, dtype=np.float32)
+
+    @classmethod
+    def _from_coo(cls, terms: np.ndarray, docs: np.ndarray, weights: np.ndarray, doc_ids: np.ndarray) -> "SparseIndex":
+        order = np.lexsort((docs, terms))
+        vocab_size = int(terms.max()) + 1 if terms.size else 0
+        indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=vocab_size), out=indptr[1:])
+        return cls(indptr, docs[order], weights[order].astype(np.float16), doc_ids)
+
+    def update(self, remove_ids, lexical_weights: list[dict], doc_ids) -> "SparseIndex":
+        """
+        Returns a new index without `remove_ids` and with the given documents upserted.
+
+        The CSR arrays are immutable, so updates rebuild them in O(postings). That is cheap
+        next to re-encoding and keeps searches on the old index lock-free meanwhile.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        keep_docs = ~np.isin(self.doc_ids, np.concatenate([np.asarray(list(remove_ids), dtype=np.int64), doc_ids]))
+        new_position = np.cumsum(keep_docs) - 1
+
+        old_terms = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        keep = keep_docs[self.indices]
+        new_terms, new_docs, new_weights = self._to_coo(lexical_weights, offset=int(keep_docs.sum()))
+
+        return self._from_coo(
+            np.concatenate([old_terms[keep], new_terms]),
+            np.concatenate([new_position[self.indices[keep]].astype(np.int32), new_docs]),
+            np.concatenate([self.data[keep].astype(np.float32), new_weights]),
+            np.concatenate([self.doc_ids[keep_docs], doc_ids]),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SparseIndex":
+        with np.load(path) as f:
+            return cls(f["indptr"], f["indices"], f["data"], f["doc_ids"])
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, indptr=self.indptr, indices=self.indices, data=self.data, doc_ids=self.doc_ids)
+
+    def score(self, query_weights: dict) -> np.ndarray:
+        """
+        Scores every document against the query lexical weights.
+
+        Args:
+            query_weights: {token_id: weight} of the query.
+
+        Returns:
+            (n_docs,) float32 array with the sum of matching query weight * document weight.
+        """
+        vocab_size = len(self.indptr) - 1
+        postings, contributions = [], []
+        for token, weight in query_weights.items():
+            if token >= vocab_size:
+                continue
+            start, end = self.indptr[token], self.indptr[token + 1]
+            postings.append(self.indices[start:end])
+            contributions.append(self.data[start:end].astype(np.float32) * weight)
+
+        if not postings:
+            return np.zeros(len(self.doc_ids), dtype=np.float32)
+        return np.bincount(np.concatenate(postings), weights=np.concatenate(contributions), minlength=len(self.doc_ids)).astype(np.float32)
+
+def hybrid_search(index, sparse_index: SparseIndex, query_vector: np.ndarray, dense_scores: np.ndarray,
+                  dense_ids: np.ndarray, query_weights: dict, top_k: int, allowed_ids: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses dense and lexical scores over the union of the dense and sparse candidates.
+
+    Dense scores of candidates found only by the sparse index are computed from the stored
+    vectors, so no extra model call is needed.
+
+    Args:
+        index: The FAISS IndexIDMap2 holding the dense vectors.
+        sparse_index: The lexical weights index.
+        query_vector: (d,) normalized dense query vector.
+        dense_scores: Dense scores of the FAISS candidates.
+        dense_ids: Product ids of the FAISS candidates (may contain -1 padding).
+        query_weights: {token_id: weight} of the query.
+        top_k: Number of results to return.
+        allowed_ids: Only these product ids may be returned, None for no restriction.
+
+    Returns:
+        A tuple of (top_k,) product ids and fused scores, best first.
+    """
+    sparse_scores = sparse_index.score(query_weights)
+    if allowed_ids is not None:
+        sparse_scores[~np.isin(sparse_index.doc_ids, allowed_ids)] = 0
+    n_candidates = min(len(sparse_scores), top_k * HYBRID_CANDIDATE_FACTOR)
+    sparse_top = np.argpartition(-sparse_scores, n_candidates - 1)[:n_candidates] if n_candidates else np.array([], dtype=np.int64)
+
+    dense_by_id = {int(i): float(s) for i, s in zip(dense_ids, dense_scores) if i != -1}
+    candidate_ids = set(dense_by_id) | {int(sparse_index.doc_ids[p]) for p in sparse_top if sparse_scores[p] > 0}
+
+    fused = []
+    for product_id in candidate_ids:
+        dense_score = dense_by_id.get(product_id)
+        if dense_score is None:
+            dense_score = float(np.dot(index.reconstruct(product_id), query_vector))
+        position = sparse_index.position_of.get(product_id)
+        sparse_score = float(sparse_scores[position]) if position is not None else 0.0
+        fused.append((dense_score + SPARSE_WEIGHT * sparse_score, product_id))
+
+    fused.sort(reverse=True)
+    fused = fused[:top_k]
+    return np.array([i for _, i in fused], dtype=np.int64), np.array([s for s, _ in fused], dtype=np.float32)
@@ -0,0 +1,177 @@
+import os
+import time
+from rag.components import lazy_component
+from rag.telemetry import get_logger, observe_stage, LLM_GENERATED_TOKENS, SPECULATIVE_DRAFTED, SPECULATIVE_ACCEPTED
+
+logger = get_logger(__name__)
+
+SPECULATIVE_MODE = (os.getenv("SPECULATIVE_MODE") or "none").lower()  # none | draft | prompt_lookup
+SPECULATIVE_TOKENS = int(os.getenv("SPECULATIVE_TOKENS") or 5)
+PROMPT_LOOKUP_MAX_NGRAM = int(os.getenv("PROMPT_LOOKUP_MAX_NGRAM") or 3)
+DRAFT_MODEL_ID = os.getenv("DRAFT_MODEL_ID") or "meta-llama/Llama-3.2-1B-Instruct"
+
+def speculative_enabled() -> bool:
+    return SPECULATIVE_MODE in ("draft", "prompt_lookup")
+
+class PromptLookupDrafter:
+    """
+    Drafts the tokens that followed the latest earlier occurrence of the current n-gram.
+
+    Answers copy prices, spec lists and registration numbers from the product context, so
+    the continuation of a matching n-gram in the prompt is often exactly what the target
+    model generates next. Needs no extra model.
+    """
+    def __init__(self, max_ngram: int = PROMPT_LOOKUP_MAX_NGRAM):
+        self.max_ngram = max_ngram
+
+    def propose(self, ids: list[int], num_tokens: int) -> list[int]:
+        for n in range(min(self.max_ngram, len(ids) - 1), 0, -1):
+            ngram = ids[-n:]
+            # Most recent match first, it is the likeliest continuation
+            for start in range(len(ids) - n - 1, -1, -1):
+                if ids[start:start + n] == ngram:
+                    return ids[start + n:start + n + num_tokens]
+        return []
+
+class DraftModelDrafter:
+    """
+    Drafts tokens greedily with a small causal LM sharing the target model's tokenizer.
+
+    Keeps the draft model's KV cache between calls and crops it back to the prefix the
+    target accepted, so each call only feeds the tokens that changed.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.past = None
+        self.cached_ids = []
+
+    def propose(self, ids: list[int], num_tokens: int) -> list[int]:
+        import torch
+
+        if num_tokens <= 0:
+            return []
+        common = 0
+        for cached, token in zip(self.cached_ids, ids):
+            if cached != token:
+                break
+            common += 1
+        # At least one token has to be fed to get the next-token logits
+        common = min(common, len(ids) - 1)
+        # Negative crop drops tokens from the end, positive lengths are deprecated in newer transformers
+        if self.past is not None and len(self.cached_ids) > common:
+            self.past.crop(common - len(self.cached_ids))
+
+        device = self.model.device
+        feed = torch.tensor([ids[common:]], device=device)
+        draft = []
+        with torch.no_grad():
+            for _ in range(num_tokens):
+                out = self.model(feed, past_key_values=self.past, use_cache=True)
+                self.past = out.past_key_values
+                token = int(out.logits[0, -1].argmax())
+                draft.append(token)
+                feed = torch.tensor([[token]], device=device)
+
+        # The last drafted token was never fed, so it is not in the cache
+        self.cached_ids = ids + draft[:-1]
+        return draft
+
+@lazy_component("draft_model")
+def get_draft_model():
+    import torch
+    from transformers import AutoModelForCausalLM
+    return AutoModelForCausalLM.from_pretrained(DRAFT_MODEL_ID, device_map="auto", torch_dtype=torch.bfloat16)
+
+def get_drafter(mode: str = SPECULATIVE_MODE):
+    if mode == "draft":
+        return DraftModelDrafter(get_draft_model())
+    if mode == "prompt_lookup":
+        return PromptLookupDrafter()
+    raise ValueError(f"Unknown speculative decoding mode: {mode}")
+
+def speculative_generate(model, drafter, input_ids: list[int], max_new_tokens: int,
+                         eos_token_ids: set = None, num_draft_tokens: int = SPECULATIVE_TOKENS):
+    """
+    Greedy speculative decoding, the output is token for token what greedy decoding of `model` gives.
+
+    Every step the target model's next token is taken as is, the drafter proposes the
+    tokens after it and a single forward pass of the target verifies all of them. The
+    longest prefix of the draft that matches the target's own greedy choices is kept, the
+    KV cache is cropped back to it and the logits after the last kept token seed the next step.
+
+    Args:
+        model: Target causal LM.
+        drafter: `DraftModelDrafter` or `PromptLookupDrafter`.
+        input_ids: Prompt token ids.
+        max_new_tokens: Generation limit.
+        eos_token_ids: Token ids that stop generation.
+        num_draft_tokens: Tokens drafted per step.
+
+    Returns:
+        A tuple of the generated token ids and a stats dict with drafted/accepted token counts,
+        acceptance rate, target forward passes, prefill and decode seconds and tokens per second.
+    """
+    import torch
+
+    eos_token_ids = eos_token_ids or set()
+    device = model.device
+    ids = list(input_ids)
+    generated = []
+    drafted = accepted = steps = 0
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        out = model(torch.tensor([ids], device=device), use_cache=True)
+        past, next_logits = out.past_key_values, out.logits[0, -1]
+        prefill_seconds = time.perf_counter() - start
+
+        while len(generated) < max_new_tokens:
+            token = int(next_logits.argmax())
+            remaining = max_new_tokens - len(generated) - 1
+            draft = drafter.propose(ids + [token], min(num_draft_tokens, remaining)) if remaining > 0 and token not in eos_token_ids else []
+
+            out = model(torch.tensor([[token] + draft], device=device), past_key_values=past, use_cache=True)
+            past, predictions = out.past_key_values, out.logits[0].argmax(dim=-1).tolist()
+            steps += 1
+
+            n_accepted = 0
+            while n_accepted < len(draft) and draft[n_accepted] == predictions[n_accepted]:
+                n_accepted += 1
+            drafted += len(draft)
+            accepted += n_accepted
+
+            new_tokens = [token] + draft[:n_accepted]
+            if n_accepted < len(draft):
+                past.crop(n_accepted - len(draft))
+            next_logits = out.logits[0, n_accepted]
+
+            for position, new_token in enumerate(new_tokens):
+                if new_token in eos_token_ids:
+                    new_tokens = new_tokens[:position + 1]
+                    break
+            ids += new_tokens
+            generated += new_tokens
+            if generated[-1] in eos_token_ids:
+                break
+
+    decode_seconds = time.perf_counter() - start - prefill_seconds
+    stats = {
+        "new_tokens": len(generated),
+        "drafted": drafted,
+        "accepted": accepted,
+        "acceptance_rate": accepted / drafted if drafted else 0.0,
+        "target_forward_passes": steps,
+        "prefill_seconds": prefill_seconds,
+        "decode_seconds": decode_seconds,
+        "tokens_per_second": len(generated) / decode_seconds if decode_seconds else 0.0,
+    }
+    return generated, stats
+
+def record_stats(stats: dict):
+    observe_stage("llm_prefill", stats["prefill_seconds"])
+    observe_stage("llm_decode", stats["decode_seconds"])
+    LLM_GENERATED_TOKENS.inc(stats["new_tokens"])
+    SPECULATIVE_DRAFTED.inc(stats["drafted"])
+    SPECULATIVE_ACCEPTED.inc(stats["accepted"])
+    logger.info("Speculative decoding: %d tokens, acceptance %.1f%%, %.1f tok/s, %d target passes",
+                stats["new_tokens"], stats["acceptance_rate"] * 100, stats["tokens_per_second"], stats["target_forward_passes"])
@@ -0,0 +1,94 @@
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, Histogram
+
+load_dotenv()
+
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").upper()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE") or 1.0)
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of each pipeline stage (config fetch, embedding, search, LLM, bcrypt, ...)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_GENERATED_TOKENS = Counter("rag_llm_generated_tokens_total", "Number of tokens generated by the LLM")
+SPECULATIVE_DRAFTED = Counter("rag_llm_speculative_drafted_tokens_total", "Tokens proposed by the speculative decoding drafter")
+SPECULATIVE_ACCEPTED = Counter("rag_llm_speculative_accepted_tokens_total", "Drafted tokens accepted by the target model")
+REQUEST_COUNT = Counter("http_requests_total", "Number of HTTP requests", ["method", "path", "status"])
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "path"], buckets=STAGE_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Number of HTTP requests being processed")
+REQUESTS_SHED = Counter("http_requests_shed_total", "Requests rejected by rate limiting or admission control", ["gate", "reason"])
+ADMISSION_IN_FLIGHT = Gauge("rag_admission_in_flight", "Requests admitted past an admission gate", ["gate"])
+ADMISSION_WAITING = Gauge("rag_admission_waiting", "Requests queued at an admission gate", ["gate"])
+INDEX_UPDATE_LAG = Histogram("rag_index_update_lag_seconds", "Time from a product write to its update being searchable", buckets=STAGE_BUCKETS)
+INDEX_STALENESS = Gauge("rag_index_staleness_seconds", "Age of the oldest product change not yet applied to the index")
+SIDECAR_REQUESTS = Counter("rag_sidecar_requests_total", "Requests served by the retrieval sidecar", ["transport", "status"])
+MODEL_LOAD_SECONDS = Gauge("rag_model_load_seconds", "Time the last LLM load took", ["source"])
+INTENT_ROUTES = Counter("rag_intent_routes_total", "Answered questions by detected intent and route (template or llm)", ["intent", "route"])
+LLM_LATENCY_SAVED = Counter("rag_llm_latency_saved_seconds_total", "Estimated LLM seconds saved by answering lookups from templates")
+INDEX_RESIDENT = Gauge("rag_index_resident", "Whether a registry index is loaded in memory", ["index"])
+INDEX_RESIDENT_BYTES = Gauge("rag_index_resident_bytes", "On-disk size of a resident registry index", ["index"])
+INDEX_LOAD_SECONDS = Histogram("rag_index_load_seconds", "Time to load a registry index", ["index"], buckets=STAGE_BUCKETS)
+INDEX_EVICTIONS = Counter("rag_index_evictions_total", "Registry indexes evicted to stay within the memory budget", ["index"])
+RESULT_CACHE_REQUESTS = Counter("rag_result_cache_requests_total", "Top-k result cache lookups", ["result"])
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total",
+    "Requests by single-flight role (overflow: flight full, ran on its own), the coalescing ratio is follower / total",
+    ["flight", "role"],
+)
+INDEX_UPDATES = Counter("rag_index_updates_total", "Product documents applied to the live index", ["op"])
+
+class DebugSamplingFilter(logging.Filter):
+    """Lets through only a share of DEBUG records, INFO and above always pass."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+_base_logger = logging.getLogger("chatbot")
+if not _base_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    _handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+    _base_logger.addHandler(_handler)
+    _base_logger.setLevel(LOG_LEVEL)
+    _base_logger.propagate = False
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger sharing the leveled, sampled handler of the application.
+
+    Args:
+        name: Module name, usually `__name__`.
+
+    Returns:
+        A child logger of the "chatbot" logger.
+    """
+    return _base_logger.getChild(name)
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a block of code and records it in the `rag_stage_duration_seconds` histogram.
+
+    Args:
+        stage: Stage label, e.g. "query_embed" or "faiss_search".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
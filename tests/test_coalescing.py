@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+import rag.inference as inference
+import rag.conversation as conv
+from api.rate_limit import AdmissionGate
+from rag.coalescing import SingleFlight, Flight, FlightTimeout
+
+def test_followers_beyond_the_limit_run_their_own_flight():
+    flights = SingleFlight("test", max_followers=2, wait_timeout=5)
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.3)
+        return "ok"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.run("key", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    # One leader and two followers share a run, the two others lead private flights
+    assert len(calls) == 3
+    assert results == ["ok"] * 5
+
+def test_follower_gives_up_after_the_wait_timeout():
+    flights = SingleFlight("test", wait_timeout=0.2)
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(flights.run("key", time.sleep, 1.0))
+        except FlightTimeout:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes, key=str) == [None, "timeout"]
+
+def test_unpublished_flight_streams_its_whole_result():
+    flight = Flight()
+    threading.Timer(0.05, lambda: flight.finish("whole answer")).start()
+    assert list(flight.stream(1)) == ["whole answer"]
+
+@pytest.fixture
+def long_session(monkeypatch):
+    monkeypatch.setattr(inference, "count_tokens", lambda text: 1000)
+    monkeypatch.setattr(conv, "save_session", lambda session_id, session: None)
+    return {"summary": "old summary", "turns": [["user", "q", 1000], ["assistant", "a", 1000]]}
+
+def test_summary_takes_an_llm_slot(monkeypatch, long_session):
+    gate = AdmissionGate("test", max_concurrent=1, max_waiting=0, wait_timeout=0)
+    active = []
+    monkeypatch.setattr(inference, "summarize_history", lambda summary, turns: active.append(gate._active) or "new summary")
+
+    inference.record_turn("session", long_session, "query", "answer", gate.admit)
+    assert active == [1]
+    assert long_session["summary"] == "new summary"
+
+def test_summary_is_skipped_while_the_llm_is_busy(monkeypatch, long_session):
+    gate = AdmissionGate("test", max_concurrent=1, max_waiting=0, wait_timeout=0)
+    calls = []
+    monkeypatch.setattr(inference, "summarize_history", lambda summary, turns: calls.append(1) or "new summary")
+
+    with gate.admit():
+        inference.record_turn("session", long_session, "query", "answer", gate.admit)
+    assert calls == []
+    assert long_session["summary"] == "old summary"
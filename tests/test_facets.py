@@ -0,0 +1,82 @@
+import json
+import numpy as np
+import pytest
+from rag.facets import FacetIndex, parse_constraints
+
+ATTRIBUTES = {1: "Kapasitas", 2: "RAM", 3: "Warna"}
+
+def product(product_id: int, price: float, *attributes):
+    values = [{"attribute_id": attr_id, "values": values} for attr_id, values in attributes]
+    return {"id": product_id, "price": price, "discount": None, "weight": None, "attributes_value": json.dumps(values)}
+
+CATALOG = [
+    product(1, 3_000_000, (1, ["128gb"]), (2, ["8gb"]), (3, ["Hitam"])),
+    product(2, 5_000_000, (1, ["256gb"]), (2, ["12gb"]), (3, ["Biru"])),
+    product(3, 1_500_000, (1, ["64gb"]), (2, ["4gb"]), (3, ["Hitam"])),
+]
+
+def ids(facets: FacetIndex, constraints: list) -> list:
+    return sorted(facets.filter_ids(constraints).tolist())
+
+def test_update_replaces_changed_rows():
+    facets = FacetIndex.build(CATALOG, ATTRIBUTES)
+    changed = [product(3, 2_000_000, (1, ["512gb"]), (2, ["8gb"]), (3, ["Hijau"])), product(4, 900_000, (3, ["Hitam"]))]
+    updated = facets.update(changed, ATTRIBUTES, [2, 3, 4])
+
+    # Product 2 was deleted, 3 changed and 4 is new
+    assert sorted(updated.product_ids.tolist()) == [1, 3, 4]
+    assert ids(updated, [{"key": "dim:storage", "min": 256}]) == [3]
+    assert ids(updated, [{"key": "dim:memory", "min": 8}]) == [1, 3]
+    assert ids(updated, [{"key": "3", "values": ["hitam"]}]) == [1, 4]
+    assert ids(updated, [{"key": "3", "values": ["hijau"]}]) == [3]
+    assert ids(updated, [{"key": "price", "max": 1_000_000}]) == [4]
+
+    # The original index is left as it was for searches still holding it
+    assert ids(facets, [{"key": "3", "values": ["hitam"]}]) == [1, 3]
+
+def test_update_matches_a_full_build():
+    changed = [product(2, 4_000_000, (1, ["1tb"]), (3, ["Ungu"]))]
+    updated = FacetIndex.build(CATALOG, ATTRIBUTES).update(changed, ATTRIBUTES, [2])
+    rebuilt = FacetIndex.build([CATALOG[0], CATALOG[2], *changed], ATTRIBUTES)
+    for constraints in ([{"key": "dim:storage", "min": 1000}], [{"key": "3", "values": ["ungu", "hitam"]}],
+                        [{"key": "dim:memory", "max": 8}], [{"key": "price", "min": 2_000_000}]):
+        assert ids(updated, constraints) == ids(rebuilt, constraints)
+    assert np.array_equal(np.sort(updated.product_ids), np.sort(rebuilt.product_ids))
+
+def test_build_skips_non_numeric_attribute_ids():
+    catalog = [product(1, 1_000_000, ("warna", ["Hitam"]), ("", ["8gb"]), (1, ["64gb"]))]
+    facets = FacetIndex.build(catalog, ATTRIBUTES)
+    assert set(facets.numeric) == {"price", "1", "dim:storage"}
+    assert not facets.categorical
+
+def test_memory_attribute_names():
+    attributes = {1: "Memori Internal", 2: "RAM", 3: "Kartu Memori"}
+    facets = FacetIndex.build([product(1, None, (1, ["128gb"]), (2, ["8gb"]), (3, ["256gb"]))], attributes)
+    assert facets.numeric["dim:memory"][1].tolist() == [8]
+    assert sorted(facets.numeric["dim:storage"][1].tolist()) == [128, 256]
+
+@pytest.mark.parametrize("query, constraints", [
+    ("hp ram minimal 8gb", [{"key": "dim:memory", "min": 8}]),
+    ("16gb ram ke atas", [{"key": "dim:memory", "min": 16}]),
+    ("RAM: 8GB ke atas", [{"key": "dim:memory", "min": 8}]),
+    ("ram 8gb storage minimal 256gb", [{"key": "dim:memory", "min": 8}, {"key": "dim:storage", "min": 256}]),
+    ("hp memori internal minimal 128gb", [{"key": "dim:storage", "min": 128}]),
+    ("hp minimal 128gb", [{"key": "dim:storage", "min": 128}]),
+    ("powerbank 10000mah ke atas", [{"key": "dim:battery", "min": 10000}]),
+    ("hp harga di bawah 2 juta", [{"key": "price", "max": 2_000_000}]),
+    # A memory word between two sizes could name either, no hard filter
+    ("8gb ram 256gb minimal", []),
+    # No comparison word: "aluminium" is not "min", a bare price or size is not a limit
+    ("laptop aluminium 512gb", []),
+    ("hp harga 2 juta", []),
+    ("hp 256gb", []),
+    # Which side of a pair is memory is not reliable
+    ("hp 12/512gb minimal", []),
+])
+def test_parse_constraints(query, constraints):
+    assert parse_constraints(query) == constraints
+
+def test_explicit_values_are_normalized_like_the_index():
+    facets = FacetIndex.build([product(1, None, (3, ["Biru-Muda"]))], ATTRIBUTES)
+    assert facets.filter_ids([{"key": 3, "values": ["biru muda"]}]).tolist() == [1]
+    assert facets.filter_ids([{"key": 3, "values": ["BIRU-MUDA"]}]).tolist() == [1]
@@ -0,0 +1,26 @@
+import threading
+import rag.index_updater as updater
+
+def test_rebuild_holds_the_consumer_and_follows_it(monkeypatch):
+    consumer = updater.ProductChangeConsumer()
+    consumer._pending = [1, 2]
+    consumer._disk_version = "old"
+    monkeypatch.setattr(consumer, "running", lambda: True)
+    monkeypatch.setattr(updater, "read_index_version", lambda: "new")
+    monkeypatch.setattr(updater, "reload_index", lambda: None)
+    monkeypatch.setattr(updater, "get_shards", lambda: {})
+    monkeypatch.setattr(updater, "get_id_to_doc", lambda: {})
+
+    with consumer.rebuilding():
+        # A pass of the loop (batch, persist, reload) waits for the rebuild
+        assert not consumer._lock.acquire(blocking=False)
+        waiting = threading.Thread(target=consumer.sync_with_disk)
+        waiting.start()
+        waiting.join(timeout=0.1)
+        assert waiting.is_alive()
+
+    waiting.join(timeout=1)
+    assert not waiting.is_alive()
+    # Changes applied to the old index are dropped, their outbox rows are applied again
+    assert consumer._pending == []
+    assert consumer._disk_version == "new"
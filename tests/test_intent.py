@@ -0,0 +1,58 @@
+import json
+import pickle
+import pytest
+from decimal import Decimal
+from rag.helpers.document_utils import format_currency
+from rag.intent import match_product, render_answer, NAME_RE
+
+@pytest.fixture(scope="module")
+def catalog() -> list[dict]:
+    # Every shipped product counts as retrieved, the hardest case for ambiguity
+    with open("rag/data/chunk_texts.pkl", "rb") as f:
+        documents = pickle.load(f)
+    items = documents.items() if isinstance(documents, dict) else enumerate(documents)
+    return [{"id": product_id, "text": text} for product_id, text in items]
+
+def matched_name(query: str, docs: list[dict]):
+    product_id = match_product(query, docs)
+    for doc in docs:
+        if doc["id"] == product_id:
+            return NAME_RE.search(doc["text"]).group(1)
+    return None
+
+@pytest.mark.parametrize("query, name_start", [
+    ("berapa harga xiaomi 14T?", "Xiaomi 14T"),
+    ("ongkir xiaomi 14t berapa", "Xiaomi 14T"),
+    ("harga iphone 15", "Apple iPhone 15"),
+    ("berat iphone 15", "Apple iPhone 15"),
+    ("apakah infinix smart 8 baru?", "HANDPHONE SECOND INFINIX SMART 8"),
+    ("harga samsung galaxy s25 ultra", "Samsung Galaxy S25 Ultra"),
+    ("harga charger iphone", "UGREEN Kepala Charger"),
+])
+def test_catalog_questions_name_their_product(catalog, query, name_start):
+    assert matched_name(query, catalog).startswith(name_start)
+
+def test_brand_alone_names_no_product(catalog):
+    assert match_product("berapa harga samsung?", catalog) is None
+
+@pytest.mark.parametrize("query", ["berapa harga samsung galaxy?", "harga iphone 15"])
+def test_close_models_are_ambiguous(catalog, query):
+    docs = catalog + [
+        {"id": -1, "text": "**Product Name** : Samsung Galaxy A15 5G 8/256"},
+        {"id": -2, "text": "**Product Name** : Apple iPhone 15 Pro 256GB"},
+    ]
+    assert match_product(query, docs) is None
+
+@pytest.mark.parametrize("query, answer", [
+    ("samsung a15 bekas?", "Tidak, Samsung A15 dijual dalam kondisi baru."),
+    ("samsung a15 masih baru?", "Ya, Samsung A15 dijual dalam kondisi baru."),
+    ("kondisi samsung a15?", "Samsung A15 dijual dalam kondisi baru."),
+])
+def test_condition_answer_follows_the_question(query, answer):
+    product = {"name": "Samsung A15", "attributes_value": json.dumps([{"attribute_id": "17", "values": ["baru"]}])}
+    assert render_answer("condition", product, query) == answer
+
+def test_currency_matches_the_id_locale_format():
+    assert format_currency(Decimal("17549000.00000000")) == "Rp17.549.000,00"
+    assert format_currency(0) == "Rp0,00"
+    assert format_currency(1234.5) == "Rp1.234,50"
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+from rag.shards import shard_ids
+
+faiss = pytest.importorskip("faiss")
+
+def test_shard_ids_of_an_index_keyed_by_product_id():
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(4))
+    index.add_with_ids(np.eye(4, dtype=np.float32)[:2], np.array([7, 9], dtype=np.int64))
+    assert shard_ids({"index": index}).tolist() == [7, 9]
+
+def test_shard_ids_of_a_legacy_index_are_positions():
+    index = faiss.IndexFlatIP(4)
+    index.add(np.eye(4, dtype=np.float32))
+    assert shard_ids({"index": index}).tolist() == [0, 1, 2, 3]
@@ -0,0 +1,71 @@
+import time
+import numpy as np
+import pytest
+import rag.sidecar as sidecar
+import rag.sidecar_protocol as proto
+import rag.similar as similar
+from rag.similar import NeighbourTable
+
+CONFIGURED_TOP_K = 5
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def retrieve_docs(db_conn, query, shard_keys=None, constraints=None, index_name=None):
+        calls.append(("single", query, constraints))
+        return [{"id": i, "score": 1.0, "text": ""} for i in range(CONFIGURED_TOP_K)]
+
+    def retrieve_docs_batch(db_conn, queries, top_ks=None, shard_keys=None, index_name=None):
+        calls.append(("batch", queries, top_ks))
+        return [[{"id": i, "score": 1.0, "text": ""} for i in range(top_k or CONFIGURED_TOP_K)] for top_k in top_ks]
+
+    monkeypatch.setattr(sidecar, "retrieve_docs", retrieve_docs)
+    monkeypatch.setattr(sidecar, "retrieve_docs_batch", retrieve_docs_batch)
+    return calls
+
+def execute(params: dict):
+    return sidecar.RetrievalSidecar(None, workers=1).execute(params, time.monotonic() + 10)
+
+def test_one_query_batch_gets_its_requested_top_k(calls):
+    results = execute({"queries": ["laptop"], "top_ks": [20]})
+    assert len(results[0]) == 20
+    assert calls == [("batch", ["laptop"], [20])]
+
+def test_batch_chunks_search_alike_whatever_their_size(calls):
+    execute({"queries": ["laptop"], "top_ks": [None]})
+    execute({"queries": ["laptop", "kemeja"], "top_ks": [None, None]})
+    assert [call[0] for call in calls] == ["batch", "batch"]
+
+def test_search_without_top_ks_keeps_constraints(calls):
+    constraints = [{"key": "price", "max": 1000000}]
+    results = execute({"queries": ["laptop"], "constraints": constraints})
+    assert len(results[0]) == CONFIGURED_TOP_K
+    assert calls == [("single", "laptop", constraints)]
+
+@pytest.mark.parametrize("params", [
+    {"queries": ["a", "b"]},
+    {"queries": ["a"], "top_ks": [5], "constraints": [{"key": "price", "max": 1}]},
+])
+def test_ambiguous_requests_are_rejected(calls, params):
+    with pytest.raises(proto.SidecarError) as e:
+        execute(params)
+    assert e.value.code == proto.BAD_REQUEST
+
+@pytest.fixture
+def neighbours(monkeypatch):
+    table = NeighbourTable(np.array([1, 2], dtype=np.int64), np.array([[3, 2, 4], [1, -1, -1]], dtype=np.int32),
+                           np.array([[0.9, 0.8, 0.7], [0.9, 0, 0]], dtype=np.float16))
+    monkeypatch.setattr(similar, "get_neighbours", lambda: table)
+    # Product 3 was deleted by a live update after the table was computed
+    monkeypatch.setattr(sidecar, "get_id_to_doc", lambda: {1: "one", 2: "two", 4: "four"})
+
+def test_similar_skips_neighbours_without_a_document(neighbours):
+    results = sidecar.RetrievalSidecar(None, workers=1).execute_similar({"product_id": 1, "k": 2}, time.monotonic() + 10)
+    assert [doc["id"] for doc in results[0]] == [2, 4]
+    assert results[0][0]["text"] == "two"
+
+def test_similar_of_an_unknown_product(neighbours):
+    with pytest.raises(proto.SidecarError) as e:
+        sidecar.RetrievalSidecar(None, workers=1).execute_similar({"product_id": 5}, time.monotonic() + 10)
+    assert e.value.code == proto.NOT_FOUND